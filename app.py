@@ -2,23 +2,32 @@
 import streamlit as st
 import os
 import tempfile
+import time
+import uuid
 from civic_rag.backend import database
+from civic_rag.backend import memory
+from civic_rag.backend.partitions import classify_question
 from civic_rag.backend import rag
 
 st.set_page_config(page_title="Civic RAG for Nepal", layout="wide")
 database.init_db()
 st.title("🇳🇵 Civic Protest Guidance & Insights")
 
-# Initialize chat history
-if "chat_history" not in st.session_state:
-    st.session_state.chat_history = []
+# Conversation memory lives outside the Streamlit process, keyed by session id;
+# only the rolling summary and the recent turns are kept and rendered
+if "session_id" not in st.session_state:
+    st.session_state.session_id = str(uuid.uuid4())
+session = memory.get_session(st.session_state.session_id)
 
 # Display chat messages from history (latest at bottom)
 st.subheader("Chat History")
 chat_container = st.container()
 with chat_container:
+    if session["summary"]:
+        with st.expander("Earlier in this conversation (summarized)"):
+            st.markdown(session["summary"])
     # Display messages in chronological order (oldest first, latest at bottom)
-    for sender, message in st.session_state.chat_history:
+    for sender, message in session["turns"]:
         if sender == "user":
             st.markdown(f"**🧑 You:** {message}")
         else:
@@ -39,23 +48,20 @@ with col2:
 
 # Handle message submission
 if send_button and user_input:
-    # Add user message to history
-    st.session_state.chat_history.append(("user", user_input))
-    
-    # Get bot response
+    # Get bot response (the turn is stored in the session memory)
     with st.spinner("Thinking..."):
-        answer = rag.answer_query(user_input)
-    
-    # Add bot response to history
-    st.session_state.chat_history.append(("bot", answer))
+        started = time.perf_counter()
+        answer = rag.answer_query(user_input, session_id=st.session_state.session_id)
+        latency_ms = (time.perf_counter() - started) * 1000
     
-    # Save to database
-    database.save_query(user_input, answer)
+    # Save to database, tagged with the normalized country/topic of the question
+    database.save_query(user_input, answer, latency_ms=latency_ms, **classify_question(user_input))
     
     # Rerun to show new messages
     st.rerun()
 
 # Clear chat button
 if st.button("Clear Chat History"):
-    st.session_state.chat_history = []
+    memory.clear_session(st.session_state.session_id)
+    st.session_state.session_id = str(uuid.uuid4())
     st.rerun()
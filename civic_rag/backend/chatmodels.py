@@ -1,15 +1,23 @@
-from langchain.prompts import ChatPromptTemplate
 from langchain_groq import ChatGroq
 from langgraph.graph import StateGraph, END, START
 from langchain_core.messages import BaseMessage, HumanMessage, AIMessage
 import civic_rag.config as config
 from typing import TypedDict, Annotated, Sequence
-from langchain_core.output_parsers import StrOutputParser
+from langchain_core.output_parsers import StrOutputParser, PydanticOutputParser
+from langchain_core.exceptions import OutputParserException
+from pydantic import BaseModel, Field
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 import operator
+import time
 
 # Import utilities and tools from separate modules
 from .utils import get_vector_store_info
 from .tools_utils import rag_search, web_search
+from .llm_cache import get_llm_cache
+from .llm_scheduler import get_llm_scheduler, priority_for
+from .prompts import get_prompt_registry, truncate_at_chunks
+from .tokens import truncate_to_tokens
+from .partitions import aspect_query
 from dotenv import load_dotenv
 load_dotenv()
 
@@ -30,61 +38,222 @@ class AgentState(TypedDict):
     safety_analysis: str
     legal_analysis: str
     final_answer: str
+    # "parallel": one LLM call per aspect; "combined": one structured call for all three
+    analysis_mode: str
+    # Bounded summary + recent turns of the session (empty without a session)
+    conversation_context: str
+    # "interactive" (user waiting) or "batch"; interactive LLM calls are scheduled first
+    traffic_class: str
+    # Latency budget: total seconds and absolute time.time() deadline (None: unlimited)
+    latency_budget: float
+    deadline: float
+    # Set by the budget wrapper for the node currently running
+    node_deadline: float
+    # Nodes that timed out or failed, with the reason
+    skipped: Annotated[list, operator.add]
 
 
+def _get_llm() -> ChatGroq:
+    """Chat model shared by all analysis nodes."""
+    return ChatGroq(
+        model=config.LLM_MODEL,
+        temperature=config.LLM_TEMPERATURE,
+        api_key=config.GROQ_API_KEY,
+        base_url=config.GROQ_API_BASE,
+        # Retries (429, 5xx, connection errors) are owned by the shared scheduler
+        max_retries=0
+    )
+
+def _invoke_llm(node_name: str, inputs: dict, parser=None,
+                traffic_class: str = "interactive", deadline: float = None):
+    """Renders a node's prompt, calls the LLM and parses the reply, going through the response cache.
+
+    The prompt comes from the registry, which caps the inputs and records
+    the rendered size.
+
+    The cache key covers the model, temperature, node name and the fully
+    rendered prompt, so any change to inputs or template is a cache miss.
+    Cache misses are admitted by the shared rate-limit-aware scheduler; with a
+    deadline, neither the wait for capacity nor the request may run past it.
+    """
+    llm = _get_llm()
+    parser = parser or StrOutputParser()
+    rendered = get_prompt_registry().render(node_name, inputs)
+    messages = rendered.messages
+    
+    cache = get_llm_cache()
+    cache_key = None
+    if cache.should_cache(node_name, llm.temperature):
+        rendered_prompt = "\n".join(f"{message.type}: {message.content}" for message in messages)
+        cache_key = cache.make_key(llm.model_name, llm.temperature, node_name, rendered_prompt)
+        cached = cache.get(cache_key)
+        if cached is not None:
+            return parser.parse(cached)
+    
+    scheduler = get_llm_scheduler()
+    estimated_tokens = rendered.prompt_tokens + config.LLM_EXPECTED_OUTPUT_TOKENS
+    
+    def call():
+        if deadline is None:
+            return llm.invoke(messages)
+        return llm.invoke(messages, timeout=max(deadline - time.time(), 0.1))
+    
+    response = scheduler.submit(
+        call,
+        priority=priority_for(node_name, traffic_class),
+        estimated_tokens=estimated_tokens,
+        deadline=deadline
+    )
+    usage = getattr(response, "usage_metadata", None) or {}
+    scheduler.reconcile_tokens(estimated_tokens, usage.get("total_tokens"))
+    raw_response = StrOutputParser().invoke(response)
+    result = parser.parse(raw_response)
+    if cache_key is not None:
+        cache.put(cache_key, llm.model_name, llm.temperature, node_name, raw_response)
+    return result
+
+
+# Prefix of the value a skipped node leaves in its state fields
+MISSING_PREFIX = "Not available ("
+
+# Budget stage of each node, in graph order
+NODE_STAGES = {
+    "economic_web_search": "search",
+    "political_web_search": "search",
+    "social_web_search": "search",
+    "economic_rag_search": "search",
+    "political_rag_search": "search",
+    "social_rag_search": "search",
+    "economic_analysis": "analysis",
+    "political_analysis": "analysis",
+    "social_analysis": "analysis",
+    "combined_analysis": "analysis",
+    "safety_analysis": "safety_analysis",
+    "legal_analysis": "legal_analysis",
+    "final_synthesis": "final_synthesis",
+}
+STAGE_ORDER = ["search", "analysis", "safety_analysis", "legal_analysis", "final_synthesis"]
+
+
+def _node_deadline(state: AgentState, node_name: str):
+    """Time by which a node must finish: the request deadline minus the later stages' shares."""
+    deadline = state.get("deadline")
+    if not deadline:
+        return None
+    shares = config.LATENCY_BUDGET_SHARES
+    later = STAGE_ORDER[STAGE_ORDER.index(NODE_STAGES[node_name]) + 1:]
+    reserved = state["latency_budget"] * sum(shares[stage] for stage in later) / sum(shares.values())
+    return deadline - reserved
+
+
+# Shared by every deadline-bounded call, so no thread pool is created per call
+_deadline_executor = ThreadPoolExecutor(max_workers=config.LATENCY_BUDGET_MAX_WORKERS,
+                                        thread_name_prefix="latency-budget")
+
+# Default for latency_budget arguments: config.LATENCY_BUDGET_SECONDS (None means no budget)
+_DEFAULT = object()
+
+
+def _run_with_deadline(fn, deadline):
+    """Runs fn(), raising TimeoutError if it is still running at the deadline.
+
+    Python threads cannot be killed, so an overrunning call is abandoned; LLM
+    calls receive the same deadline and stop on their own shortly after.
+    """
+    if deadline is None:
+        return fn()
+    remaining = deadline - time.time()
+    if remaining <= 0:
+        raise TimeoutError("no time left in the latency budget")
+    future = _deadline_executor.submit(fn)
+    try:
+        return future.result(timeout=remaining)
+    except FutureTimeoutError:
+        future.cancel()
+        raise TimeoutError(f"exceeded its {remaining:.1f}s share of the latency budget")
+
+
+def _with_budget(node_name: str, fields: list, node):
+    """Wraps a graph node so a timeout or error marks its fields missing instead of failing the graph."""
+    def run(state: AgentState) -> dict:
+        deadline = _node_deadline(state, node_name)
+        try:
+            return _run_with_deadline(lambda: node({**state, "node_deadline": deadline}), deadline)
+        except Exception as e:
+            print(f"⚠️ Skipping {node_name}: {e}")
+            label = node_name.replace("_", " ")
+            result = {field: f"{MISSING_PREFIX}{label} was skipped: {e})" for field in fields}
+            result["skipped"] = [label]
+            return result
+    return run
+
+
+def _search_question(state: AgentState) -> str:
+    """The question used for searches, with the previous user turn for follow-up context."""
+    messages = state["messages"]
+    question = messages[-1].content
+    previous = [m.content for m in messages[:-1] if isinstance(m, HumanMessage)]
+    if previous:
+        return f"{previous[-1]} {question}"
+    return question
+
 # Parallel web search nodes for different aspects
 def economic_web_search_node(state: AgentState) -> dict:
     """Searches for economic aspects of protests."""
-    user_question = state["messages"][-1].content
+    user_question = _search_question(state)
     query = f"Nepal protest economic impact business disruption GDP {user_question}"
     return {"economic_web_data": web_search.invoke(query)}
 
 def political_web_search_node(state: AgentState) -> dict:
     """Searches for political aspects of protests."""
-    user_question = state["messages"][-1].content
+    user_question = _search_question(state)
     query = f"Nepal protest political parties government response policy {user_question}"
     return {"political_web_data": web_search.invoke(query)}
 
 def social_web_search_node(state: AgentState) -> dict:
     """Searches for social and cultural aspects of protests."""
-    user_question = state["messages"][-1].content
+    user_question = _search_question(state)
     query = f"Nepal protest social impact community safety cultural {user_question}"
     return {"social_web_data": web_search.invoke(query)}
 
 # Parallel RAG search nodes for different aspects
 def economic_rag_search_node(state: AgentState) -> dict:
     """Searches RAG for economic protest guidance."""
-    user_question = state["messages"][-1].content
-    query = f"economic impact business disruption financial {user_question}"
-    return {"economic_rag_data": rag_search.invoke(query)}
+    user_question = _search_question(state)
+    query = aspect_query(user_question, "economic")
+    return {"economic_rag_data": rag_search.invoke({"query": query, "aspect": "economic"})}
 
 def political_rag_search_node(state: AgentState) -> dict:
     """Searches RAG for political protest guidance."""
-    user_question = state["messages"][-1].content
-    query = f"political parties government policy legal rights {user_question}"
-    return {"political_rag_data": rag_search.invoke(query)}
+    user_question = _search_question(state)
+    query = aspect_query(user_question, "political")
+    return {"political_rag_data": rag_search.invoke({"query": query, "aspect": "political"})}
 
 def social_rag_search_node(state: AgentState) -> dict:
     """Searches RAG for social and safety guidance."""
-    user_question = state["messages"][-1].content
-    query = f"social safety community cultural impact {user_question}"
-    return {"social_rag_data": rag_search.invoke(query)}
+    user_question = _search_question(state)
+    query = aspect_query(user_question, "social")
+    return {"social_rag_data": rag_search.invoke({"query": query, "aspect": "social"})}
 
 # Merge node to combine web and RAG results
 def merge_data_node(state: AgentState) -> dict:
     """Merges web and RAG search results."""
+    # Cap each aspect first so one long source cannot crowd the others out of the merged inputs
+    def capped(field: str) -> str:
+        return truncate_at_chunks(state.get(field, "No data"), config.PROMPT_MERGED_ASPECT_MAX_TOKENS)
+    
     # Combine all web results
     web_results = f"""
-    Economic Web Data: {state.get("economic_web_data", "No data")}
-    Political Web Data: {state.get("political_web_data", "No data")}
-    Social Web Data: {state.get("social_web_data", "No data")}
+    Economic Web Data: {capped("economic_web_data")}
+    Political Web Data: {capped("political_web_data")}
+    Social Web Data: {capped("social_web_data")}
     """
     
     # Combine all RAG results
     rag_results = f"""
-    Economic RAG Data: {state.get("economic_rag_data", "No data")}
-    Political RAG Data: {state.get("political_rag_data", "No data")}
-    Social RAG Data: {state.get("social_rag_data", "No data")}
+    Economic RAG Data: {capped("economic_rag_data")}
+    Political RAG Data: {capped("political_rag_data")}
+    Social RAG Data: {capped("social_rag_data")}
     """
     
     return {
@@ -95,256 +264,184 @@ def merge_data_node(state: AgentState) -> dict:
 # Analysis nodes for different aspects
 def economic_analysis_node(state: AgentState) -> dict:
     """Analyzes economic aspects of the protest."""
-    llm = ChatGroq(
-        model='meta-llama/llama-4-maverick-17b-128e-instruct',
-        temperature=0.7,
-        api_key=config.GROQ_API_KEY
-    )
-    
-    prompt = ChatPromptTemplate.from_template("""
-    You are an economic analyst specializing in protest impacts. Analyze the economic aspects based on:
-    
-    User Question: {question}
-    
-    Current Economic Data: {economic_web_data}
-    
-    Historical Economic Guidance: {economic_rag_data}
-    
-    Provide analysis covering:
-    1. Impact on businesses and commerce
-    2. Effects on employment and daily wages
-    3. Supply chain disruptions
-    4. Tourism and service sector impacts
-    5. Long-term economic consequences
-    
-    Be specific with numbers and percentages where available.
-    """)
-    
     user_question = state["messages"][-1].content
-    chain = prompt | llm | StrOutputParser()
-    
-    economic_analysis = chain.invoke({
+    economic_analysis = _invoke_llm("economic_analysis", {
         "question": user_question,
         "economic_web_data": state.get("economic_web_data", "No current data"),
         "economic_rag_data": state.get("economic_rag_data", "No historical data")
-    })
+    }, traffic_class=state.get("traffic_class"), deadline=state.get("node_deadline"))
     
     return {"economic_analysis": economic_analysis}
 
 def political_analysis_node(state: AgentState) -> dict:
     """Analyzes political aspects of the protest."""
-    llm = ChatGroq(
-        model='meta-llama/llama-4-maverick-17b-128e-instruct',
-        temperature=0.7,
-        api_key=config.GROQ_API_KEY
-    )
-    
-    prompt = ChatPromptTemplate.from_template("""
-    You are a political analyst specializing in Nepal's political landscape. Analyze based on:
-    
-    User Question: {question}
-    
-    Current Political Data: {political_web_data}
-    
-    Historical Political Context: {political_rag_data}
-    
-    Provide analysis covering:
-    1. Key political actors and their positions
-    2. Government response and policies
-    3. Opposition strategies
-    4. Constitutional and legal frameworks
-    5. Potential political outcomes
-    
-    Focus on factual analysis without bias.
-    """)
-    
     user_question = state["messages"][-1].content
-    chain = prompt | llm | StrOutputParser()
-    
-    political_analysis = chain.invoke({
+    political_analysis = _invoke_llm("political_analysis", {
         "question": user_question,
         "political_web_data": state.get("political_web_data", "No current data"),
         "political_rag_data": state.get("political_rag_data", "No historical data")
-    })
+    }, traffic_class=state.get("traffic_class"), deadline=state.get("node_deadline"))
     
     return {"political_analysis": political_analysis}
 
 def social_analysis_node(state: AgentState) -> dict:
     """Analyzes social and cultural aspects of the protest."""
-    llm = ChatGroq(
-        model='meta-llama/llama-4-maverick-17b-128e-instruct',
-        temperature=0.7,
-        api_key=config.GROQ_API_KEY
-    )
-    
-    prompt = ChatPromptTemplate.from_template("""
-    You are a social analyst focusing on community impacts. Analyze based on:
-    
-    User Question: {question}
-    
-    Current Social Data: {social_web_data}
-    
-    Historical Social Context: {social_rag_data}
-    
-    Provide analysis covering:
-    1. Community sentiment and participation
-    2. Impact on different social groups
-    3. Cultural and religious considerations
-    4. Media coverage and public opinion
-    5. Social cohesion and divisions
-    
-    Be sensitive to cultural nuances.
-    """)
-    
     user_question = state["messages"][-1].content
-    chain = prompt | llm | StrOutputParser()
-    
-    social_analysis = chain.invoke({
+    social_analysis = _invoke_llm("social_analysis", {
         "question": user_question,
         "social_web_data": state.get("social_web_data", "No current data"),
         "social_rag_data": state.get("social_rag_data", "No historical data")
-    })
+    }, traffic_class=state.get("traffic_class"), deadline=state.get("node_deadline"))
     
     return {"social_analysis": social_analysis}
 
+class AspectAnalyses(BaseModel):
+    """Structured output of the combined analysis call."""
+    economic_analysis: str = Field(description="Economic analysis: businesses and commerce, employment and daily wages, supply chains, tourism and services, long-term consequences")
+    political_analysis: str = Field(description="Political analysis: key actors and positions, government response, opposition strategies, constitutional and legal frameworks, potential outcomes")
+    social_analysis: str = Field(description="Social analysis: community sentiment, impact on social groups, cultural and religious considerations, media and public opinion, social cohesion")
+
+
+def _run_aspect_analysis_nodes(state: AgentState) -> dict:
+    """Runs the three per-aspect analysis nodes concurrently and merges their output."""
+    nodes = [economic_analysis_node, political_analysis_node, social_analysis_node]
+    with ThreadPoolExecutor(max_workers=len(nodes)) as executor:
+        results = list(executor.map(lambda node: node(state), nodes))
+    merged = {}
+    for result in results:
+        merged.update(result)
+    return merged
+
+def combined_analysis_node(state: AgentState) -> dict:
+    """Produces the economic, political and social analyses with a single structured LLM call.
+
+    Falls back to the per-aspect nodes if the response does not match the schema.
+    """
+    parser = PydanticOutputParser(pydantic_object=AspectAnalyses)
+    
+    user_question = state["messages"][-1].content
+    try:
+        # Unparseable responses raise before they reach the response cache
+        analyses = _invoke_llm("combined_analysis", {
+            "question": user_question,
+            "economic_web_data": state.get("economic_web_data", "No current data"),
+            "economic_rag_data": state.get("economic_rag_data", "No historical data"),
+            "political_web_data": state.get("political_web_data", "No current data"),
+            "political_rag_data": state.get("political_rag_data", "No historical data"),
+            "social_web_data": state.get("social_web_data", "No current data"),
+            "social_rag_data": state.get("social_rag_data", "No historical data"),
+            "format_instructions": parser.get_format_instructions()
+        }, parser=parser, traffic_class=state.get("traffic_class"), deadline=state.get("node_deadline"))
+    except OutputParserException as e:
+        print(f"⚠️ Combined analysis did not match the schema, falling back to per-aspect calls: {e}")
+        return _run_aspect_analysis_nodes(state)
+    
+    return analyses.model_dump()
+
+def route_analysis(state: AgentState) -> list:
+    """Chooses the analysis node(s) to run after merging, based on the request's analysis mode."""
+    if state.get("analysis_mode") == "combined":
+        return ["combined_analysis"]
+    return ["economic_analysis", "political_analysis", "social_analysis"]
+
 def safety_analysis_node(state: AgentState) -> dict:
     """Analyzes safety and security aspects."""
-    llm = ChatGroq(
-        model='meta-llama/llama-4-maverick-17b-128e-instruct',
-        temperature=0.7,
-        api_key=config.GROQ_API_KEY
-    )
-    
-    prompt = ChatPromptTemplate.from_template("""
-    You are a safety and security expert. Based on all available data, provide safety analysis:
-    
-    Web Data: {web_results}
-    RAG Data: {rag_results}
-    
-    Focus on:
-    1. Current safety risks and hotspots
-    2. Recommended safety precautions
-    3. Emergency contacts and procedures
-    4. Safe routes and areas
-    5. Time-specific safety advice
-    
-    Prioritize citizen safety above all.
-    """)
-    
-    chain = prompt | llm | StrOutputParser()
-    
-    safety_analysis = chain.invoke({
+    safety_analysis = _invoke_llm("safety_analysis", {
         "web_results": state.get("web_results", ""),
         "rag_results": state.get("rag_results", "")
-    })
+    }, traffic_class=state.get("traffic_class"), deadline=state.get("node_deadline"))
     
     return {"safety_analysis": safety_analysis}
 
 def legal_analysis_node(state: AgentState) -> dict:
     """Analyzes legal rights and implications."""
-    llm = ChatGroq(
-        model='meta-llama/llama-4-maverick-17b-128e-instruct',
-        temperature=0.7,
-        api_key=config.GROQ_API_KEY
-    )
-    
-    prompt = ChatPromptTemplate.from_template("""
-    You are a legal expert on Nepal's protest laws. Based on available data, provide legal guidance:
-    
-    Web Data: {web_results}
-    RAG Data: {rag_results}
-    
-    Cover:
-    1. Constitutional rights to protest
-    2. Legal limitations and restrictions
-    3. Arrest procedures and rights
-    4. Legal aid contacts
-    5. Documentation recommendations
-    
-    Cite specific laws where applicable.
-    """)
-    
-    chain = prompt | llm | StrOutputParser()
-    
-    legal_analysis = chain.invoke({
+    legal_analysis = _invoke_llm("legal_analysis", {
         "web_results": state.get("web_results", ""),
         "rag_results": state.get("rag_results", "")
-    })
+    }, traffic_class=state.get("traffic_class"), deadline=state.get("node_deadline"))
     
     return {"legal_analysis": legal_analysis}
 
+def _assemble_completed_analyses(state: AgentState) -> str:
+    """Answer built from the completed analyses when there is no time left for the synthesis call."""
+    sections = [
+        f"**{title} Analysis**\n\n{state[field]}"
+        for field, title in [("safety_analysis", "Safety"), ("legal_analysis", "Legal"),
+                             ("economic_analysis", "Economic"), ("political_analysis", "Political"),
+                             ("social_analysis", "Social")]
+        if state.get(field) and not state[field].startswith(MISSING_PREFIX)
+    ]
+    if not sections:
+        return "I apologize, but I couldn't put together guidance in time. Please try again."
+    return "\n\n".join(sections)
+
 def final_synthesis_node(state: AgentState) -> dict:
     """Synthesizes all analyses into comprehensive guidance."""
-    llm = ChatGroq(
-        model='meta-llama/llama-4-maverick-17b-128e-instruct',
-        temperature=0.7,
-        api_key=config.GROQ_API_KEY
-    )
-    
-    prompt = ChatPromptTemplate.from_template("""
-    You are a senior protest guidance advisor. Synthesize all analyses into actionable guidance:
-    
-    User Question: {question}
-    
-    Economic Analysis: {economic_analysis}
-    
-    Political Analysis: {political_analysis}
-    
-    Social Analysis: {social_analysis}
-    
-    Safety Analysis: {safety_analysis}
-    
-    Legal Analysis: {legal_analysis}
-    
-    Provide a comprehensive response that:
-    1. Directly addresses the user's question
-    2. Integrates insights from all analyses
-    3. Prioritizes safety and legal compliance
-    4. Offers practical, actionable advice
-    5. Includes relevant contacts and resources
-    
-    Structure your response with clear sections and bullet points for readability.
-    """)
-    
     user_question = state["messages"][-1].content
-    chain = prompt | llm | StrOutputParser()
-    
-    response = chain.invoke({
-        "question": user_question,
-        "economic_analysis": state.get("economic_analysis", ""),
-        "political_analysis": state.get("political_analysis", ""),
-        "social_analysis": state.get("social_analysis", ""),
-        "safety_analysis": state.get("safety_analysis", ""),
-        "legal_analysis": state.get("legal_analysis", "")
-    })
+    deadline = state.get("deadline")
+    skipped = list(state.get("skipped") or [])
+    response = None
+    if deadline is None or deadline - time.time() >= config.LATENCY_FINAL_SYNTHESIS_MIN_SECONDS:
+        try:
+            response = _run_with_deadline(lambda: _invoke_llm("final_synthesis", {
+                "conversation_context": state.get("conversation_context") or "None (first question)",
+                "question": user_question,
+                "economic_analysis": state.get("economic_analysis", ""),
+                "political_analysis": state.get("political_analysis", ""),
+                "social_analysis": state.get("social_analysis", ""),
+                "safety_analysis": state.get("safety_analysis", ""),
+                "legal_analysis": state.get("legal_analysis", "")
+            }, traffic_class=state.get("traffic_class"), deadline=deadline), deadline)
+        except Exception as e:
+            print(f"⚠️ Final synthesis failed, assembling completed analyses instead: {e}")
+    if response is None:
+        skipped.append("final synthesis")
+        response = _assemble_completed_analyses(state)
+    if skipped:
+        response += f"\n\n_Note: to answer in time, this guidance was produced without: {', '.join(skipped)}._"
     
     return {
         "final_answer": response,
         "messages": [AIMessage(content=response)]
     }
 
+def summarize_conversation(previous_summary: str, turns: list) -> str:
+    """Folds older conversation turns into the rolling session summary."""
+    rendered_turns = "\n".join(
+        f"{'User' if role == 'user' else 'Assistant'}: {truncate_to_tokens(content, config.MEMORY_TURN_MAX_TOKENS)}"
+        for role, content in turns
+    )
+    # Runs after the answer has been returned, so it never competes with waiting users
+    return _invoke_llm("memory_summary", {
+        "summary": previous_summary or "None",
+        "turns": rendered_turns
+    }, traffic_class="batch")
+
 def create_protest_guidance_graph():
     """Creates the enhanced LangGraph workflow with parallel processing."""
+    # Compile every node prompt up front, so a broken template or cap fails at startup
+    get_prompt_registry()
     workflow = StateGraph(AgentState)
     
     # Add all nodes
     # Web search nodes
-    workflow.add_node("economic_web_search", economic_web_search_node)
-    workflow.add_node("political_web_search", political_web_search_node)
-    workflow.add_node("social_web_search", social_web_search_node)
+    workflow.add_node("economic_web_search", _with_budget("economic_web_search", ["economic_web_data"], economic_web_search_node))
+    workflow.add_node("political_web_search", _with_budget("political_web_search", ["political_web_data"], political_web_search_node))
+    workflow.add_node("social_web_search", _with_budget("social_web_search", ["social_web_data"], social_web_search_node))
     
     # RAG search nodes
-    workflow.add_node("economic_rag_search", economic_rag_search_node)
-    workflow.add_node("political_rag_search", political_rag_search_node)
-    workflow.add_node("social_rag_search", social_rag_search_node)
+    workflow.add_node("economic_rag_search", _with_budget("economic_rag_search", ["economic_rag_data"], economic_rag_search_node))
+    workflow.add_node("political_rag_search", _with_budget("political_rag_search", ["political_rag_data"], political_rag_search_node))
+    workflow.add_node("social_rag_search", _with_budget("social_rag_search", ["social_rag_data"], social_rag_search_node))
     
     # Processing nodes
     workflow.add_node("merge_data", merge_data_node)
-    workflow.add_node("economic_analysis", economic_analysis_node)
-    workflow.add_node("political_analysis", political_analysis_node)
-    workflow.add_node("social_analysis", social_analysis_node)
-    workflow.add_node("safety_analysis", safety_analysis_node)
-    workflow.add_node("legal_analysis", legal_analysis_node)
+    workflow.add_node("economic_analysis", _with_budget("economic_analysis", ["economic_analysis"], economic_analysis_node))
+    workflow.add_node("political_analysis", _with_budget("political_analysis", ["political_analysis"], political_analysis_node))
+    workflow.add_node("social_analysis", _with_budget("social_analysis", ["social_analysis"], social_analysis_node))
+    workflow.add_node("combined_analysis", _with_budget("combined_analysis", ["economic_analysis", "political_analysis", "social_analysis"], combined_analysis_node))
+    workflow.add_node("safety_analysis", _with_budget("safety_analysis", ["safety_analysis"], safety_analysis_node))
+    workflow.add_node("legal_analysis", _with_budget("legal_analysis", ["legal_analysis"], legal_analysis_node))
     workflow.add_node("final_synthesis", final_synthesis_node)
     
     # Set entry point - start with parallel web searches
@@ -365,15 +462,18 @@ def create_protest_guidance_graph():
     workflow.add_edge("political_rag_search", "merge_data")
     workflow.add_edge("social_rag_search", "merge_data")
     
-    # After merging, start parallel analyses
-    workflow.add_edge("merge_data", "economic_analysis")
-    workflow.add_edge("merge_data", "political_analysis")
-    workflow.add_edge("merge_data", "social_analysis")
+    # After merging, start parallel analyses (or the single combined analysis)
+    workflow.add_conditional_edges(
+        "merge_data",
+        route_analysis,
+        ["economic_analysis", "political_analysis", "social_analysis", "combined_analysis"]
+    )
     
     # All analyses feed into safety analysis
     workflow.add_edge("economic_analysis", "safety_analysis")
     workflow.add_edge("political_analysis", "safety_analysis")
     workflow.add_edge("social_analysis", "safety_analysis")
+    workflow.add_edge("combined_analysis", "safety_analysis")
     
     # Safety leads to legal
     workflow.add_edge("safety_analysis", "legal_analysis")
@@ -400,9 +500,16 @@ def get_agent():
 
 
 # Helper function to run the agent
-def run_protest_guidance(question: str):
-    """Run the protest guidance agent with a question."""
+def run_protest_guidance(question: str, analysis_mode: str = None, traffic_class: str = "interactive",
+                         latency_budget=_DEFAULT):
+    """Run the protest guidance agent with a question.
+
+    latency_budget is in seconds (default config.LATENCY_BUDGET_SECONDS);
+    None or 0 runs without a budget.
+    """
     agent = get_agent()
+    if latency_budget is _DEFAULT:
+        latency_budget = config.LATENCY_BUDGET_SECONDS
     initial_state = {
         "messages": [HumanMessage(content=question)],
         "web_results": "",
@@ -418,7 +525,13 @@ def run_protest_guidance(question: str):
         "social_analysis": "",
         "safety_analysis": "",
         "legal_analysis": "",
-        "final_answer": ""
+        "final_answer": "",
+        "analysis_mode": analysis_mode or config.ANALYSIS_MODE,
+        "conversation_context": "",
+        "traffic_class": traffic_class,
+        "latency_budget": latency_budget,
+        "deadline": time.time() + latency_budget if latency_budget else None,
+        "skipped": []
     }
     
     result = agent.invoke(initial_state)
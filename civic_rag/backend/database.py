@@ -6,6 +6,152 @@ import os
 
 DB_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'queries.db')
 
+# Rollup tables maintained by triggers: granularity -> (table, SQLite bucket expression,
+# SQLite expression for the start of the next bucket); a bucket's rows have
+# timestamps in [bucket, next bucket)
+ROLLUP_TABLES = {
+	'hour': ('query_rollups_hourly', "strftime('%Y-%m-%d %H:00', {ts})", "strftime('%Y-%m-%d %H:00', {ts}, '+1 hour')"),
+	'day': ('query_rollups_daily', "date({ts})", "date({ts}, '+1 day')"),
+}
+
+def _column_names(c, table: str) -> List[str]:
+	return [row[1] for row in c.execute(f'PRAGMA table_info({table})').fetchall()]
+
+def _table_exists(c, name: str) -> bool:
+	return c.execute("SELECT 1 FROM sqlite_master WHERE name = ?", (name,)).fetchone() is not None
+
+def _init_fts(c):
+	"""External-content FTS5 index over questions and answers, kept in sync by triggers."""
+	if _table_exists(c, 'queries_fts'):
+		return
+	try:
+		c.execute("CREATE VIRTUAL TABLE queries_fts USING fts5(question, answer, content='queries', content_rowid='id')")
+	except sqlite3.OperationalError as e:
+		# SQLite built without FTS5: search_queries falls back to LIKE scans
+		print(f"⚠️ FTS5 unavailable, full-text search will be slow: {e}")
+		return
+	c.executescript('''
+		CREATE TRIGGER IF NOT EXISTS queries_fts_ai AFTER INSERT ON queries BEGIN
+			INSERT INTO queries_fts(rowid, question, answer) VALUES (new.id, new.question, new.answer);
+		END;
+		CREATE TRIGGER IF NOT EXISTS queries_fts_ad AFTER DELETE ON queries BEGIN
+			INSERT INTO queries_fts(queries_fts, rowid, question, answer) VALUES ('delete', old.id, old.question, old.answer);
+		END;
+		CREATE TRIGGER IF NOT EXISTS queries_fts_au AFTER UPDATE OF question, answer ON queries BEGIN
+			INSERT INTO queries_fts(queries_fts, rowid, question, answer) VALUES ('delete', old.id, old.question, old.answer);
+			INSERT INTO queries_fts(rowid, question, answer) VALUES (new.id, new.question, new.answer);
+		END;
+	''')
+	# Index rows logged before the FTS table existed
+	c.execute("INSERT INTO queries_fts(queries_fts) VALUES ('rebuild')")
+
+def _rollup_triggers(table: str, bucket: str, next_bucket: str) -> str:
+	"""Triggers adding inserted rows to a rollup and removing deleted ones; updates do both."""
+	new_bucket, old_bucket = bucket.format(ts='new.timestamp'), bucket.format(ts='old.timestamp')
+	add_new = f'''
+		INSERT INTO {table} (bucket, country, topic, query_count, latency_count, latency_total_ms, latency_max_ms)
+		VALUES ({new_bucket}, COALESCE(new.country, ''), COALESCE(new.topic, ''), 1,
+			new.latency_ms IS NOT NULL, COALESCE(new.latency_ms, 0), new.latency_ms)
+		ON CONFLICT (bucket, country, topic) DO UPDATE SET
+			query_count = query_count + 1,
+			latency_count = latency_count + excluded.latency_count,
+			latency_total_ms = latency_total_ms + excluded.latency_total_ms,
+			latency_max_ms = MAX(COALESCE(latency_max_ms, excluded.latency_max_ms), COALESCE(excluded.latency_max_ms, latency_max_ms));
+	'''
+	# The maximum is only recomputed (over the bucket's timestamp range, using
+	# idx_queries_timestamp) when the removed row held it
+	remove_old = f'''
+		UPDATE {table} SET
+			query_count = query_count - 1,
+			latency_count = latency_count - (old.latency_ms IS NOT NULL),
+			latency_total_ms = latency_total_ms - COALESCE(old.latency_ms, 0),
+			latency_max_ms = CASE WHEN old.latency_ms IS NOT NULL AND old.latency_ms >= latency_max_ms THEN (
+				SELECT MAX(latency_ms) FROM queries
+				WHERE timestamp >= {old_bucket} AND timestamp < {next_bucket.format(ts='old.timestamp')}
+					AND COALESCE(country, '') = COALESCE(old.country, '') AND COALESCE(topic, '') = COALESCE(old.topic, '')
+			) ELSE latency_max_ms END
+		WHERE bucket = {old_bucket} AND country = COALESCE(old.country, '') AND topic = COALESCE(old.topic, '');
+	'''
+	return f'''
+		DROP TRIGGER IF EXISTS {table}_ai;
+		DROP TRIGGER IF EXISTS {table}_ad;
+		DROP TRIGGER IF EXISTS {table}_au;
+		CREATE TRIGGER {table}_ai AFTER INSERT ON queries BEGIN {add_new} END;
+		CREATE TRIGGER {table}_ad AFTER DELETE ON queries BEGIN {remove_old} END;
+		CREATE TRIGGER {table}_au AFTER UPDATE OF country, topic, latency_ms, timestamp ON queries BEGIN
+			{remove_old}
+			{add_new}
+		END;
+	'''
+
+def _create_rollup_table(c, table: str, bucket: str):
+	"""Create a rollup table and backfill it from rows logged before it existed."""
+	c.execute(f'''
+		CREATE TABLE {table} (
+			bucket TEXT NOT NULL,
+			country TEXT NOT NULL DEFAULT '',
+			topic TEXT NOT NULL DEFAULT '',
+			query_count INTEGER NOT NULL DEFAULT 0,
+			latency_count INTEGER NOT NULL DEFAULT 0,
+			latency_total_ms REAL NOT NULL DEFAULT 0,
+			latency_max_ms REAL,
+			PRIMARY KEY (bucket, country, topic)
+		)
+	''')
+	c.execute(f'''
+		INSERT INTO {table} (bucket, country, topic, query_count, latency_count, latency_total_ms, latency_max_ms)
+		SELECT {bucket.format(ts='timestamp')}, COALESCE(country, ''), COALESCE(topic, ''), COUNT(*),
+			COUNT(latency_ms), COALESCE(SUM(latency_ms), 0), MAX(latency_ms)
+		FROM queries GROUP BY 1, 2, 3
+	''')
+
+def _init_rollups(c):
+	"""Hourly/daily volume and latency rollups per country and topic, updated incrementally by triggers."""
+	for table, bucket, next_bucket in ROLLUP_TABLES.values():
+		if not _table_exists(c, table):
+			_create_rollup_table(c, table, bucket)
+		# Recreated every time, so databases created with older triggers pick up the current ones
+		c.executescript(_rollup_triggers(table, bucket, next_bucket))
+
+def _init_question_counts(c):
+	"""Running count per normalized question, for top-question reports and cache warming."""
+	if not _table_exists(c, 'question_counts'):
+		c.executescript('''
+			CREATE TABLE question_counts (
+				normalized TEXT PRIMARY KEY,
+				question TEXT NOT NULL,
+				query_count INTEGER NOT NULL DEFAULT 0,
+				last_asked DATETIME
+			);
+			CREATE INDEX IF NOT EXISTS idx_question_counts_count ON question_counts (query_count DESC);
+			INSERT INTO question_counts (normalized, question, query_count, last_asked)
+				SELECT lower(trim(question)), MAX(question), COUNT(*), MAX(timestamp) FROM queries GROUP BY 1;
+		''')
+	remove_old = '''
+		UPDATE question_counts SET query_count = query_count - 1 WHERE normalized = lower(trim(old.question));
+	'''
+	# An edited question moves to its new key without becoming the most recently asked
+	add_new = '''
+		INSERT INTO question_counts (normalized, question, query_count, last_asked)
+		VALUES (lower(trim(new.question)), new.question, 1, new.timestamp)
+		ON CONFLICT (normalized) DO UPDATE SET
+			query_count = query_count + 1,
+			question = excluded.question,
+			last_asked = MAX(COALESCE(last_asked, excluded.last_asked), excluded.last_asked);
+	'''
+	# Recreated every time, so databases created with older triggers pick up the current ones
+	c.executescript(f'''
+		DROP TRIGGER IF EXISTS question_counts_ai;
+		DROP TRIGGER IF EXISTS question_counts_ad;
+		DROP TRIGGER IF EXISTS question_counts_au;
+		CREATE TRIGGER question_counts_ai AFTER INSERT ON queries BEGIN {add_new} END;
+		CREATE TRIGGER question_counts_ad AFTER DELETE ON queries BEGIN {remove_old} END;
+		CREATE TRIGGER question_counts_au AFTER UPDATE OF question ON queries BEGIN
+			{remove_old}
+			{add_new}
+		END;
+	''')
+
 def init_db():
 	conn = sqlite3.connect(DB_PATH)
 	c = conn.cursor()
@@ -17,22 +163,31 @@ def init_db():
 			timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
 			country TEXT,
 			topic TEXT,
-			user_metadata TEXT
+			user_metadata TEXT,
+			latency_ms REAL
 		)
 	''')
+	if 'latency_ms' not in _column_names(c, 'queries'):
+		c.execute('ALTER TABLE queries ADD COLUMN latency_ms REAL')
+	c.execute('CREATE INDEX IF NOT EXISTS idx_queries_timestamp ON queries (timestamp)')
+	_init_fts(c)
+	_init_rollups(c)
+	_init_question_counts(c)
 	conn.commit()
 	conn.close()
 
-def save_query(question: str, answer: str, country: Optional[str]=None, topic: Optional[str]=None, user_metadata: Optional[str]=None):
+def save_query(question: str, answer: str, country: Optional[str]=None, topic: Optional[str]=None, user_metadata: Optional[str]=None, latency_ms: Optional[float]=None):
     answer_str = str(answer)  # Ensure answer is a string
     conn = sqlite3.connect(DB_PATH)
     c = conn.cursor()
+    # Triggers update the FTS index, rollups and question counts in the same transaction
     c.execute('''
-        INSERT INTO queries (question, answer, country, topic, user_metadata)
-        VALUES (?, ?, ?, ?, ?)
-    ''', (question, answer_str, country, topic, user_metadata))
+        INSERT INTO queries (question, answer, country, topic, user_metadata, latency_ms)
+        VALUES (?, ?, ?, ?, ?, ?)
+    ''', (question, answer_str, country, topic, user_metadata, latency_ms))
     conn.commit()
     conn.close()
+
 def get_queries(country: Optional[str]=None, topic: Optional[str]=None, limit: int=50) -> List[Dict[str, Any]]:
 	conn = sqlite3.connect(DB_PATH)
 	c = conn.cursor()
@@ -70,3 +225,99 @@ def get_query_count() -> int:
 	conn.close()
 	return count
 
+def _fts_match_expression(text: str) -> str:
+	"""Quotes each term so user text cannot inject FTS5 query syntax."""
+	return ' '.join('"' + term.replace('"', '""') + '"' for term in text.split())
+
+def search_queries(text: str, country: Optional[str]=None, topic: Optional[str]=None, limit: int=50) -> List[Dict[str, Any]]:
+	"""Full-text search over logged questions and answers, best matches first."""
+	conn = sqlite3.connect(DB_PATH)
+	c = conn.cursor()
+	if _table_exists(c, 'queries_fts'):
+		query = '''
+			SELECT q.id, q.question, q.answer, q.timestamp, q.country, q.topic, q.user_metadata, q.latency_ms,
+				snippet(queries_fts, -1, '[', ']', '…', 12)
+			FROM queries_fts JOIN queries q ON q.id = queries_fts.rowid
+			WHERE queries_fts MATCH ?
+		'''
+		params = [_fts_match_expression(text)]
+		order = ' ORDER BY bm25(queries_fts)'
+	else:
+		query = '''
+			SELECT q.id, q.question, q.answer, q.timestamp, q.country, q.topic, q.user_metadata, q.latency_ms, NULL
+			FROM queries q WHERE (q.question LIKE ? OR q.answer LIKE ?)
+		'''
+		params = [f'%{text}%', f'%{text}%']
+		order = ' ORDER BY q.timestamp DESC'
+	if country:
+		query += ' AND q.country = ?'
+		params.append(country)
+	if topic:
+		query += ' AND q.topic = ?'
+		params.append(topic)
+	query += order + ' LIMIT ?'
+	params.append(limit)
+	rows = c.execute(query, params).fetchall() if text.strip() else []
+	conn.close()
+	return [
+		{
+			'id': row[0],
+			'question': row[1],
+			'answer': row[2],
+			'timestamp': row[3],
+			'country': row[4],
+			'topic': row[5],
+			'user_metadata': row[6],
+			'latency_ms': row[7],
+			'snippet': row[8],
+		}
+		for row in rows
+	]
+
+def get_rollups(granularity: str='hour', since: Optional[str]=None, until: Optional[str]=None,
+				country: Optional[str]=None, topic: Optional[str]=None, group_by: Optional[str]=None) -> List[Dict[str, Any]]:
+	"""Query volume and latency per hour or day, read from the precomputed rollup tables.
+
+	since/until are bucket strings ('2024-09-08 14:00' for hours, '2024-09-08'
+	for days), inclusive. group_by='country' or 'topic' splits each bucket.
+	"""
+	if granularity not in ROLLUP_TABLES:
+		raise ValueError(f"Unknown granularity {granularity!r}, expected one of {list(ROLLUP_TABLES)}")
+	if group_by not in (None, 'country', 'topic'):
+		raise ValueError(f"Unknown group_by {group_by!r}, expected 'country' or 'topic'")
+	table = ROLLUP_TABLES[granularity][0]
+	key = f", {group_by}" if group_by else ''
+	query = f'''
+		SELECT bucket{key}, SUM(query_count), SUM(latency_count), SUM(latency_total_ms), MAX(latency_max_ms)
+		FROM {table} WHERE query_count > 0
+	'''
+	params = []
+	for clause, value in (('bucket >= ?', since), ('bucket <= ?', until), ('country = ?', country), ('topic = ?', topic)):
+		if value:
+			query += f' AND {clause}'
+			params.append(value)
+	query += f' GROUP BY bucket{key} ORDER BY bucket{key}'
+	conn = sqlite3.connect(DB_PATH)
+	rows = conn.execute(query, params).fetchall()
+	conn.close()
+	results = []
+	for row in rows:
+		offset = 1 if group_by else 0
+		count, latency_count, latency_total, latency_max = row[1 + offset:]
+		entry = {'bucket': row[0], 'count': count}
+		if group_by:
+			entry[group_by] = row[1] or None
+		entry['avg_latency_ms'] = latency_total / latency_count if latency_count else None
+		entry['max_latency_ms'] = latency_max
+		results.append(entry)
+	return results
+
+def get_top_questions(limit: int=20) -> List[Dict[str, Any]]:
+	"""Most frequently asked questions (case/whitespace-insensitive), e.g. for cache warming."""
+	conn = sqlite3.connect(DB_PATH)
+	rows = conn.execute('''
+		SELECT question, query_count, last_asked FROM question_counts
+		WHERE query_count > 0 ORDER BY query_count DESC LIMIT ?
+	''', (limit,)).fetchall()
+	conn.close()
+	return [{'question': row[0], 'count': row[1], 'last_asked': row[2]} for row in rows]
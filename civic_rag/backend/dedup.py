@@ -0,0 +1,169 @@
+"""
+Near-duplicate chunk detection between splitting and embedding.
+
+Amended acts, reprinted guidelines and news compilations repeat the same
+paragraphs across files. Each chunk gets a MinHash signature over its word
+shingles; LSH banding finds candidate matches among the chunks seen so far
+(including those already in the index), and a candidate whose estimated
+Jaccard similarity reaches DEDUP_THRESHOLD makes the chunk a duplicate.
+Chunks only match within the same partition (collection, jurisdiction, topic
+and doc_type), so metadata filters and collection routing still find every
+copy. Only the first (canonical) copy is embedded; every copy is recorded as
+a source of the canonical chunk, so provenance is kept in the docstore.
+"""
+
+import hashlib
+import re
+import zlib
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+import civic_rag.config as config
+from civic_rag.backend.docstore import PARENT_CONTENT_KEY
+from civic_rag.backend.partitions import PARTITION_KEYS, collection_for
+
+# Metadata key holding a chunk's id in Chroma and in the docstore
+CHUNK_ID_KEY = 'chunk_id'
+# Metadata key set on retrieved chunks that stand for several collapsed copies:
+# a list of {"source_file", "page"} for every copy, the canonical one first
+CHUNK_SOURCES_KEY = 'chunk_sources'
+
+# Universal hashing (a * x + b) mod p over 32-bit shingle hashes; p > 2^32 and
+# a * x + b < 2^64, so the arithmetic never overflows uint64
+_PRIME = np.uint64(4294967311)
+
+
+def chunk_id(doc: Any) -> str:
+    """Deterministic id for a chunk, stable across re-ingestion of the same file."""
+    metadata = doc.metadata
+    key = (f"{metadata.get('source_file', '')}|{metadata.get('page', '')}|"
+           f"{metadata.get('parent_id', '')}|{doc.page_content}")
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()[:16]
+
+
+def partition_key(metadata: Dict[str, Any]) -> str:
+    """Partition a chunk is deduplicated within: its collection and partition metadata."""
+    return "|".join([collection_for(metadata)] + [str(metadata.get(key) or '') for key in PARTITION_KEYS])
+
+
+def _permutations(num_perm: int) -> Tuple[np.ndarray, np.ndarray]:
+    # Fixed seed: signatures stored in the docstore must stay comparable across runs
+    rng = np.random.default_rng(20240908)
+    a = rng.integers(1, 1 << 32, size=num_perm, dtype=np.uint64)
+    b = rng.integers(0, 1 << 32, size=num_perm, dtype=np.uint64)
+    return a, b
+
+
+def _shingle_hashes(text: str, shingle_size: int) -> np.ndarray:
+    words = re.findall(r"\w+", text.lower())
+    if not words:
+        return np.zeros(0, dtype=np.uint64)
+    size = min(shingle_size, len(words))
+    shingles = {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+    return np.fromiter((zlib.crc32(s.encode('utf-8')) for s in shingles), dtype=np.uint64, count=len(shingles))
+
+
+class NearDuplicateIndex:
+    """MinHash signatures with LSH buckets for finding near-duplicate chunks."""
+
+    def __init__(self, threshold: float = config.DEDUP_THRESHOLD,
+                 num_perm: int = config.DEDUP_NUM_PERM,
+                 bands: int = config.DEDUP_LSH_BANDS,
+                 shingle_size: int = config.DEDUP_SHINGLE_SIZE):
+        if num_perm % bands:
+            raise ValueError(f"DEDUP_NUM_PERM ({num_perm}) must be a multiple of DEDUP_LSH_BANDS ({bands})")
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        self._a, self._b = _permutations(num_perm)
+        self._buckets: List[Dict[bytes, List[str]]] = [{} for _ in range(bands)]
+        self._signatures: Dict[str, np.ndarray] = {}
+
+    def signature(self, text: str) -> Optional[np.ndarray]:
+        """MinHash signature of a text, or None if it has no words."""
+        hashes = _shingle_hashes(text, self.shingle_size)
+        if hashes.size == 0:
+            return None
+        return ((np.outer(hashes, self._a) + self._b) % _PRIME).min(axis=0)
+
+    def _band_keys(self, signature: np.ndarray, partition: str):
+        # Prefixing the partition keeps LSH buckets, and so matches, within one partition
+        prefix = partition.encode('utf-8') + b'\0'
+        for band in range(self.bands):
+            yield band, prefix + signature[band * self.rows:(band + 1) * self.rows].tobytes()
+
+    def add(self, key: str, signature: np.ndarray, partition: str = ''):
+        self._signatures[key] = signature
+        for band, band_key in self._band_keys(signature, partition):
+            self._buckets[band].setdefault(band_key, []).append(key)
+
+    def find(self, signature: np.ndarray, partition: str = '') -> Optional[Tuple[str, float]]:
+        """Most similar key indexed in the partition at or above the threshold, with its estimated Jaccard."""
+        candidates = set()
+        for band, band_key in self._band_keys(signature, partition):
+            candidates.update(self._buckets[band].get(band_key, ()))
+        best = None
+        for key in candidates:
+            similarity = float(np.mean(self._signatures[key] == signature))
+            if similarity >= self.threshold and (best is None or similarity > best[1]):
+                best = (key, similarity)
+        return best
+
+    def __len__(self) -> int:
+        return len(self._signatures)
+
+
+def deduplicate_chunks(docs: List[Any],
+                       existing: Optional[Dict[str, Tuple[bytes, Dict[str, Any]]]] = None) -> Dict[str, Any]:
+    """Collapse near-duplicate chunks, keeping the first copy of each as canonical.
+
+    existing maps chunk ids already in the index to their stored signatures and
+    metadata, so new chunks that repeat indexed text in the same partition are
+    dropped too. Returns the chunks to
+    embed (tagged with CHUNK_ID_KEY), the provenance rows for every input
+    chunk as (canonical_id, source_file, metadata), the new signatures to
+    store, and a report.
+    """
+    index = NearDuplicateIndex()
+    for key, (blob, metadata) in (existing or {}).items():
+        index.add(key, np.frombuffer(blob, dtype=np.uint64), partition_key(metadata))
+
+    kept, sources, signatures = [], [], {}
+    kept_ids = set()
+    duplicates_of_indexed = 0
+    for doc in docs:
+        doc_id = chunk_id(doc)
+        source = doc.metadata.get('source_file') or doc.metadata.get('source', '')
+        partition = partition_key(doc.metadata)
+        signature = index.signature(doc.page_content)
+        match = index.find(signature, partition) if signature is not None else None
+        if match is None and doc_id in kept_ids:
+            # Exact repeat of a chunk without words (no signature)
+            match = (doc_id, 1.0)
+        canonical_id = match[0] if match else doc_id
+        metadata = {k: v for k, v in doc.metadata.items() if k != PARENT_CONTENT_KEY}
+        metadata[CHUNK_ID_KEY] = canonical_id
+        sources.append((canonical_id, source, metadata))
+        if match:
+            if match[0] not in kept_ids:
+                duplicates_of_indexed += 1
+            continue
+        doc.metadata[CHUNK_ID_KEY] = doc_id
+        kept.append(doc)
+        kept_ids.add(doc_id)
+        if signature is not None:
+            index.add(doc_id, signature, partition)
+            signatures[doc_id] = (source, signature.tobytes())
+
+    total = len(docs)
+    report = {
+        "chunks": total,
+        "kept": len(kept),
+        "duplicates": total - len(kept),
+        "duplicates_of_indexed": duplicates_of_indexed,
+        "shrink_ratio": (total - len(kept)) / total if total else 0.0,
+    }
+    return {"kept": kept, "sources": sources, "signatures": signatures, "report": report}
@@ -0,0 +1,367 @@
+"""
+SQLite side store for the parent sections and file manifest of a vector store.
+
+Only the small child chunks are embedded in Chroma; each child carries the id
+of the larger parent section it was cut from, and the parent text lives here,
+next to the Chroma files in the same persist directory. The `files` table
+records which version of each source PDF is indexed, so incremental ingestion
+can skip unchanged files. Near-duplicate detection stores a MinHash signature
+per embedded chunk in `chunk_signatures` and every source of each chunk in
+`chunk_sources`.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+from typing import Any, Dict, Iterable, List, Tuple, Optional
+
+DOCSTORE_FILENAME = 'docstore.sqlite'
+
+# Metadata keys set on child chunks during ingestion
+PARENT_ID_KEY = 'parent_id'
+# Transient key: carries the parent text from ingestion to the docstore and is
+# stripped before the chunk is written to Chroma
+PARENT_CONTENT_KEY = 'parent_content'
+
+
+def _connect(persist_directory: str) -> sqlite3.Connection:
+    os.makedirs(persist_directory, exist_ok=True)
+    conn = sqlite3.connect(os.path.join(persist_directory, DOCSTORE_FILENAME))
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS parents (
+            id TEXT PRIMARY KEY,
+            content TEXT NOT NULL,
+            source_file TEXT
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS files (
+            source_file TEXT PRIMARY KEY,
+            size INTEGER,
+            mtime REAL,
+            sha1 TEXT,
+            chunk_count INTEGER,
+            indexed_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS chunk_signatures (
+            chunk_id TEXT PRIMARY KEY,
+            source_file TEXT,
+            signature BLOB NOT NULL
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS chunk_sources (
+            chunk_id TEXT NOT NULL,
+            source_file TEXT,
+            metadata TEXT NOT NULL
+        )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_chunk_sources_chunk ON chunk_sources (chunk_id)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_chunk_sources_file ON chunk_sources (source_file)')
+    if not conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = 'idx_chunk_sources_copy'"
+    ).fetchone():
+        # Docstores written before re-ingestion was idempotent may hold repeated rows
+        conn.execute('''
+            DELETE FROM chunk_sources WHERE rowid NOT IN (
+                SELECT MIN(rowid) FROM chunk_sources GROUP BY chunk_id, source_file, metadata
+            )
+        ''')
+        conn.execute(
+            'CREATE UNIQUE INDEX idx_chunk_sources_copy ON chunk_sources (chunk_id, source_file, metadata)'
+        )
+        conn.commit()
+    return conn
+
+
+def save_parents(parents: Dict[str, Tuple[str, Optional[str]]], persist_directory: str):
+    """Store parent sections as {parent_id: (content, source_file)}."""
+    conn = _connect(persist_directory)
+    conn.executemany(
+        'INSERT OR REPLACE INTO parents (id, content, source_file) VALUES (?, ?, ?)',
+        [(parent_id, content, source) for parent_id, (content, source) in parents.items()]
+    )
+    conn.commit()
+    conn.close()
+
+
+def get_parents(parent_ids: List[str], persist_directory: str) -> Dict[str, str]:
+    """Fetch parent text for the given ids; unknown ids are omitted."""
+    unique_ids = list(dict.fromkeys(parent_ids))
+    if not unique_ids or not os.path.exists(os.path.join(persist_directory, DOCSTORE_FILENAME)):
+        return {}
+    conn = _connect(persist_directory)
+    placeholders = ','.join('?' for _ in unique_ids)
+    rows = conn.execute(
+        f'SELECT id, content FROM parents WHERE id IN ({placeholders})', unique_ids
+    ).fetchall()
+    conn.close()
+    return {row[0]: row[1] for row in rows}
+
+
+def count_parents(persist_directory: str) -> int:
+    """Number of parent sections stored for a vector store."""
+    if not os.path.exists(os.path.join(persist_directory, DOCSTORE_FILENAME)):
+        return 0
+    conn = _connect(persist_directory)
+    count = conn.execute('SELECT COUNT(*) FROM parents').fetchone()[0]
+    conn.close()
+    return count
+
+
+def list_parents(persist_directory: str) -> List[Tuple[str, str, Optional[str]]]:
+    """All parent sections as (id, content, source_file), ordered by id."""
+    if not os.path.exists(os.path.join(persist_directory, DOCSTORE_FILENAME)):
+        return []
+    conn = _connect(persist_directory)
+    rows = conn.execute('SELECT id, content, source_file FROM parents ORDER BY id').fetchall()
+    conn.close()
+    return rows
+
+
+def delete_parents_for_source(source_file: str, persist_directory: str,
+                              keep: Optional[Iterable[str]] = None):
+    """Drop the parent sections of a source file, except the parent ids in keep.
+
+    keep holds the parents of a freshly re-indexed version of the file.
+    """
+    keep = set(keep or ())
+    conn = _connect(persist_directory)
+    stale = [(row[0],) for row in conn.execute(
+        'SELECT id FROM parents WHERE source_file = ?', (source_file,)
+    ).fetchall() if row[0] not in keep]
+    conn.executemany('DELETE FROM parents WHERE id = ?', stale)
+    conn.commit()
+    conn.close()
+
+
+def file_fingerprint(path: str) -> Tuple[int, float, str]:
+    """Size, mtime and SHA-1 of a file, used to detect changed sources."""
+    stat = os.stat(path)
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return stat.st_size, stat.st_mtime, digest.hexdigest()
+
+
+def get_file_record(source_file: str, persist_directory: str) -> Optional[Dict[str, Any]]:
+    """Manifest entry for an indexed source file, or None."""
+    conn = _connect(persist_directory)
+    row = conn.execute(
+        'SELECT source_file, size, mtime, sha1, chunk_count, indexed_at FROM files WHERE source_file = ?',
+        (source_file,)
+    ).fetchone()
+    conn.close()
+    if row is None:
+        return None
+    return {
+        'source_file': row[0],
+        'size': row[1],
+        'mtime': row[2],
+        'sha1': row[3],
+        'chunk_count': row[4],
+        'indexed_at': row[5],
+    }
+
+
+def list_file_records(persist_directory: str) -> List[Dict[str, Any]]:
+    """All manifest entries for a vector store."""
+    if not os.path.exists(os.path.join(persist_directory, DOCSTORE_FILENAME)):
+        return []
+    conn = _connect(persist_directory)
+    rows = conn.execute(
+        'SELECT source_file, size, mtime, sha1, chunk_count, indexed_at FROM files ORDER BY source_file'
+    ).fetchall()
+    conn.close()
+    return [
+        {
+            'source_file': row[0],
+            'size': row[1],
+            'mtime': row[2],
+            'sha1': row[3],
+            'chunk_count': row[4],
+            'indexed_at': row[5],
+        }
+        for row in rows
+    ]
+
+
+def save_file_record(source_file: str, size: int, mtime: float, sha1: str,
+                     chunk_count: int, persist_directory: str):
+    """Record that a version of a source file has been indexed."""
+    conn = _connect(persist_directory)
+    conn.execute('''
+        INSERT OR REPLACE INTO files (source_file, size, mtime, sha1, chunk_count, indexed_at)
+        VALUES (?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+    ''', (source_file, size, mtime, sha1, chunk_count))
+    conn.commit()
+    conn.close()
+
+
+def save_file_records(records: List[Dict[str, Any]], persist_directory: str):
+    """Restore manifest entries as returned by list_file_records, keeping their indexed_at."""
+    conn = _connect(persist_directory)
+    conn.executemany('''
+        INSERT OR REPLACE INTO files (source_file, size, mtime, sha1, chunk_count, indexed_at)
+        VALUES (?, ?, ?, ?, ?, ?)
+    ''', [(r['source_file'], r['size'], r['mtime'], r['sha1'], r['chunk_count'], r['indexed_at']) for r in records])
+    conn.commit()
+    conn.close()
+
+
+def delete_file_record(source_file: str, persist_directory: str):
+    """Forget a source file in the manifest."""
+    conn = _connect(persist_directory)
+    conn.execute('DELETE FROM files WHERE source_file = ?', (source_file,))
+    conn.commit()
+    conn.close()
+
+
+def save_chunk_signatures(signatures: Dict[str, Tuple[str, bytes]], persist_directory: str):
+    """Store MinHash signatures as {chunk_id: (source_file, signature bytes)}."""
+    conn = _connect(persist_directory)
+    conn.executemany(
+        'INSERT OR REPLACE INTO chunk_signatures (chunk_id, source_file, signature) VALUES (?, ?, ?)',
+        [(chunk_id, source, blob) for chunk_id, (source, blob) in signatures.items()]
+    )
+    conn.commit()
+    conn.close()
+
+
+def load_chunk_signatures(persist_directory: str,
+                          exclude_sources: Iterable[str] = ()) -> Dict[str, Tuple[bytes, Dict[str, Any]]]:
+    """Stored signatures as {chunk_id: (signature bytes, metadata of the embedded copy)}.
+
+    Signatures owned by exclude_sources (files being re-indexed) are left out.
+    """
+    excluded = set(exclude_sources)
+    if not os.path.exists(os.path.join(persist_directory, DOCSTORE_FILENAME)):
+        return {}
+    conn = _connect(persist_directory)
+    rows = conn.execute('''
+        SELECT s.chunk_id, s.signature, (
+            SELECT metadata FROM chunk_sources c
+            WHERE c.chunk_id = s.chunk_id AND c.source_file = s.source_file
+            ORDER BY c.rowid LIMIT 1
+        ), s.source_file
+        FROM chunk_signatures s
+    ''').fetchall()
+    conn.close()
+    return {row[0]: (row[1], json.loads(row[2]) if row[2] else {}) for row in rows if row[3] not in excluded}
+
+
+def list_chunk_signatures(persist_directory: str) -> List[Tuple[str, Optional[str], bytes]]:
+    """All stored signatures as (chunk_id, source_file, signature bytes)."""
+    if not os.path.exists(os.path.join(persist_directory, DOCSTORE_FILENAME)):
+        return []
+    conn = _connect(persist_directory)
+    rows = conn.execute('SELECT chunk_id, source_file, signature FROM chunk_signatures ORDER BY chunk_id').fetchall()
+    conn.close()
+    return rows
+
+
+def save_chunk_sources(sources: List[Tuple[str, str, Dict[str, Any]]], persist_directory: str):
+    """Record (chunk_id, source_file, chunk metadata) for every copy of a chunk.
+
+    Copies already recorded (the same file re-ingested) are skipped.
+    """
+    conn = _connect(persist_directory)
+    conn.executemany(
+        'INSERT OR IGNORE INTO chunk_sources (chunk_id, source_file, metadata) VALUES (?, ?, ?)',
+        [(chunk_id, source, json.dumps(metadata, default=str)) for chunk_id, source, metadata in sources]
+    )
+    conn.commit()
+    conn.close()
+
+
+def list_chunk_sources(persist_directory: str) -> List[Tuple[str, str, Dict[str, Any]]]:
+    """Every provenance row as (chunk_id, source_file, metadata), in ingestion order."""
+    if not os.path.exists(os.path.join(persist_directory, DOCSTORE_FILENAME)):
+        return []
+    conn = _connect(persist_directory)
+    rows = conn.execute('SELECT chunk_id, source_file, metadata FROM chunk_sources ORDER BY rowid').fetchall()
+    conn.close()
+    return [(row[0], row[1], json.loads(row[2])) for row in rows]
+
+
+def get_chunk_sources(chunk_ids: List[str], persist_directory: str) -> Dict[str, List[Dict[str, Any]]]:
+    """Metadata of every source copy of the given chunks, in ingestion order."""
+    unique_ids = list(dict.fromkeys(chunk_ids))
+    if not unique_ids or not os.path.exists(os.path.join(persist_directory, DOCSTORE_FILENAME)):
+        return {}
+    conn = _connect(persist_directory)
+    placeholders = ','.join('?' for _ in unique_ids)
+    rows = conn.execute(
+        f'SELECT chunk_id, metadata FROM chunk_sources WHERE chunk_id IN ({placeholders}) ORDER BY rowid',
+        unique_ids
+    ).fetchall()
+    conn.close()
+    sources = {}
+    for chunk_id, metadata in rows:
+        sources.setdefault(chunk_id, []).append(json.loads(metadata))
+    return sources
+
+
+def release_chunks_for_source(source_file: str, persist_directory: str) -> Dict[str, Dict[str, Any]]:
+    """Drop a source file's provenance rows before it leaves the index.
+
+    Canonical chunks of the file that another source also contains are handed
+    over to the earliest remaining copy: returns {chunk_id: metadata of that
+    copy}, to be written to the vector store instead of deleting the chunk.
+    Signatures of chunks no other source contains are deleted.
+    """
+    return release_chunks_for_sources([source_file], persist_directory)
+
+
+def release_chunks_for_sources(source_files: List[str], persist_directory: str,
+                               keep: Optional[List[Tuple[str, str, Dict[str, Any]]]] = None
+                               ) -> Dict[str, Dict[str, Any]]:
+    """release_chunks_for_source for several files at once.
+
+    After a re-index, keep holds the provenance rows of the new versions (as
+    passed to save_chunk_sources); those rows, and the chunks they point to,
+    are kept and only what the old versions alone had is released.
+    """
+    if not os.path.exists(os.path.join(persist_directory, DOCSTORE_FILENAME)):
+        return {}
+    kept_rows = {(chunk_id, source, json.dumps(metadata, default=str)) for chunk_id, source, metadata in keep or ()}
+    kept_ids = {row[0] for row in kept_rows}
+    conn = _connect(persist_directory)
+    handovers = {}
+    with conn:
+        owned, stale = [], []
+        for source_file in source_files:
+            owned.extend(row[0] for row in conn.execute(
+                'SELECT chunk_id FROM chunk_signatures WHERE source_file = ?', (source_file,)
+            ).fetchall() if row[0] not in kept_ids)
+            stale.extend((row[0],) for row in conn.execute(
+                'SELECT rowid, chunk_id, metadata FROM chunk_sources WHERE source_file = ?', (source_file,)
+            ).fetchall() if (row[1], source_file, row[2]) not in kept_rows)
+        # All stale rows go first, so no chunk is handed over to a copy that is itself being released
+        conn.executemany('DELETE FROM chunk_sources WHERE rowid = ?', stale)
+        for chunk_id in owned:
+            row = conn.execute(
+                'SELECT source_file, metadata FROM chunk_sources WHERE chunk_id = ? ORDER BY rowid LIMIT 1',
+                (chunk_id,)
+            ).fetchone()
+            if row is None:
+                conn.execute('DELETE FROM chunk_signatures WHERE chunk_id = ?', (chunk_id,))
+            else:
+                handovers[chunk_id] = json.loads(row[1])
+                conn.execute('UPDATE chunk_signatures SET source_file = ? WHERE chunk_id = ?', (row[0], chunk_id))
+    conn.close()
+    return handovers
+
+
+def count_chunk_sources(persist_directory: str) -> int:
+    """Number of chunk copies seen at ingestion (embedded or collapsed)."""
+    if not os.path.exists(os.path.join(persist_directory, DOCSTORE_FILENAME)):
+        return 0
+    conn = _connect(persist_directory)
+    count = conn.execute('SELECT COUNT(*) FROM chunk_sources').fetchone()[0]
+    conn.close()
+    return count
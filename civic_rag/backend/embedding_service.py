@@ -0,0 +1,333 @@
+"""
+Shared embedding service and its drop-in client.
+
+One process owns the embedding model and serves it over localhost HTTP or a
+Unix socket; every app worker and script uses RemoteEmbeddings instead of
+loading its own copy, so memory stays flat as workers are added. Concurrent
+requests are micro-batched: the batcher waits up to EMBEDDING_BATCH_WINDOW_MS
+after the first pending request for others to arrive and embeds them in one
+model call (up to EMBEDDING_MAX_BATCH_SIZE texts).
+
+Protocol (JSON over HTTP):
+
+    POST /embed   {"texts": [...], "kind": "documents" | "query"}
+                  -> {"model": ..., "embeddings": [[...], ...]}
+    GET  /health  -> {"model": ..., "dimension": ..., "stats": {...}}
+"""
+
+import http.client
+import json
+import os
+import queue
+import socket
+import socketserver
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlparse
+
+from langchain_core.embeddings import Embeddings
+
+import civic_rag.config as config
+from civic_rag.backend.stats import percentile
+
+EMBED_KINDS = ("documents", "query")
+
+
+class EmbeddingServiceError(RuntimeError):
+    """The embedding service is unreachable, failed, or serves a different model."""
+
+
+class _PendingRequest:
+    def __init__(self, texts: List[str], kind: str):
+        self.texts = texts
+        self.kind = kind
+        self.enqueued = time.monotonic()
+        self.done = threading.Event()
+        self.embeddings: Optional[List[List[float]]] = None
+        self.error: Optional[Exception] = None
+
+
+class MicroBatcher:
+    """Collects concurrent embedding requests and runs them through the model in batches."""
+
+    def __init__(self, embeddings: Embeddings,
+                 window_seconds: float = config.EMBEDDING_BATCH_WINDOW_MS / 1000,
+                 max_batch_size: int = config.EMBEDDING_MAX_BATCH_SIZE,
+                 queries_as_documents: bool = False):
+        self.embeddings = embeddings
+        # True when the model encodes queries exactly like documents, so
+        # concurrent queries can share one embed_documents call
+        self.queries_as_documents = queries_as_documents
+        self.window_seconds = window_seconds
+        self.max_batch_size = max_batch_size
+        self._queue: "queue.Queue[_PendingRequest]" = queue.Queue()
+        self._stats_lock = threading.Lock()
+        self._stats = {"requests": 0, "texts": 0, "batches": 0, "max_batch_texts": 0,
+                       "errors": 0, "model_seconds": 0.0}
+        self._recent_waits = deque(maxlen=1000)
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def embed(self, texts: List[str], kind: str = "documents") -> List[List[float]]:
+        """Queue texts for the next batch and block until they are embedded."""
+        if not texts:
+            return []
+        pending = _PendingRequest(texts, kind)
+        self._queue.put(pending)
+        pending.done.wait()
+        if pending.error is not None:
+            raise pending.error
+        return pending.embeddings
+
+    def _collect(self) -> List[_PendingRequest]:
+        batch = [self._queue.get()]
+        size = len(batch[0].texts)
+        closes = time.monotonic() + self.window_seconds
+        while size < self.max_batch_size:
+            remaining = closes - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                pending = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            batch.append(pending)
+            size += len(pending.texts)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            started = time.monotonic()
+            # Query and document embeddings may be encoded differently, so they never share a model call
+            for kind in EMBED_KINDS:
+                group = [pending for pending in batch if pending.kind == kind]
+                if group:
+                    self._embed_group(group, kind)
+            with self._stats_lock:
+                self._stats["batches"] += 1
+                self._stats["requests"] += len(batch)
+                texts = sum(len(pending.texts) for pending in batch)
+                self._stats["texts"] += texts
+                self._stats["max_batch_texts"] = max(self._stats["max_batch_texts"], texts)
+                self._stats["model_seconds"] += time.monotonic() - started
+                self._recent_waits.extend(started - pending.enqueued for pending in batch)
+
+    def _embed_group(self, group: List[_PendingRequest], kind: str):
+        texts = [text for pending in group for text in pending.texts]
+        try:
+            if kind == "query" and not self.queries_as_documents:
+                vectors = [self.embeddings.embed_query(text) for text in texts]
+            else:
+                vectors = self.embeddings.embed_documents(texts)
+        except Exception as e:
+            with self._stats_lock:
+                self._stats["errors"] += len(group)
+            for pending in group:
+                pending.error = e
+                pending.done.set()
+            return
+        offset = 0
+        for pending in group:
+            pending.embeddings = [list(map(float, v)) for v in vectors[offset:offset + len(pending.texts)]]
+            offset += len(pending.texts)
+            pending.done.set()
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            stats = dict(self._stats)
+            waits = sorted(self._recent_waits)
+
+        return {
+            **stats,
+            "queue_depth": self._queue.qsize(),
+            "mean_batch_texts": stats["texts"] / stats["batches"] if stats["batches"] else 0.0,
+            "wait_p50_seconds": percentile(waits, 0.50),
+            "wait_p95_seconds": percentile(waits, 0.95),
+        }
+
+
+class _EmbeddingHandler(BaseHTTPRequestHandler):
+    # Keep-alive, so clients reuse one connection per thread
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status: int, body: Dict[str, Any]):
+        payload = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        if self.path != "/health":
+            self._send_json(404, {"error": f"unknown path {self.path}"})
+            return
+        self._send_json(200, {"model": self.server.model_name, "dimension": self.server.dimension,
+                              "stats": self.server.batcher.metrics()})
+
+    def do_POST(self):
+        if self.path != "/embed":
+            self._send_json(404, {"error": f"unknown path {self.path}"})
+            return
+        try:
+            request = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)))
+            texts, kind = request["texts"], request.get("kind", "documents")
+            if kind not in EMBED_KINDS or not isinstance(texts, list):
+                raise ValueError("expected a list of texts and kind 'documents' or 'query'")
+        except (ValueError, KeyError, TypeError) as e:
+            self._send_json(400, {"error": f"bad request: {e}"})
+            return
+        try:
+            vectors = self.server.batcher.embed([str(text) for text in texts], kind)
+        except Exception as e:
+            self._send_json(500, {"error": f"{type(e).__name__}: {e}"})
+            return
+        self._send_json(200, {"model": self.server.model_name, "embeddings": vectors})
+
+
+class _ServiceMixin:
+    # socketserver's default backlog of 5 drops bursts of concurrent connections
+    request_queue_size = 128
+
+    def setup_service(self, batcher: MicroBatcher, model_name: str, dimension: int):
+        self.batcher = batcher
+        self.model_name = model_name
+        self.dimension = dimension
+
+
+class _TCPEmbeddingServer(_ServiceMixin, ThreadingHTTPServer):
+    daemon_threads = True
+
+
+class _UnixEmbeddingServer(_ServiceMixin, socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+    def get_request(self):
+        request, _ = super().get_request()
+        # BaseHTTPRequestHandler expects a (host, port) client address
+        return request, ("unix", 0)
+
+    def server_close(self):
+        super().server_close()
+        if os.path.exists(self.server_address):
+            os.unlink(self.server_address)
+
+
+def create_server(url: str, embeddings: Optional[Embeddings] = None, model_name: str = config.EMBEDDING_MODEL):
+    """Embedding server listening on an http://host:port or unix:///path URL.
+
+    The model is loaded here, once, unless an embeddings object is passed in.
+    """
+    queries_as_documents = False
+    if embeddings is None:
+        from langchain_huggingface import HuggingFaceEmbeddings
+        embeddings = HuggingFaceEmbeddings(model_name=model_name)
+        # Without query_encode_kwargs, embed_query encodes exactly like embed_documents
+        queries_as_documents = not getattr(embeddings, "query_encode_kwargs", None)
+    dimension = len(embeddings.embed_query("dimension probe"))
+    parsed = urlparse(url)
+    if parsed.scheme == "unix":
+        if os.path.exists(parsed.path):
+            os.unlink(parsed.path)
+        server = _UnixEmbeddingServer(parsed.path, _EmbeddingHandler)
+    else:
+        server = _TCPEmbeddingServer((parsed.hostname or "127.0.0.1", parsed.port or 80), _EmbeddingHandler)
+    server.setup_service(MicroBatcher(embeddings, queries_as_documents=queries_as_documents), model_name, dimension)
+    return server
+
+
+class _UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, path: str, timeout: float):
+        super().__init__("localhost", timeout=timeout)
+        self.socket_path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socket_path)
+
+
+class RemoteEmbeddings(Embeddings):
+    """Drop-in for HuggingFaceEmbeddings that calls the shared embedding service.
+
+    The service's model is checked against model_name on first use, so an
+    index is never queried or extended with vectors from a different model.
+    """
+
+    def __init__(self, url: str = None, model_name: str = config.EMBEDDING_MODEL,
+                 timeout: float = config.EMBEDDING_SERVICE_TIMEOUT_SECONDS,
+                 max_texts_per_request: int = config.EMBEDDING_CLIENT_MAX_TEXTS_PER_REQUEST):
+        self.url = url or config.EMBEDDING_SERVICE_URL
+        self.model_name = model_name
+        self.timeout = timeout
+        self.max_texts_per_request = max_texts_per_request
+        self._parsed = urlparse(self.url)
+        self._local = threading.local()
+        self._checked = False
+
+    def _connection(self) -> http.client.HTTPConnection:
+        # One keep-alive connection per thread
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            if self._parsed.scheme == "unix":
+                connection = _UnixHTTPConnection(self._parsed.path, self.timeout)
+            else:
+                connection = http.client.HTTPConnection(self._parsed.hostname, self._parsed.port or 80,
+                                                        timeout=self.timeout)
+            self._local.connection = connection
+        return connection
+
+    def _request(self, method: str, path: str, body: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        payload = json.dumps(body).encode('utf-8') if body is not None else None
+        headers = {"Content-Type": "application/json"} if payload is not None else {}
+        for attempt in range(2):
+            connection = self._connection()
+            try:
+                connection.request(method, path, body=payload, headers=headers)
+                response = connection.getresponse()
+                data = json.loads(response.read() or b"{}")
+                break
+            except (OSError, http.client.HTTPException, ValueError) as e:
+                connection.close()
+                self._local.connection = None
+                # A keep-alive connection the server has since closed; retry once on a fresh one
+                if attempt == 1:
+                    raise EmbeddingServiceError(f"Embedding service at {self.url} unavailable: {e}") from e
+        if response.status != 200:
+            raise EmbeddingServiceError(f"Embedding service error {response.status}: {data.get('error')}")
+        return data
+
+    def _check_model(self):
+        if self._checked:
+            return
+        model = self._request("GET", "/health").get("model")
+        if model != self.model_name:
+            raise EmbeddingServiceError(
+                f"Embedding service serves {model}, but this process expects {self.model_name}"
+            )
+        self._checked = True
+
+    def _embed(self, texts: List[str], kind: str) -> List[List[float]]:
+        self._check_model()
+        vectors = []
+        for start in range(0, len(texts), self.max_texts_per_request):
+            batch = texts[start:start + self.max_texts_per_request]
+            vectors.extend(self._request("POST", "/embed", {"texts": batch, "kind": kind})["embeddings"])
+        return vectors
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self._embed(list(texts), "documents")
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed([text], "query")[0]
+
+    def health(self) -> Dict[str, Any]:
+        """Model, dimension and batching statistics reported by the service."""
+        return self._request("GET", "/health")
@@ -0,0 +1,394 @@
+"""
+Portable prebuilt index artifacts for fast cold start.
+
+export_index writes a vector store to a single versioned file: chunk text,
+metadata and float16 embeddings, parent sections, the corpus manifest and
+the embedding model fingerprint, plus the near-duplicate signatures and
+provenance so incremental indexing keeps working on the replica. import_index bulk-loads such a file into a
+new snapshot and promotes it, without loading or running the embedding
+model, so a new replica can serve queries as soon as the artifact arrives.
+
+File layout (all integers little-endian):
+
+    MAGIC (8 bytes) | format version (uint32) | reserved (uint32) | header length (uint64)
+    header: UTF-8 JSON describing the corpus and every column
+    columns: raw arrays, each starting on a 64-byte boundary
+
+Columns are stored one after another rather than row by row. String columns
+are a uint64 offsets array plus a UTF-8 blob. Every column can be read
+straight from a memory map without copying or parsing the rest of the file.
+"""
+
+import hashlib
+import json
+import mmap
+import os
+import struct
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+import civic_rag.config as config
+from civic_rag.backend.docstore import (
+    list_chunk_signatures,
+    list_chunk_sources,
+    list_file_records,
+    list_parents,
+    save_chunk_signatures,
+    save_chunk_sources,
+    save_file_records,
+    save_parents,
+)
+from civic_rag.backend.snapshots import (
+    create_snapshot_dir,
+    discard_snapshot,
+    get_active_vector_store_dir,
+    promote_snapshot,
+    register_snapshot,
+)
+
+ARTIFACT_MAGIC = b'CIVRAGIX'
+ARTIFACT_VERSION = 1
+_PREAMBLE = struct.Struct('<8sIIQ')
+_ALIGNMENT = 64
+# Chroma rejects add() batches above its max batch size (5461 with SQLite)
+_LOAD_BATCH_SIZE = 4000
+
+
+class IndexArtifactError(ValueError):
+    """Raised for unreadable, corrupt or incompatible index artifacts."""
+
+
+def model_fingerprint(dimension: int) -> Dict[str, Any]:
+    """What an index's embeddings depend on; queries must be embedded the same way."""
+    return {
+        "embedding_model": config.EMBEDDING_MODEL,
+        "dimension": int(dimension),
+    }
+
+
+def _string_column(values: List[str]) -> Dict[str, np.ndarray]:
+    encoded = [value.encode('utf-8') for value in values]
+    offsets = np.zeros(len(encoded) + 1, dtype='<u8')
+    offsets[1:] = np.cumsum([len(value) for value in encoded], dtype='<u8')
+    return {"offsets": offsets, "data": np.frombuffer(b''.join(encoded), dtype=np.uint8)}
+
+
+def _read_store(persist_directory: str) -> Dict[str, Any]:
+    """Everything in a vector store, read through the Chroma client (no embedding model)."""
+    import chromadb
+
+    client = chromadb.PersistentClient(path=persist_directory)
+    collections, ids, texts, metadatas, collection_index, embeddings = [], [], [], [], [], []
+    for position, collection in enumerate(client.list_collections()):
+        collection = client.get_collection(collection if isinstance(collection, str) else collection.name)
+        collections.append({"name": collection.name, "metadata": collection.metadata})
+        count = collection.count()
+        for offset in range(0, count, _LOAD_BATCH_SIZE):
+            batch = collection.get(include=["embeddings", "documents", "metadatas"],
+                                   limit=_LOAD_BATCH_SIZE, offset=offset)
+            ids.extend(batch["ids"])
+            texts.extend(batch["documents"])
+            metadatas.extend(batch["metadatas"])
+            collection_index.extend([position] * len(batch["ids"]))
+            embeddings.append(np.asarray(batch["embeddings"], dtype=np.float32))
+
+    return {
+        "collections": collections,
+        "ids": ids,
+        "texts": texts,
+        "metadatas": metadatas,
+        "collection_index": np.asarray(collection_index, dtype='<u2'),
+        "embeddings": np.concatenate(embeddings) if embeddings else np.zeros((0, 0), dtype=np.float32),
+        "parents": list_parents(persist_directory),
+        "files": list_file_records(persist_directory),
+        "signatures": list_chunk_signatures(persist_directory),
+        "chunk_sources": list_chunk_sources(persist_directory),
+    }
+
+
+def export_index(output_path: str, persist_directory: Optional[str] = None) -> Dict[str, Any]:
+    """Write a vector store (the active snapshot by default) to an index artifact."""
+    persist_directory = persist_directory or get_active_vector_store_dir()
+    store = _read_store(persist_directory)
+    if not store["ids"]:
+        raise IndexArtifactError(f"vector store at {persist_directory} is empty")
+    embeddings = store["embeddings"]
+
+    signatures = [np.frombuffer(row[2], dtype='<u8') for row in store["signatures"]]
+    columns = {
+        "chunk_embeddings": embeddings.astype('<f2'),
+        "chunk_collection": store["collection_index"],
+        "signature": np.stack(signatures) if signatures else np.zeros((0, config.DEDUP_NUM_PERM), dtype='<u8'),
+    }
+    for name, values in (
+        ("chunk_id", store["ids"]),
+        ("chunk_text", store["texts"]),
+        ("chunk_metadata", [json.dumps(m or {}, ensure_ascii=False, sort_keys=True) for m in store["metadatas"]]),
+        ("parent_id", [row[0] for row in store["parents"]]),
+        ("parent_text", [row[1] for row in store["parents"]]),
+        ("parent_source", [row[2] or "" for row in store["parents"]]),
+        ("signature_chunk_id", [row[0] for row in store["signatures"]]),
+        ("signature_source", [row[1] or "" for row in store["signatures"]]),
+        ("source_chunk_id", [row[0] for row in store["chunk_sources"]]),
+        ("source_file", [row[1] or "" for row in store["chunk_sources"]]),
+        ("source_metadata", [json.dumps(row[2], ensure_ascii=False) for row in store["chunk_sources"]]),
+    ):
+        for part, array in _string_column(values).items():
+            columns[f"{name}.{part}"] = array
+
+    header = {
+        "format_version": ARTIFACT_VERSION,
+        "created_at": time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        "fingerprint": model_fingerprint(embeddings.shape[1]),
+        "chunking": {
+            "chunk_size": config.CHUNK_SIZE,
+            "chunk_overlap": config.CHUNK_OVERLAP,
+            "parent_chunk_size": config.PARENT_CHUNK_SIZE,
+            "partition_collections_by": config.PARTITION_COLLECTIONS_BY,
+        },
+        "chunk_count": len(store["ids"]),
+        "parent_count": len(store["parents"]),
+        "collections": store["collections"],
+        "manifest": store["files"],
+        "columns": {},
+    }
+
+    # Offsets are relative to the data area, which starts at the first 64-byte
+    # boundary after the header (the header length is only known once they are set)
+    relative, layout = 0, {}
+    for name, array in columns.items():
+        relative = -(-relative // _ALIGNMENT) * _ALIGNMENT
+        layout[name] = relative
+        relative += array.nbytes
+    digest = hashlib.sha256()
+    for name, array in columns.items():
+        digest.update(array.tobytes())
+    header["payload_sha256"] = digest.hexdigest()
+    header["columns"] = {
+        name: {"offset": layout[name], "dtype": array.dtype.str, "shape": list(array.shape)}
+        for name, array in columns.items()
+    }
+    header_bytes = json.dumps(header, ensure_ascii=False).encode('utf-8')
+    data_start = -(-(_PREAMBLE.size + len(header_bytes)) // _ALIGNMENT) * _ALIGNMENT
+
+    tmp_path = f"{output_path}.tmp-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+    with open(tmp_path, 'wb') as f:
+        f.write(_PREAMBLE.pack(ARTIFACT_MAGIC, ARTIFACT_VERSION, 0, len(header_bytes)))
+        f.write(header_bytes)
+        for name, array in columns.items():
+            f.write(b'\0' * (data_start + layout[name] - f.tell()))
+            f.write(array.tobytes())
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, output_path)
+
+    return {
+        "path": output_path,
+        "bytes": os.path.getsize(output_path),
+        "chunk_count": header["chunk_count"],
+        "parent_count": header["parent_count"],
+        "fingerprint": header["fingerprint"],
+    }
+
+
+class IndexArtifact:
+    """Read-only, memory-mapped view of an index artifact."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, 'rb')
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._file.close()
+            raise IndexArtifactError(f"{path} is empty")
+        if len(self._map) < _PREAMBLE.size:
+            self.close()
+            raise IndexArtifactError(f"{path} is too short to be an index artifact")
+        magic, version, _, header_length = _PREAMBLE.unpack_from(self._map, 0)
+        if magic != ARTIFACT_MAGIC:
+            self.close()
+            raise IndexArtifactError(f"{path} is not an index artifact")
+        if version != ARTIFACT_VERSION:
+            self.close()
+            raise IndexArtifactError(f"unsupported artifact format version {version} (expected {ARTIFACT_VERSION})")
+        self.header = json.loads(self._map[_PREAMBLE.size:_PREAMBLE.size + header_length].decode('utf-8'))
+        self._data_start = -(-(_PREAMBLE.size + header_length) // _ALIGNMENT) * _ALIGNMENT
+
+    def array(self, name: str) -> np.ndarray:
+        """A column as a zero-copy numpy view into the memory map."""
+        column = self.header["columns"][name]
+        dtype = np.dtype(column["dtype"])
+        count = int(np.prod(column["shape"])) if column["shape"] else 1
+        return np.frombuffer(self._map, dtype=dtype, count=count,
+                             offset=self._data_start + column["offset"]).reshape(column["shape"])
+
+    def strings(self, name: str, start: int = 0, stop: Optional[int] = None) -> List[str]:
+        """Decoded values [start, stop) of a string column."""
+        offsets = self.array(f"{name}.offsets")
+        data = self.array(f"{name}.data")
+        stop = len(offsets) - 1 if stop is None else stop
+        return [bytes(data[offsets[i]:offsets[i + 1]]).decode('utf-8') for i in range(start, stop)]
+
+    def verify(self):
+        """Check the payload checksum; raises IndexArtifactError on corruption."""
+        digest = hashlib.sha256()
+        for name in self.header["columns"]:
+            digest.update(self.array(name).tobytes())
+        if digest.hexdigest() != self.header["payload_sha256"]:
+            raise IndexArtifactError(f"{self.path} is corrupt (checksum mismatch)")
+
+    def close(self):
+        if getattr(self, "_map", None) is not None:
+            try:
+                self._map.close()
+            except BufferError:
+                # Column views are still referenced; the map is released with them
+                pass
+            self._map = None
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _serving_dimension() -> Optional[int]:
+    """Dimension reported by the shared embedding service, if one is configured and up."""
+    if not config.EMBEDDING_SERVICE_URL:
+        return None
+    from civic_rag.backend.embedding_service import EmbeddingServiceError, RemoteEmbeddings
+
+    try:
+        return RemoteEmbeddings(config.EMBEDDING_SERVICE_URL).health().get("dimension")
+    except EmbeddingServiceError as e:
+        print(f"⚠️ Could not check the embedding dimension against the embedding service: {e}")
+        return None
+
+
+def check_compatible(header: Dict[str, Any]):
+    """Reject artifacts this deployment cannot query or route into.
+
+    The embeddings must come from the configured model, with the dimension
+    the artifact records (and the embedding service serves, when one is
+    configured), and chunks must be spread over collections the way
+    PARTITION_COLLECTIONS_BY routes them here.
+    """
+    fingerprint = header["fingerprint"]
+    built_with = fingerprint["embedding_model"]
+    if built_with != config.EMBEDDING_MODEL:
+        raise IndexArtifactError(
+            f"artifact was built with embedding model {built_with!r}, "
+            f"but this deployment uses {config.EMBEDDING_MODEL!r}"
+        )
+    dimension = fingerprint["dimension"]
+    shape = header["columns"]["chunk_embeddings"]["shape"]
+    if len(shape) != 2 or shape[1] != dimension:
+        raise IndexArtifactError(f"artifact records dimension {dimension}, but its embeddings have shape {shape}")
+    serving = _serving_dimension()
+    if serving is not None and serving != dimension:
+        raise IndexArtifactError(
+            f"artifact embeddings have dimension {dimension}, but the embedding service produces {serving}"
+        )
+    partitioned_by = header["chunking"].get("partition_collections_by")
+    if partitioned_by != config.PARTITION_COLLECTIONS_BY:
+        raise IndexArtifactError(
+            f"artifact collections are partitioned by {partitioned_by!r}, "
+            f"but this deployment uses PARTITION_COLLECTIONS_BY = {config.PARTITION_COLLECTIONS_BY!r}"
+        )
+
+
+def _load_into(artifact: IndexArtifact, persist_directory: str):
+    import chromadb
+
+    header = artifact.header
+    embeddings = artifact.array("chunk_embeddings")
+    collection_index = artifact.array("chunk_collection")
+    client = chromadb.PersistentClient(path=persist_directory)
+    collections = [
+        client.get_or_create_collection(c["name"], metadata=c["metadata"] or None)
+        for c in header["collections"]
+    ]
+    for start in range(0, header["chunk_count"], _LOAD_BATCH_SIZE):
+        stop = min(start + _LOAD_BATCH_SIZE, header["chunk_count"])
+        ids = artifact.strings("chunk_id", start, stop)
+        texts = artifact.strings("chunk_text", start, stop)
+        metadatas = [json.loads(m) or None for m in artifact.strings("chunk_metadata", start, stop)]
+        vectors = embeddings[start:stop].astype(np.float32)
+        targets = collection_index[start:stop]
+        for position in np.unique(targets):
+            rows = np.nonzero(targets == position)[0]
+            collections[position].add(
+                ids=[ids[i] for i in rows],
+                embeddings=vectors[rows],
+                documents=[texts[i] for i in rows],
+                metadatas=[metadatas[i] for i in rows],
+            )
+
+    parent_ids = artifact.strings("parent_id")
+    parent_sources = artifact.strings("parent_source")
+    save_parents(
+        {pid: (text, source or None) for pid, text, source in zip(parent_ids, artifact.strings("parent_text"), parent_sources)},
+        persist_directory
+    )
+    save_file_records(header["manifest"], persist_directory)
+
+    if "signature" in header["columns"]:
+        signature_rows = artifact.array("signature")
+        save_chunk_signatures({
+            chunk_id: (source or None, signature_rows[i].tobytes())
+            for i, (chunk_id, source) in enumerate(zip(artifact.strings("signature_chunk_id"),
+                                                       artifact.strings("signature_source")))
+        }, persist_directory)
+        save_chunk_sources([
+            (chunk_id, source, json.loads(metadata))
+            for chunk_id, source, metadata in zip(artifact.strings("source_chunk_id"),
+                                                  artifact.strings("source_file"),
+                                                  artifact.strings("source_metadata"))
+        ], persist_directory)
+
+    loaded = sum(collection.count() for collection in collections)
+    if loaded != header["chunk_count"]:
+        raise IndexArtifactError(f"loaded {loaded} chunks, artifact has {header['chunk_count']}")
+
+
+def import_index(artifact_path: str, activate: bool = True, verify: bool = True) -> Dict[str, Any]:
+    """Bulk-load an artifact into a new snapshot and (by default) promote it.
+
+    With activate=False the snapshot is retained inactive; activate it later
+    with `index_cli rollback --version <snapshot>`.
+
+    The embedding model is never loaded. The live vector store is untouched if
+    the artifact is incompatible, corrupt or fails to load.
+    """
+    started = time.perf_counter()
+    with IndexArtifact(artifact_path) as artifact:
+        check_compatible(artifact.header)
+        if verify:
+            artifact.verify()
+        snapshot_dir = create_snapshot_dir()
+        try:
+            _load_into(artifact, snapshot_dir)
+        except Exception:
+            discard_snapshot(snapshot_dir)
+            raise
+        header = artifact.header
+
+    if activate:
+        promote_snapshot(snapshot_dir)
+    else:
+        register_snapshot(snapshot_dir)
+    return {
+        "snapshot": os.path.basename(snapshot_dir),
+        "path": snapshot_dir,
+        "activated": activate,
+        "chunk_count": header["chunk_count"],
+        "parent_count": header["parent_count"],
+        "fingerprint": header["fingerprint"],
+        "seconds": time.perf_counter() - started,
+    }
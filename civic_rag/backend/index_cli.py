@@ -0,0 +1,342 @@
+"""
+Non-interactive vector store maintenance commands, suitable for cron.
+
+Every PDF is hashed, opened, validated and split in a single pass, in
+parallel worker processes. Only the results are handed to the vector store,
+so no file is parsed twice. Each command can emit a JSON report with
+per-file timings, and the exit code says whether everything succeeded.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stdout
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import civic_rag.config as config
+
+EXIT_OK = 0
+# Some files were invalid or failed, everything else was processed
+EXIT_PARTIAL = 1
+# The command itself failed (no data directory, rebuild rejected, ...)
+EXIT_FAILURE = 2
+
+
+def _process_pdf(pdf_path: str, known_sha1: Optional[str], keep_docs: bool) -> Tuple[Dict[str, Any], List[Any]]:
+    """Validate and split one PDF in one pass; runs in a worker process."""
+    from civic_rag.backend.docstore import file_fingerprint
+    from civic_rag.backend.ingestion import EmptyPDFError, load_pdf_pages, split_pdf_pages
+
+    started = time.perf_counter()
+    result = {
+        "file": os.path.basename(pdf_path),
+        "status": "ok",
+        "pages": 0,
+        "chunks": 0,
+        "size": None,
+        "mtime": None,
+        "sha1": None,
+        "parse_seconds": 0.0,
+        "split_seconds": 0.0,
+        "total_seconds": 0.0,
+        "error": None,
+    }
+    docs = []
+    try:
+        result["size"], result["mtime"], result["sha1"] = file_fingerprint(pdf_path)
+        if known_sha1 is not None and known_sha1 == result["sha1"]:
+            result["status"] = "unchanged"
+        else:
+            parse_started = time.perf_counter()
+            pages = load_pdf_pages(pdf_path)
+            result["parse_seconds"] = time.perf_counter() - parse_started
+            result["pages"] = len(pages)
+            split_started = time.perf_counter()
+            docs = split_pdf_pages(pages, pdf_path)
+            result["split_seconds"] = time.perf_counter() - split_started
+            result["chunks"] = len(docs)
+    except EmptyPDFError as e:
+        result["status"], result["error"] = "invalid", str(e)
+    except Exception as e:
+        result["status"], result["error"] = "invalid", f"{type(e).__name__}: {e}"
+        docs = []
+    result["total_seconds"] = time.perf_counter() - started
+    return result, (docs if keep_docs else [])
+
+
+def scan_directory(directory: str, keep_docs: bool, known_hashes: Optional[Dict[str, str]] = None,
+                   workers: Optional[int] = None) -> Tuple[List[Dict[str, Any]], Dict[str, List[Any]]]:
+    """Run the single validate-and-split pass over every PDF in a directory."""
+    known_hashes = known_hashes or {}
+    pdf_files = sorted(str(p) for p in Path(directory).glob("*.pdf"))
+    results = []
+    docs_by_file = {}
+    if not pdf_files:
+        return results, docs_by_file
+
+    workers = workers or min(len(pdf_files), os.cpu_count() or 1)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(_process_pdf, path, known_hashes.get(os.path.basename(path)), keep_docs)
+            for path in pdf_files
+        ]
+        for future in futures:
+            result, docs = future.result()
+            results.append(result)
+            if docs:
+                docs_by_file[result["file"]] = docs
+            _print_file_result(result)
+    return results, docs_by_file
+
+
+def _print_file_result(result: Dict[str, Any]):
+    if result["status"] == "ok":
+        print(f"✅ {result['file']}: {result['pages']} pages, {result['chunks']} chunks ({result['total_seconds']:.2f}s)")
+    elif result["status"] == "unchanged":
+        print(f"⏭️ {result['file']}: unchanged")
+    else:
+        print(f"❌ {result['file']}: {result['error']}")
+
+
+def _summarize(results: List[Dict[str, Any]]) -> Dict[str, int]:
+    return {
+        "files": len(results),
+        "ok": sum(1 for r in results if r["status"] == "ok"),
+        "unchanged": sum(1 for r in results if r["status"] == "unchanged"),
+        "invalid": sum(1 for r in results if r["status"] == "invalid"),
+        "chunks": sum(r["chunks"] for r in results),
+    }
+
+
+def _quarantine_invalid(directory: str, results: List[Dict[str, Any]]):
+    from civic_rag.backend.ingestion import quarantine_file
+
+    for result in results:
+        if result["status"] == "invalid":
+            quarantine_file(os.path.join(directory, result["file"]), result["error"] or "invalid")
+            result["quarantined"] = True
+            print(f"📁 Quarantined {result['file']}")
+
+
+def cmd_validate(args, report: Dict[str, Any]) -> int:
+    results, _ = scan_directory(args.directory, keep_docs=False, workers=args.workers)
+    if args.quarantine:
+        _quarantine_invalid(args.directory, results)
+    report["files"] = results
+    report["summary"] = _summarize(results)
+    return EXIT_PARTIAL if report["summary"]["invalid"] else EXIT_OK
+
+
+def cmd_update(args, report: Dict[str, Any]) -> int:
+    """Index new and changed PDFs into the active vector store."""
+    from civic_rag.backend.docstore import list_file_records, save_file_record
+    from civic_rag.backend.snapshots import get_active_vector_store_dir
+    from civic_rag.backend.utils import remove_source_from_vector_store, replace_documents_in_vector_store
+
+    persist_directory = get_active_vector_store_dir()
+    known_hashes = {
+        record["source_file"]: record["sha1"] for record in list_file_records(persist_directory)
+    }
+    results, docs_by_file = scan_directory(args.directory, keep_docs=True,
+                                           known_hashes={} if args.force else known_hashes,
+                                           workers=args.workers)
+    if args.quarantine:
+        _quarantine_invalid(args.directory, results)
+
+    changed = [r for r in results if r["status"] == "ok" and r["file"] in docs_by_file]
+    if changed:
+        all_docs = [doc for result in changed for doc in docs_by_file[result["file"]]]
+        embed_started = time.perf_counter()
+        # Adds the new versions before removing the old ones, so a failure leaves the index as it was
+        replace_documents_in_vector_store(all_docs, persist_directory, report)
+        report["embedding_seconds"] = time.perf_counter() - embed_started
+        for result in changed:
+            save_file_record(result["file"], result["size"], result["mtime"], result["sha1"],
+                             result["chunks"], persist_directory)
+
+    if args.prune:
+        present = {r["file"] for r in results if r["status"] != "invalid" or not r.get("quarantined")}
+        removed = [name for name in known_hashes if name not in present]
+        for name in removed:
+            remove_source_from_vector_store(name, persist_directory)
+            print(f"🗑️ Removed from index: {name}")
+        report["removed"] = removed
+
+    report["files"] = results
+    report["summary"] = _summarize(results)
+    report["vector_store"] = persist_directory
+    return EXIT_PARTIAL if report["summary"]["invalid"] else EXIT_OK
+
+
+def cmd_rebuild(args, report: Dict[str, Any]) -> int:
+    """Rebuild every PDF into a new snapshot and promote it if it validates."""
+    from civic_rag.backend.utils import rebuild_vector_store_snapshot
+
+    results, docs_by_file = scan_directory(args.directory, keep_docs=True, workers=args.workers)
+    if args.quarantine:
+        _quarantine_invalid(args.directory, results)
+    report["files"] = results
+    report["summary"] = _summarize(results)
+
+    all_docs = [doc for docs in docs_by_file.values() for doc in docs]
+    if not all_docs:
+        report["error"] = "no documents to index"
+        return EXIT_FAILURE
+
+    embed_started = time.perf_counter()
+    vectordb = rebuild_vector_store_snapshot(all_docs, report)
+    report["embedding_seconds"] = time.perf_counter() - embed_started
+    if vectordb is None:
+        report["error"] = "new snapshot failed validation"
+        return EXIT_FAILURE
+    return EXIT_PARTIAL if report["summary"]["invalid"] else EXIT_OK
+
+
+def _collect_stats() -> Optional[Dict[str, Any]]:
+    from civic_rag.backend.docstore import list_file_records
+    from civic_rag.backend.snapshots import list_snapshots
+    from civic_rag.backend.utils import get_vector_store_info
+
+    info = get_vector_store_info()
+    if info is None:
+        return None
+    info["snapshots"] = list_snapshots()
+    info["indexed_files"] = list_file_records(info["location"])
+    info["embedding_model"] = config.EMBEDDING_MODEL
+    return info
+
+
+def cmd_info(args, report: Dict[str, Any]) -> int:
+    stats = _collect_stats()
+    if stats is None:
+        return EXIT_FAILURE
+    report["stats"] = stats
+    return EXIT_OK
+
+
+def cmd_stats(args, report: Dict[str, Any]) -> int:
+    # Same data as `info`, but always reported as JSON
+    args.json = True
+    return cmd_info(args, report)
+
+
+def cmd_rollback(args, report: Dict[str, Any]) -> int:
+    from civic_rag.backend.snapshots import rollback_snapshot
+
+    version = rollback_snapshot(args.version)
+    report["active_snapshot"] = version
+    if version is None:
+        print("⚠️ No snapshot to roll back to")
+        return EXIT_FAILURE
+    print(f"✅ Rolled back to snapshot {version}")
+    return EXIT_OK
+
+
+def cmd_export(args, report: Dict[str, Any]) -> int:
+    """Write the active vector store to a portable index artifact."""
+    from civic_rag.backend.index_artifact import export_index
+
+    result = export_index(args.output, args.vector_store)
+    report["artifact"] = result
+    print(f"📦 Exported {result['chunk_count']} chunks and {result['parent_count']} parent sections "
+          f"to {result['path']} ({result['bytes'] / 1e6:.1f} MB)")
+    return EXIT_OK
+
+
+def cmd_import(args, report: Dict[str, Any]) -> int:
+    """Bulk-load an index artifact into a new snapshot, without re-embedding."""
+    from civic_rag.backend.index_artifact import import_index
+
+    result = import_index(args.artifact, activate=not args.no_activate, verify=not args.skip_verify)
+    report["import"] = result
+    state = "promoted" if result["activated"] else "loaded (not activated)"
+    print(f"✅ Snapshot {result['snapshot']} {state}: {result['chunk_count']} chunks in {result['seconds']:.1f}s")
+    if not result["activated"]:
+        print(f"   Activate it with: rollback --version {result['snapshot']}")
+    return EXIT_OK
+
+
+COMMANDS = {
+    "validate": (cmd_validate, "Validate every PDF without touching the index"),
+    "update": (cmd_update, "Index new and changed PDFs into the active vector store"),
+    "rebuild": (cmd_rebuild, "Rebuild all PDFs into a new snapshot and promote it"),
+    "info": (cmd_info, "Show vector store information"),
+    "stats": (cmd_stats, "Print vector store statistics as JSON"),
+    "rollback": (cmd_rollback, "Re-activate a previous snapshot"),
+    "export": (cmd_export, "Write the active vector store to a portable index artifact"),
+    "import": (cmd_import, "Load an index artifact into a new snapshot and promote it"),
+}
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="update_vector_store.py",
+        description="Vector store maintenance. Run without a command for the interactive menu."
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    for name, (_, help_text) in COMMANDS.items():
+        sub = subparsers.add_parser(name, help=help_text)
+        sub.add_argument("--json", action="store_true", help="Print a JSON report on stdout")
+        sub.add_argument("--report", help="Also write the JSON report to this file")
+        if name in ("validate", "update", "rebuild"):
+            sub.add_argument("--directory", default=config.DATA_DIR, help="PDF directory (default: config.DATA_DIR)")
+            sub.add_argument("--workers", type=int, help="Parallel worker processes (default: CPU count)")
+            sub.add_argument("--quarantine", action="store_true", help="Move invalid PDFs to the quarantine folder")
+        if name == "update":
+            sub.add_argument("--force", action="store_true", help="Re-index files even if they are unchanged")
+            sub.add_argument("--prune", action="store_true", help="Remove indexed files that are no longer in the directory")
+        if name == "rollback":
+            sub.add_argument("--version", help="Snapshot to activate (default: the previous one)")
+        if name == "export":
+            sub.add_argument("output", help="Artifact file to write")
+            sub.add_argument("--vector-store", help="Vector store directory (default: the active snapshot)")
+        if name == "import":
+            sub.add_argument("artifact", help="Artifact file to load")
+            sub.add_argument("--no-activate", action="store_true", help="Load into a new snapshot without promoting it")
+            sub.add_argument("--skip-verify", action="store_true", help="Skip the checksum check")
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    handler = COMMANDS[args.command][0]
+    report: Dict[str, Any] = {
+        "command": args.command,
+        "started_at": time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+    }
+    if getattr(args, "directory", None):
+        report["directory"] = os.path.abspath(args.directory)
+
+    started = time.perf_counter()
+    # With --json, keep stdout clean for the report and send progress to stderr
+    progress = sys.stderr if (args.json or args.command == "stats") else sys.stdout
+    with redirect_stdout(progress):
+        if getattr(args, "directory", None) and not os.path.isdir(args.directory):
+            print(f"❌ Data directory not found: {args.directory}")
+            report["error"] = "data directory not found"
+            exit_code = EXIT_FAILURE
+        else:
+            try:
+                exit_code = handler(args, report)
+            except Exception as e:
+                print(f"❌ {args.command} failed: {e}")
+                report["error"] = f"{type(e).__name__}: {e}"
+                exit_code = EXIT_FAILURE
+    report["duration_seconds"] = time.perf_counter() - started
+    report["exit_code"] = exit_code
+
+    report_json = json.dumps(report, indent=2, default=str)
+    if args.report:
+        with open(args.report, 'w', encoding='utf-8') as f:
+            f.write(report_json)
+    if args.json:
+        print(report_json)
+    elif "summary" in report:
+        summary = report["summary"]
+        print(f"\n🎯 {summary['files']} files: {summary['ok']} processed, "
+              f"{summary['unchanged']} unchanged, {summary['invalid']} invalid ({report['duration_seconds']:.1f}s)")
+    return exit_code
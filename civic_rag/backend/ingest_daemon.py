@@ -0,0 +1,376 @@
+"""
+Background ingestion service that watches DATA_DIR and indexes PDFs incrementally.
+
+File events come from watchdog (inotify on Linux) when it is installed, with a
+polling scanner as the fallback. Bursts of events for the same file are
+debounced until the file has been quiet and its size is stable, then the path
+goes through a bounded work queue to the indexing workers. Failed files are
+retried with exponential backoff and quarantined once the retries run out.
+"""
+
+import json
+import os
+import queue
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+import civic_rag.config as config
+from civic_rag.backend.ingestion import quarantine_file
+from civic_rag.backend.utils import index_pdf_file, remove_source_from_vector_store
+
+
+def _is_pdf(path: str) -> bool:
+    return path.lower().endswith('.pdf')
+
+
+class IngestionMetrics:
+    """Thread-safe counters describing the state of the ingestion pipeline."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started_at = time.time()
+        self.processed = 0
+        self.skipped_unchanged = 0
+        self.deleted = 0
+        self.failed_attempts = 0
+        self.quarantined = 0
+        self.last_lag_seconds = None
+        self.max_lag_seconds = 0.0
+        self.last_indexed_at = None
+        self.last_error = None
+
+    def record_indexed(self, lag_seconds: float):
+        with self._lock:
+            self.processed += 1
+            self.last_lag_seconds = lag_seconds
+            self.max_lag_seconds = max(self.max_lag_seconds, lag_seconds)
+            self.last_indexed_at = time.time()
+
+    def increment(self, name: str, error: Optional[str] = None):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+            if error:
+                self.last_error = error
+
+    def snapshot(self, queue_depth: int, pending: int) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "queue_depth": queue_depth,
+                "pending_debounce": pending,
+                "processed": self.processed,
+                "skipped_unchanged": self.skipped_unchanged,
+                "deleted": self.deleted,
+                "failed_attempts": self.failed_attempts,
+                "quarantined": self.quarantined,
+                "last_lag_seconds": self.last_lag_seconds,
+                "max_lag_seconds": self.max_lag_seconds,
+                "last_indexed_at": self.last_indexed_at,
+                "last_error": self.last_error,
+                "uptime_seconds": time.time() - self.started_at,
+            }
+
+
+class _PollingWatcher(threading.Thread):
+    """Fallback watcher: rescans the directory and reports changed PDFs."""
+
+    def __init__(self, directory: str, on_change, on_delete, interval: float):
+        super().__init__(name="ingest-poller", daemon=True)
+        self.directory = directory
+        self.on_change = on_change
+        self.on_delete = on_delete
+        self.interval = interval
+        self._stop_event = threading.Event()
+        self._seen: Dict[str, tuple] = {}
+
+    def _scan(self) -> Dict[str, tuple]:
+        current = {}
+        for pdf_file in Path(self.directory).glob("*.pdf"):
+            try:
+                stat = pdf_file.stat()
+            except FileNotFoundError:
+                continue
+            current[str(pdf_file)] = (stat.st_size, stat.st_mtime)
+        return current
+
+    def run(self):
+        # The daemon enqueues every existing file at startup, so only diffs matter here
+        self._seen = self._scan()
+        while not self._stop_event.wait(self.interval):
+            current = self._scan()
+            for path, signature in current.items():
+                if self._seen.get(path) != signature:
+                    self.on_change(path)
+            for path in self._seen.keys() - current.keys():
+                self.on_delete(path)
+            self._seen = current
+
+    def stop(self):
+        self._stop_event.set()
+
+
+def _start_watchdog_observer(directory: str, on_change, on_delete):
+    """Start an inotify-backed watchdog observer, or return None if unavailable."""
+    try:
+        from watchdog.observers import Observer
+        from watchdog.events import FileSystemEventHandler
+    except ImportError:
+        return None
+
+    class _Handler(FileSystemEventHandler):
+        def on_created(self, event):
+            if not event.is_directory and _is_pdf(event.src_path):
+                on_change(event.src_path)
+
+        def on_modified(self, event):
+            if not event.is_directory and _is_pdf(event.src_path):
+                on_change(event.src_path)
+
+        def on_moved(self, event):
+            if event.is_directory:
+                return
+            if _is_pdf(event.src_path):
+                on_delete(event.src_path)
+            if _is_pdf(event.dest_path) and os.path.dirname(event.dest_path) == os.path.abspath(directory):
+                on_change(event.dest_path)
+
+        def on_deleted(self, event):
+            if not event.is_directory and _is_pdf(event.src_path):
+                on_delete(event.src_path)
+
+    observer = Observer()
+    # Not recursive: the quarantine folder lives inside DATA_DIR
+    observer.schedule(_Handler(), directory, recursive=False)
+    observer.start()
+    return observer
+
+
+class IngestionDaemon:
+    """Watches a directory and keeps the active vector store in sync with it."""
+
+    def __init__(self, directory: str = config.DATA_DIR, force_polling: bool = False):
+        self.directory = os.path.abspath(directory)
+        self.force_polling = force_polling
+        self.metrics = IngestionMetrics()
+        self._queue: "queue.Queue[Dict[str, Any]]" = queue.Queue(maxsize=config.INGEST_QUEUE_SIZE)
+        # path -> {"first_seen", "due", "size", "attempts"}
+        self._pending: Dict[str, Dict[str, Any]] = {}
+        # Jobs taken out of _pending (under _lock) but not yet on the queue
+        self._handing_off = 0
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._threads = []
+        self._watcher = None
+
+    # -- event intake -------------------------------------------------
+
+    def notify_changed(self, path: str, delay: Optional[float] = None, attempts: int = 0):
+        """Schedule a path for indexing once it has been quiet for the debounce window."""
+        now = time.time()
+        delay = config.INGEST_DEBOUNCE_SECONDS if delay is None else delay
+        with self._lock:
+            entry = self._pending.get(path)
+            first_seen = entry["first_seen"] if entry else now
+            self._pending[path] = {
+                "first_seen": first_seen,
+                "due": now + delay,
+                "size": self._size(path),
+                "attempts": max(attempts, entry["attempts"] if entry else 0),
+            }
+
+    def notify_deleted(self, path: str):
+        with self._lock:
+            self._pending.pop(path, None)
+            self._handing_off += 1
+        self._hand_off({"action": "delete", "path": path, "first_seen": time.time(), "attempts": 0})
+
+    @staticmethod
+    def _size(path: str) -> Optional[int]:
+        try:
+            return os.path.getsize(path)
+        except OSError:
+            return None
+
+    def _put(self, job: Dict[str, Any]):
+        # Blocks while the queue is full: back-pressure on the debouncer
+        while not self._stop_event.is_set():
+            try:
+                self._queue.put(job, timeout=0.5)
+                return
+            except queue.Full:
+                continue
+
+    def _hand_off(self, job: Dict[str, Any]):
+        """Queue a job counted in _handing_off, so the daemon never looks idle in between."""
+        try:
+            self._put(job)
+        finally:
+            with self._lock:
+                self._handing_off -= 1
+
+    def _debounce_loop(self):
+        while not self._stop_event.wait(0.2):
+            now = time.time()
+            ready = []
+            with self._lock:
+                for path, entry in list(self._pending.items()):
+                    if entry["due"] > now:
+                        continue
+                    size = self._size(path)
+                    if size != entry["size"]:
+                        # Still being written: wait another debounce window
+                        entry["size"] = size
+                        entry["due"] = now + config.INGEST_DEBOUNCE_SECONDS
+                        continue
+                    ready.append((path, self._pending.pop(path)))
+                self._handing_off += len(ready)
+            for path, entry in ready:
+                self._hand_off({
+                    "action": "index",
+                    "path": path,
+                    "first_seen": entry["first_seen"],
+                    "attempts": entry["attempts"],
+                })
+
+    # -- workers ------------------------------------------------------
+
+    def _worker_loop(self):
+        while not self._stop_event.is_set():
+            try:
+                job = self._queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            try:
+                if job["action"] == "delete":
+                    self._handle_delete(job)
+                else:
+                    self._handle_index(job)
+            finally:
+                self._queue.task_done()
+
+    def _handle_delete(self, job: Dict[str, Any]):
+        name = os.path.basename(job["path"])
+        try:
+            remove_source_from_vector_store(name)
+            self.metrics.increment("deleted")
+            print(f"🗑️ Removed from index: {name}")
+        except Exception as e:
+            self.metrics.increment("failed_attempts", f"{name}: {e}")
+            print(f"❌ Could not remove {name} from index: {e}")
+
+    def _handle_index(self, job: Dict[str, Any]):
+        path = job["path"]
+        name = os.path.basename(path)
+        if not os.path.exists(path):
+            return
+        try:
+            chunk_count = index_pdf_file(path)
+        except Exception as e:
+            attempts = job["attempts"] + 1
+            self.metrics.increment("failed_attempts", f"{name}: {e}")
+            if attempts >= config.INGEST_MAX_RETRIES:
+                try:
+                    quarantine_file(path, f"{type(e).__name__}: {e}")
+                    self.metrics.increment("quarantined")
+                    print(f"🚫 Quarantined {name} after {attempts} attempts: {e}")
+                except OSError as move_error:
+                    print(f"❌ Could not quarantine {name}: {move_error}")
+            else:
+                delay = config.INGEST_RETRY_BACKOFF_SECONDS * (2 ** (attempts - 1))
+                print(f"⚠️ Failed to index {name} (attempt {attempts}), retrying in {delay:g}s: {e}")
+                self.notify_changed(path, delay=delay, attempts=attempts)
+            return
+
+        if chunk_count is None:
+            self.metrics.increment("skipped_unchanged")
+            return
+        lag = time.time() - job["first_seen"]
+        self.metrics.record_indexed(lag)
+        print(f"✅ Indexed {name}: {chunk_count} chunks ({lag:.1f}s after first event)")
+
+    # -- metrics ------------------------------------------------------
+
+    def get_metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            pending = len(self._pending)
+        return self.metrics.snapshot(self._queue.qsize(), pending)
+
+    def write_metrics(self, path: str = config.INGEST_METRICS_PATH):
+        """Atomically write the current metrics as JSON."""
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.get_metrics(), f, indent=2)
+        os.replace(tmp_path, path)
+
+    def _metrics_loop(self):
+        while not self._stop_event.wait(config.INGEST_METRICS_INTERVAL_SECONDS):
+            try:
+                self.write_metrics()
+            except OSError as e:
+                print(f"⚠️ Could not write ingestion metrics: {e}")
+
+    # -- lifecycle ----------------------------------------------------
+
+    def start(self):
+        """Queue every existing PDF (unchanged ones are skipped) and start watching."""
+        os.makedirs(self.directory, exist_ok=True)
+        for pdf_file in Path(self.directory).glob("*.pdf"):
+            self.notify_changed(str(pdf_file), delay=0)
+
+        observer = None if self.force_polling else _start_watchdog_observer(
+            self.directory, self.notify_changed, self.notify_deleted
+        )
+        if observer is not None:
+            self._watcher = observer
+            print(f"👀 Watching {self.directory} (watchdog)")
+        else:
+            self._watcher = _PollingWatcher(
+                self.directory, self.notify_changed, self.notify_deleted,
+                config.INGEST_POLL_INTERVAL_SECONDS
+            )
+            self._watcher.start()
+            print(f"👀 Watching {self.directory} (polling every {config.INGEST_POLL_INTERVAL_SECONDS:g}s)")
+            if not self.force_polling:
+                print('   watchdog is not installed; install it with pip install -e ".[daemon]" for inotify events')
+
+        targets = [("ingest-debounce", self._debounce_loop), ("ingest-metrics", self._metrics_loop)]
+        targets += [(f"ingest-worker-{i}", self._worker_loop) for i in range(config.INGEST_WORKERS)]
+        for name, target in targets:
+            thread = threading.Thread(target=target, name=name, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def wait_until_idle(self, timeout: Optional[float] = None) -> bool:
+        """Block until nothing is pending or queued; returns False on timeout."""
+        deadline = None if timeout is None else time.time() + timeout
+        while deadline is None or time.time() < deadline:
+            with self._lock:
+                pending = len(self._pending) + self._handing_off
+            if pending == 0 and self._queue.unfinished_tasks == 0:
+                return True
+            time.sleep(0.2)
+        return False
+
+    def stop(self):
+        self._stop_event.set()
+        if self._watcher is not None:
+            self._watcher.stop()
+            if hasattr(self._watcher, "join"):
+                self._watcher.join(timeout=5)
+        for thread in self._threads:
+            thread.join(timeout=5)
+        try:
+            self.write_metrics()
+        except OSError:
+            pass
+
+    def run_forever(self):
+        self.start()
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            print("\n👋 Stopping ingestion daemon...")
+        finally:
+            self.stop()
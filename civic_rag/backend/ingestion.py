@@ -2,10 +2,94 @@
 
 from langchain_community.document_loaders import DirectoryLoader, PyPDFLoader
 from langchain.text_splitter import RecursiveCharacterTextSplitter
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
+import hashlib
 import os
+import shutil
+import time
 import civic_rag.config as config
 from pathlib import Path
+from civic_rag.backend.docstore import PARENT_ID_KEY, PARENT_CONTENT_KEY
+from civic_rag.backend.partitions import attach_partition_metadata
+
+
+def _parent_id(parent: Any) -> str:
+    """Deterministic id for a parent section, stable across re-ingestion."""
+    key = f"{parent.metadata.get('source', '')}|{parent.metadata.get('page', '')}|{parent.page_content}"
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()[:16]
+
+
+def split_into_parent_child(docs: List[Any], chunk_size: Optional[int] = None,
+                            chunk_overlap: Optional[int] = None) -> List[Any]:
+    """Split pages into parent sections and the small child chunks that get embedded.
+
+    Each child records its parent's id and (transiently) its text; the text is
+    moved to the docstore when the chunks are written to the vector store.
+    chunk_size and chunk_overlap default to config.CHUNK_SIZE/CHUNK_OVERLAP.
+    """
+    parent_splitter = RecursiveCharacterTextSplitter(
+        chunk_size=config.PARENT_CHUNK_SIZE,
+        chunk_overlap=config.PARENT_CHUNK_OVERLAP
+    )
+    child_splitter = RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size or config.CHUNK_SIZE,
+        chunk_overlap=config.CHUNK_OVERLAP if chunk_overlap is None else chunk_overlap
+    )
+    children = []
+    for parent in parent_splitter.split_documents(docs):
+        parent_id = _parent_id(parent)
+        for child in child_splitter.split_documents([parent]):
+            child.metadata[PARENT_ID_KEY] = parent_id
+            child.metadata[PARENT_CONTENT_KEY] = parent.page_content
+            children.append(child)
+    return children
+
+
+class EmptyPDFError(ValueError):
+    """Raised when a PDF is empty or yields no text."""
+
+
+def load_pdf_pages(pdf_path: str) -> List[Any]:
+    """Load the pages of a single PDF, raising on empty or unreadable files."""
+    path = Path(pdf_path)
+    if path.stat().st_size == 0:
+        raise EmptyPDFError("empty file")
+
+    docs = PyPDFLoader(str(path)).load()
+    if not docs:
+        raise EmptyPDFError("no content extracted")
+    return docs
+
+
+def split_pdf_pages(pages: List[Any], pdf_path: str, metadata: Dict[str, Any] = None) -> List[Any]:
+    """Split the loaded pages of a PDF into chunks tagged with its partition and source_file."""
+    path = Path(pdf_path)
+    split_docs = split_into_parent_child(pages)
+    attach_partition_metadata(split_docs, path.name, str(path.parent))
+    for doc in split_docs:
+        if metadata:
+            doc.metadata.update(metadata)
+        doc.metadata['source_file'] = path.name
+    return split_docs
+
+
+def load_and_split_pdf(pdf_path: str, metadata: Dict[str, Any] = None) -> List[Any]:
+    """Load and split a single PDF, raising on empty or unreadable files."""
+    return split_pdf_pages(load_pdf_pages(pdf_path), pdf_path, metadata)
+
+
+def quarantine_file(pdf_path: str, reason: str, quarantine_dir: str = config.QUARANTINE_DIR) -> str:
+    """Move a PDF that cannot be ingested aside, with a note explaining why."""
+    os.makedirs(quarantine_dir, exist_ok=True)
+    name = os.path.basename(pdf_path)
+    target = os.path.join(quarantine_dir, name)
+    if os.path.exists(target):
+        stem, ext = os.path.splitext(name)
+        target = os.path.join(quarantine_dir, f"{stem}.{int(time.time())}{ext}")
+    shutil.move(pdf_path, target)
+    with open(f"{target}.error.txt", 'w', encoding='utf-8') as f:
+        f.write(f"{reason}\n")
+    return target
 
 
 def ingest_pdf(pdf_path: str, metadata: Dict[str, Any]) -> List[Any]:
@@ -13,8 +97,8 @@ def ingest_pdf(pdf_path: str, metadata: Dict[str, Any]) -> List[Any]:
     try:
         loader = PyPDFLoader(pdf_path)
         docs = loader.load()
-        splitter = RecursiveCharacterTextSplitter(chunk_size=config.CHUNK_SIZE, chunk_overlap=config.CHUNK_OVERLAP)
-        split_docs = splitter.split_documents(docs)
+        split_docs = split_into_parent_child(docs)
+        attach_partition_metadata(split_docs, os.path.basename(pdf_path), os.path.dirname(pdf_path))
         for doc in split_docs:
             doc.metadata.update(metadata)
         print(f"✅ Successfully processed: {os.path.basename(pdf_path)}")
@@ -40,36 +124,13 @@ def ingest_all_pdfs_in_directory(directory: str = config.DATA_DIR, metadata: Dic
     # Process each PDF individually
     for pdf_file in pdf_files:
         try:
-            # Check if file is empty
-            if pdf_file.stat().st_size == 0:
-                print(f"⚠️ Skipping empty file: {pdf_file.name}")
-                continue
-            
-            loader = PyPDFLoader(str(pdf_file))
-            docs = loader.load()
-            
-            if not docs:
-                print(f"⚠️ No content extracted from: {pdf_file.name}")
-                continue
-            
-            splitter = RecursiveCharacterTextSplitter(
-                chunk_size=config.CHUNK_SIZE, 
-                chunk_overlap=config.CHUNK_OVERLAP
-            )
-            split_docs = splitter.split_documents(docs)
-            
-            # Add metadata
-            if metadata:
-                for doc in split_docs:
-                    doc.metadata.update(metadata)
-            
-            # Add filename to metadata
-            for doc in split_docs:
-                doc.metadata['source_file'] = pdf_file.name
-            
+            split_docs = load_and_split_pdf(str(pdf_file), metadata)
             all_docs.extend(split_docs)
             print(f"✅ Processed: {pdf_file.name} ({len(split_docs)} chunks)")
             
+        except EmptyPDFError as e:
+            print(f"⚠️ Skipping {pdf_file.name}: {e}")
+            continue
         except Exception as e:
             print(f"❌ Error processing {pdf_file.name}: {e}")
             continue
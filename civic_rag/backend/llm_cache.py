@@ -0,0 +1,137 @@
+"""
+Persistent SQLite cache for LLM responses.
+
+Entries are keyed on model name, temperature, node name and a hash of the
+fully rendered prompt. Old entries are evicted by TTL and, once the cache
+holds more than LLM_CACHE_MAX_ENTRIES, least recently used first.
+"""
+
+import hashlib
+import sqlite3
+import time
+from functools import lru_cache
+from typing import Any, Dict, Optional
+
+import civic_rag.config as config
+
+POLICIES = ("always", "deterministic", "never")
+
+
+class LLMResponseCache:
+    """SQLite-backed response cache shared by every graph node."""
+
+    def __init__(self, path: str = config.LLM_CACHE_PATH,
+                 max_entries: int = config.LLM_CACHE_MAX_ENTRIES,
+                 ttl_seconds: float = config.LLM_CACHE_TTL_SECONDS,
+                 policy: str = config.LLM_CACHE_POLICY,
+                 node_policies: Optional[Dict[str, str]] = None):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown LLM cache policy {policy!r}, expected one of {POLICIES}")
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.policy = policy
+        self.node_policies = config.LLM_CACHE_NODE_POLICIES if node_policies is None else node_policies
+        conn = self._connect()
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS llm_cache (
+                key TEXT PRIMARY KEY,
+                model TEXT NOT NULL,
+                temperature REAL,
+                node TEXT,
+                response TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL,
+                hits INTEGER DEFAULT 0
+            )
+        ''')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_llm_cache_last_access ON llm_cache (last_access)')
+        conn.commit()
+        conn.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        # Parallel graph nodes write concurrently; wait for locks instead of failing
+        return sqlite3.connect(self.path, timeout=30)
+
+    def should_cache(self, node: str, temperature: float) -> bool:
+        """Whether a call from this node at this temperature may be cached."""
+        policy = self.node_policies.get(node, self.policy)
+        if policy == "always":
+            return True
+        if policy == "deterministic":
+            return temperature == 0
+        return False
+
+    @staticmethod
+    def make_key(model: str, temperature: float, node: str, rendered_prompt: str) -> str:
+        prompt_hash = hashlib.sha256(rendered_prompt.encode('utf-8')).hexdigest()
+        return hashlib.sha256(f"{model}|{temperature}|{node}|{prompt_hash}".encode('utf-8')).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """Cached response for a key, or None on a miss or an expired entry."""
+        now = time.time()
+        conn = self._connect()
+        row = conn.execute('SELECT response, created_at FROM llm_cache WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            conn.close()
+            return None
+        if self.ttl_seconds and now - row[1] > self.ttl_seconds:
+            conn.execute('DELETE FROM llm_cache WHERE key = ?', (key,))
+            conn.commit()
+            conn.close()
+            return None
+        conn.execute('UPDATE llm_cache SET last_access = ?, hits = hits + 1 WHERE key = ?', (now, key))
+        conn.commit()
+        conn.close()
+        return row[0]
+
+    def put(self, key: str, model: str, temperature: float, node: str, response: str):
+        """Store a response, then enforce the TTL and size limits."""
+        now = time.time()
+        conn = self._connect()
+        conn.execute('''
+            INSERT OR REPLACE INTO llm_cache (key, model, temperature, node, response, created_at, last_access, hits)
+            VALUES (?, ?, ?, ?, ?, ?, ?, 0)
+        ''', (key, model, temperature, node, response, now, now))
+        if self.ttl_seconds:
+            conn.execute('DELETE FROM llm_cache WHERE created_at < ?', (now - self.ttl_seconds,))
+        conn.execute('''
+            DELETE FROM llm_cache WHERE key IN (
+                SELECT key FROM llm_cache ORDER BY last_access DESC LIMIT -1 OFFSET ?
+            )
+        ''', (self.max_entries,))
+        conn.commit()
+        conn.close()
+
+    def delete(self, key: str):
+        conn = self._connect()
+        conn.execute('DELETE FROM llm_cache WHERE key = ?', (key,))
+        conn.commit()
+        conn.close()
+
+    def clear(self):
+        conn = self._connect()
+        conn.execute('DELETE FROM llm_cache')
+        conn.commit()
+        conn.close()
+
+    def stats(self) -> Dict[str, Any]:
+        """Entry and hit counts, overall and per node."""
+        conn = self._connect()
+        total, hits = conn.execute('SELECT COUNT(*), COALESCE(SUM(hits), 0) FROM llm_cache').fetchone()
+        rows = conn.execute(
+            'SELECT node, COUNT(*), COALESCE(SUM(hits), 0) FROM llm_cache GROUP BY node ORDER BY node'
+        ).fetchall()
+        conn.close()
+        return {
+            "entries": total,
+            "hits": hits,
+            "policy": self.policy,
+            "nodes": {row[0]: {"entries": row[1], "hits": row[2]} for row in rows},
+        }
+
+
+@lru_cache(maxsize=1)
+def get_llm_cache() -> LLMResponseCache:
+    """Process-wide response cache configured from civic_rag.config."""
+    return LLMResponseCache()
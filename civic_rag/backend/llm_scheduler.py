@@ -0,0 +1,249 @@
+"""
+Process-wide scheduler for outbound LLM calls.
+
+Every graph LLM call is admitted through a single scheduler that enforces
+token-bucket limits on requests and tokens per minute. Waiting calls are
+admitted in priority order: interactive traffic before batch traffic, and
+within a traffic class final_synthesis before the aspect analyses. Calls
+rejected with a rate-limit error, or failing with a transient server or
+connection error, are retried with jittered exponential backoff (the LLM
+client's own retries are disabled), and queue waits are recorded for the
+metrics snapshot.
+"""
+
+import heapq
+import itertools
+import random
+import threading
+import time
+from collections import deque
+from functools import lru_cache
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import civic_rag.config as config
+from civic_rag.backend.stats import percentile
+
+Priority = Tuple[int, int]
+
+
+class TokenBucket:
+    """Classic token bucket refilled continuously at capacity per minute."""
+
+    def __init__(self, capacity_per_minute: float):
+        self.capacity = float(capacity_per_minute)
+        self.refill_per_second = self.capacity / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.refill_per_second)
+        self.updated = now
+
+    def time_until(self, amount: float, now: float) -> float:
+        """Seconds until `amount` can be consumed (0 if it can be now)."""
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.refill_per_second
+
+    def consume(self, amount: float, now: float):
+        # May go negative when a reconciliation reports more usage than estimated
+        self._refill(now)
+        self.tokens -= min(amount, self.capacity)
+
+    def adjust(self, amount: float):
+        self.tokens = min(self.capacity, self.tokens - amount)
+
+
+# Statuses the Groq and OpenAI clients themselves treat as retryable, besides 429
+TRANSIENT_STATUS_CODES = (408, 409)
+# Connection failures and timeouts raised by the Groq and OpenAI clients
+TRANSIENT_ERROR_NAMES = ("APIConnectionError", "APITimeoutError")
+
+
+def _status_code(error: Exception) -> Optional[int]:
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    return status
+
+
+def is_rate_limit_error(error: Exception) -> bool:
+    """Recognizes HTTP 429 / rate-limit errors from the Groq or OpenAI clients."""
+    if _status_code(error) == 429:
+        return True
+    name = type(error).__name__.lower()
+    message = str(error).lower()
+    return "ratelimit" in name or "rate limit" in message or "rate_limit" in message
+
+
+def is_transient_error(error: Exception) -> bool:
+    """Recognizes 5xx responses and connection failures worth retrying."""
+    status = _status_code(error)
+    if isinstance(status, int):
+        return status >= 500 or status in TRANSIENT_STATUS_CODES
+    return isinstance(error, ConnectionError) or type(error).__name__ in TRANSIENT_ERROR_NAMES
+
+
+def _retry_after_seconds(error: Exception) -> Optional[float]:
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+def priority_for(node_name: str, traffic_class: Optional[str] = None) -> Priority:
+    """Lower sorts first: (traffic class rank, node rank)."""
+    traffic_rank = config.LLM_TRAFFIC_PRIORITIES.get(traffic_class or "interactive", 0)
+    node_rank = config.LLM_NODE_PRIORITIES.get(node_name, max(config.LLM_NODE_PRIORITIES.values(), default=0) + 1)
+    return traffic_rank, node_rank
+
+
+class LLMScheduler:
+    """Admits LLM calls under shared request/token budgets, in priority order."""
+
+    def __init__(self,
+                 requests_per_minute: float = config.LLM_REQUESTS_PER_MINUTE,
+                 tokens_per_minute: float = config.LLM_TOKENS_PER_MINUTE,
+                 max_retries: int = config.LLM_MAX_RETRIES,
+                 retry_base_seconds: float = config.LLM_RETRY_BASE_SECONDS,
+                 retry_max_seconds: float = config.LLM_RETRY_MAX_SECONDS):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.max_retries = max_retries
+        self.retry_base_seconds = retry_base_seconds
+        self.retry_max_seconds = retry_max_seconds
+        self._condition = threading.Condition()
+        self._waiting = []
+        self._sequence = itertools.count()
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            "admitted": 0,
+            "completed": 0,
+            "failed": 0,
+            "rate_limited": 0,
+            "transient_errors": 0,
+            "retries": 0,
+            "deadline_expired": 0,
+        }
+        self._recent_waits = deque(maxlen=1000)
+        self._wait_by_priority: Dict[str, Dict[str, float]] = {}
+
+    def _count(self, name: str):
+        with self._stats_lock:
+            self._stats[name] += 1
+
+    def _record_wait(self, priority: Priority, waited: float):
+        key = f"{priority[0]}.{priority[1]}"
+        with self._stats_lock:
+            self._recent_waits.append(waited)
+            stats = self._wait_by_priority.setdefault(key, {"count": 0, "total_seconds": 0.0, "max_seconds": 0.0})
+            stats["count"] += 1
+            stats["total_seconds"] += waited
+            stats["max_seconds"] = max(stats["max_seconds"], waited)
+
+    def _acquire(self, priority: Priority, estimated_tokens: int, deadline: Optional[float]) -> float:
+        """Block until this call is first in line and both buckets have room."""
+        started = time.monotonic()
+        entry = (priority, next(self._sequence))
+        with self._condition:
+            heapq.heappush(self._waiting, entry)
+            try:
+                while True:
+                    now = time.monotonic()
+                    wait = 1.0
+                    if self._waiting[0] == entry:
+                        wait = max(self.requests.time_until(1, now), self.tokens.time_until(estimated_tokens, now))
+                        if wait <= 0:
+                            heapq.heappop(self._waiting)
+                            self.requests.consume(1, now)
+                            self.tokens.consume(estimated_tokens, now)
+                            self._condition.notify_all()
+                            return now - started
+                    if deadline is not None:
+                        remaining = deadline - time.time()
+                        if remaining <= 0:
+                            raise TimeoutError("deadline expired while waiting for LLM capacity")
+                        wait = min(wait, remaining)
+                    self._condition.wait(timeout=wait)
+            except BaseException:
+                if entry in self._waiting:
+                    self._waiting.remove(entry)
+                    heapq.heapify(self._waiting)
+                    self._condition.notify_all()
+                raise
+
+    def submit(self, call: Callable[[], Any], priority: Priority = (0, 0),
+               estimated_tokens: int = 0, deadline: Optional[float] = None) -> Any:
+        """Run `call` once admitted, retrying rate-limit and transient errors with jittered backoff.
+
+        deadline is a wall-clock time.time() value; waiting past it raises TimeoutError.
+        """
+        for attempt in range(self.max_retries + 1):
+            try:
+                waited = self._acquire(priority, estimated_tokens, deadline)
+            except TimeoutError:
+                self._count("deadline_expired")
+                raise
+            self._record_wait(priority, waited)
+            self._count("admitted")
+            try:
+                result = call()
+            except Exception as e:
+                if is_rate_limit_error(e):
+                    self._count("rate_limited")
+                elif is_transient_error(e):
+                    self._count("transient_errors")
+                else:
+                    self._count("failed")
+                    raise
+                if attempt == self.max_retries:
+                    self._count("failed")
+                    raise
+                backoff = min(self.retry_max_seconds, self.retry_base_seconds * (2 ** attempt))
+                delay = max(_retry_after_seconds(e) or 0.0, backoff * random.uniform(0.5, 1.5))
+                if deadline is not None and time.time() + delay >= deadline:
+                    self._count("deadline_expired")
+                    raise TimeoutError("deadline expired before LLM retry") from e
+                self._count("retries")
+                time.sleep(delay)
+                continue
+            self._count("completed")
+            return result
+
+    def reconcile_tokens(self, estimated_tokens: int, actual_tokens: Optional[int]):
+        """Charge (or refund) the difference between estimated and reported usage."""
+        if actual_tokens is None:
+            return
+        with self._condition:
+            self.tokens.adjust(actual_tokens - min(estimated_tokens, self.tokens.capacity))
+            self._condition.notify_all()
+
+    def metrics(self) -> Dict[str, Any]:
+        """Counters, current queue depth and queue-wait statistics."""
+        with self._condition:
+            queue_depth = len(self._waiting)
+        with self._stats_lock:
+            waits = sorted(self._recent_waits)
+            by_priority = {
+                key: {**value, "mean_seconds": value["total_seconds"] / value["count"]}
+                for key, value in self._wait_by_priority.items()
+            }
+            stats = dict(self._stats)
+
+        return {
+            **stats,
+            "queue_depth": queue_depth,
+            "wait_p50_seconds": percentile(waits, 0.50),
+            "wait_p95_seconds": percentile(waits, 0.95),
+            "wait_max_seconds": waits[-1] if waits else 0.0,
+            "wait_by_priority": by_priority,
+        }
+
+
+@lru_cache(maxsize=1)
+def get_llm_scheduler() -> LLMScheduler:
+    """The process-wide scheduler shared by all graph LLM calls."""
+    return LLMScheduler()
@@ -0,0 +1,322 @@
+"""
+Concurrent-user load generator for answer_query.
+
+Simulated users each loop over: pick a question from a weighted mix, call
+answer_query, then think for an exponentially distributed time. Concurrency
+is ramped in steps; each step reports throughput, latency percentiles,
+error and degraded-answer rates, LLM scheduler activity and process resource
+usage, and is checked against a p95 latency / error rate SLO. By default the
+chat-completion and web search APIs are replaced by local stand-in servers
+(see stand_in_services) with injectable latency, errors and rate limits.
+"""
+
+import json
+import os
+import random
+import threading
+import time
+from contextlib import redirect_stdout
+from typing import Any, Callable, Dict, List, Optional
+
+import civic_rag.config as config
+from civic_rag.backend.stand_in_services import (
+    FaultProfile,
+    StandInService,
+    start_chat_completion_server,
+    start_web_search_server,
+)
+from civic_rag.backend.stats import percentile
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Answers that start with this are the graph's "nothing completed" fallback
+FAILED_ANSWER_PREFIX = "I apologize"
+# Marker appended by final_synthesis when parts were skipped for the latency budget
+DEGRADED_ANSWER_MARKER = "_Note: to answer in time"
+
+_SCHEDULER_COUNTERS = ["admitted", "completed", "failed", "rate_limited", "transient_errors", "retries",
+                       "deadline_expired"]
+
+# Default for latency_budget: config.LATENCY_BUDGET_SECONDS (None means no budget)
+_DEFAULT = object()
+
+
+def load_question_mix(path: Optional[str] = None) -> Dict[str, float]:
+    """Weighted questions from a JSON file (a list of questions or {question: weight})."""
+    if not path:
+        return dict(config.LOADTEST_QUESTION_MIX)
+    with open(path, encoding='utf-8') as f:
+        mix = json.load(f)
+    if isinstance(mix, list):
+        mix = {question: 1 for question in mix}
+    if not mix:
+        raise ValueError(f"{path} contains no questions")
+    return {str(question): float(weight) for question, weight in mix.items()}
+
+
+def _rss_mb() -> Optional[float]:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def _resource_snapshot() -> Dict[str, Any]:
+    snapshot = {"cpu_seconds": time.process_time(), "rss_mb": _rss_mb(), "max_rss_mb": None,
+                "threads": threading.active_count()}
+    if resource is not None:
+        # ru_maxrss is in KiB on Linux
+        snapshot["max_rss_mb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return snapshot
+
+
+class _ResourceSampler:
+    """Samples RSS and thread count in the background while a step runs."""
+
+    def __init__(self, interval: float = 0.5):
+        self.interval = interval
+        self.peak_rss_mb = None
+        self.peak_threads = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.is_set():
+            rss = _rss_mb()
+            if rss is not None:
+                self.peak_rss_mb = max(self.peak_rss_mb or 0.0, rss)
+            self.peak_threads = max(self.peak_threads, threading.active_count())
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+def _scheduler_metrics() -> Optional[Dict[str, Any]]:
+    try:
+        from civic_rag.backend.llm_scheduler import get_llm_scheduler
+        return get_llm_scheduler().metrics()
+    except Exception:
+        return None
+
+
+def _default_answer_fn(traffic_class: str, analysis_mode: Optional[str], latency_budget: Optional[float]) -> Callable[[str], str]:
+    from civic_rag.backend.rag_pipeline import answer_query
+
+    def answer(question: str) -> str:
+        return answer_query(question, analysis_mode=analysis_mode, traffic_class=traffic_class,
+                            latency_budget=latency_budget)
+    return answer
+
+
+def run_step(answer_fn: Callable[[str], str], concurrency: int, duration_seconds: float,
+             question_mix: Dict[str, float], think_time_seconds: float = 1.0) -> Dict[str, Any]:
+    """Run `concurrency` simulated users for duration_seconds and measure them.
+
+    Users do not start new requests after the step ends, but requests in
+    flight are allowed to finish, so the step's wall time may exceed its
+    duration; throughput is computed over the wall time.
+    """
+    questions, weights = list(question_mix), list(question_mix.values())
+    lock = threading.Lock()
+    latencies, errors, degraded = [], [], 0
+    scheduler_before = _scheduler_metrics()
+    resources_before = _resource_snapshot()
+    started = time.perf_counter()
+    step_end = started + duration_seconds
+
+    def user(index: int):
+        nonlocal degraded
+        rng = random.Random(index)
+        # Stagger start so users do not fire in lockstep
+        time.sleep(rng.uniform(0, think_time_seconds))
+        while time.perf_counter() < step_end:
+            question = rng.choices(questions, weights)[0]
+            request_started = time.perf_counter()
+            error = None
+            try:
+                answer = answer_fn(question)
+                if not answer or answer.startswith(FAILED_ANSWER_PREFIX):
+                    error = "no answer"
+            except Exception as e:
+                error = f"{type(e).__name__}: {e}"
+                answer = ""
+            latency = time.perf_counter() - request_started
+            with lock:
+                latencies.append(latency)
+                if error:
+                    errors.append(error)
+                elif DEGRADED_ANSWER_MARKER in answer:
+                    degraded += 1
+            if think_time_seconds > 0:
+                time.sleep(rng.expovariate(1.0 / think_time_seconds))
+
+    with _ResourceSampler() as sampler:
+        users = [threading.Thread(target=user, args=(i,), daemon=True) for i in range(concurrency)]
+        for thread in users:
+            thread.start()
+        for thread in users:
+            thread.join()
+    wall_seconds = time.perf_counter() - started
+    resources_after = _resource_snapshot()
+    scheduler_after = _scheduler_metrics()
+
+    requests = len(latencies)
+    cpu_seconds = resources_after["cpu_seconds"] - resources_before["cpu_seconds"]
+    step = {
+        "concurrency": concurrency,
+        "wall_seconds": wall_seconds,
+        "requests": requests,
+        "errors": len(errors),
+        "error_rate": len(errors) / requests if requests else 0.0,
+        "degraded": degraded,
+        "degraded_rate": degraded / requests if requests else 0.0,
+        "throughput_rps": requests / wall_seconds if wall_seconds else 0.0,
+        "latency_p50_seconds": percentile(latencies, 0.50),
+        "latency_p95_seconds": percentile(latencies, 0.95),
+        "latency_p99_seconds": percentile(latencies, 0.99),
+        "latency_max_seconds": max(latencies, default=0.0),
+        "error_samples": sorted(set(errors))[:5],
+        "resources": {
+            "cpu_seconds": cpu_seconds,
+            "cpu_utilization": cpu_seconds / wall_seconds if wall_seconds else 0.0,
+            "peak_rss_mb": sampler.peak_rss_mb,
+            "max_rss_mb": resources_after["max_rss_mb"],
+            "peak_threads": sampler.peak_threads,
+        },
+    }
+    if scheduler_before and scheduler_after:
+        step["scheduler"] = {
+            **{name: scheduler_after[name] - scheduler_before[name] for name in _SCHEDULER_COUNTERS},
+            "queue_depth": scheduler_after["queue_depth"],
+            "wait_p95_seconds": scheduler_after["wait_p95_seconds"],
+        }
+    return step
+
+
+def _print_step(step: Dict[str, Any]):
+    resources = step["resources"]
+    rss = f"{resources['peak_rss_mb']:.0f} MB" if resources["peak_rss_mb"] is not None else "n/a"
+    status = "✅" if step["within_slo"] else "❌"
+    print(f"{status} {step['concurrency']:>3} users: {step['requests']} requests, "
+          f"{step['throughput_rps']:.2f} req/s, p50 {step['latency_p50_seconds']:.2f}s, "
+          f"p95 {step['latency_p95_seconds']:.2f}s, p99 {step['latency_p99_seconds']:.2f}s, "
+          f"errors {step['error_rate']:.1%}, degraded {step['degraded_rate']:.1%}, "
+          f"CPU {resources['cpu_utilization']:.0%}, RSS {rss}, threads {resources['peak_threads']}")
+    scheduler = step.get("scheduler")
+    if scheduler:
+        print(f"      LLM calls {scheduler['admitted']} admitted, {scheduler['rate_limited']} rate limited, "
+              f"{scheduler['transient_errors']} transient errors, {scheduler['retries']} retried, {scheduler['deadline_expired']} past deadline, "
+              f"queue wait p95 {scheduler['wait_p95_seconds']:.2f}s")
+    for sample in step["error_samples"]:
+        print(f"      ⚠️ {sample}")
+
+
+def start_stand_ins(llm_faults: Optional[FaultProfile] = None,
+                    search_faults: Optional[FaultProfile] = None) -> Dict[str, StandInService]:
+    """Start the stand-in servers and point the app's LLM and web search clients at them."""
+    llm = start_chat_completion_server(llm_faults)
+    search = start_web_search_server(search_faults)
+    config.GROQ_API_BASE = llm.url
+    # Never send the real key to a stand-in
+    config.GROQ_API_KEY = "stand-in"
+    config.BRAVE_SEARCH_URL = f"{search.url}/res/v1/web/search"
+    config.BRAVE_SEARCH_API_KEY = "stand-in"
+    return {"llm": llm, "web_search": search}
+
+
+def run_load_test(concurrency_steps: List[int], step_seconds: float = 30.0,
+                  think_time_seconds: float = 1.0, question_mix: Optional[Dict[str, float]] = None,
+                  traffic_class: str = "interactive", analysis_mode: Optional[str] = None,
+                  latency_budget=_DEFAULT, slo_p95_seconds: Optional[float] = None,
+                  max_error_rate: float = 0.01, stop_on_breach: bool = False, warmup_requests: int = 1,
+                  use_stand_ins: bool = True, llm_faults: Optional[FaultProfile] = None,
+                  search_faults: Optional[FaultProfile] = None, quiet: bool = True,
+                  answer_fn: Optional[Callable[[str], str]] = None) -> Dict[str, Any]:
+    """Ramp concurrency through concurrency_steps and report each step.
+
+    latency_budget defaults to config.LATENCY_BUDGET_SECONDS; None runs
+    without a budget, which needs an explicit slo_p95_seconds. A step is within
+    the SLO when its p95 latency is at most slo_p95_seconds (default: the
+    latency budget) and its error rate at most max_error_rate.
+    The report's max_concurrency_within_slo is the highest step that met it
+    with every lower step meeting it too.
+    """
+    question_mix = question_mix or load_question_mix()
+    if latency_budget is _DEFAULT:
+        latency_budget = config.LATENCY_BUDGET_SECONDS
+    slo_p95_seconds = slo_p95_seconds or latency_budget
+    if not slo_p95_seconds:
+        raise ValueError("slo_p95_seconds is required when there is no latency budget")
+    services = start_stand_ins(llm_faults, search_faults) if use_stand_ins else {}
+    answer_fn = answer_fn or _default_answer_fn(traffic_class, analysis_mode, latency_budget)
+    # Graph nodes print warnings for every skipped search; keep them out of the report
+    output = open(os.devnull, "w") if quiet else None
+
+    def run(fn, *args, **kwargs):
+        if output is None:
+            return fn(*args, **kwargs)
+        with redirect_stdout(output):
+            return fn(*args, **kwargs)
+
+    report = {
+        "started_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "settings": {
+            "concurrency_steps": concurrency_steps,
+            "step_seconds": step_seconds,
+            "think_time_seconds": think_time_seconds,
+            "traffic_class": traffic_class,
+            "analysis_mode": analysis_mode or config.ANALYSIS_MODE,
+            "latency_budget_seconds": latency_budget,
+            "slo_p95_seconds": slo_p95_seconds,
+            "max_error_rate": max_error_rate,
+            "llm_requests_per_minute": config.LLM_REQUESTS_PER_MINUTE,
+            "llm_tokens_per_minute": config.LLM_TOKENS_PER_MINUTE,
+            "stand_ins": use_stand_ins,
+            "questions": len(question_mix),
+        },
+        "steps": [],
+        "max_concurrency_within_slo": 0,
+    }
+    try:
+        # Loads the embedding model and compiles the graph outside the measurements
+        for question in list(question_mix)[:warmup_requests]:
+            try:
+                run(answer_fn, question)
+            except Exception as e:
+                print(f"⚠️ Warm-up request failed: {e}")
+
+        breached = False
+        for concurrency in concurrency_steps:
+            step = run(run_step, answer_fn, concurrency, step_seconds, question_mix, think_time_seconds)
+            step["within_slo"] = (step["latency_p95_seconds"] <= slo_p95_seconds
+                                  and step["error_rate"] <= max_error_rate)
+            report["steps"].append(step)
+            _print_step(step)
+            if not step["within_slo"]:
+                breached = True
+                if stop_on_breach:
+                    break
+            elif not breached:
+                report["max_concurrency_within_slo"] = concurrency
+    finally:
+        if output is not None:
+            output.close()
+        try:
+            from civic_rag.backend.prompts import get_prompt_registry
+            report["prompts"] = get_prompt_registry().stats()
+        except Exception:
+            pass
+        for name, service in services.items():
+            report.setdefault("stand_ins", {})[name] = service.stats()
+            service.stop()
+    return report
@@ -0,0 +1,155 @@
+"""
+Bounded per-session conversation memory.
+
+Turns are stored in SQLite by session id, outside the Streamlit process. Once
+the stored turns exceed MEMORY_TOKEN_BUDGET, all but the most recent
+MEMORY_RECENT_TURNS are folded into a rolling summary and deleted, so the
+memory and prompt size of a session stay bounded however long it runs.
+"""
+
+import sqlite3
+import threading
+from typing import Callable, Dict, List, Optional, Tuple, Any
+
+import civic_rag.config as config
+from civic_rag.backend.tokens import count_tokens, truncate_to_tokens
+
+Turn = Tuple[str, str]
+
+# Sessions with a compaction running in this process
+_compacting = set()
+_compacting_lock = threading.Lock()
+
+
+def _connect(path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(path, timeout=30)
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS sessions (
+            session_id TEXT PRIMARY KEY,
+            summary TEXT DEFAULT '',
+            updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS turns (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            session_id TEXT NOT NULL,
+            role TEXT NOT NULL,
+            content TEXT NOT NULL,
+            tokens INTEGER NOT NULL,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_turns_session ON turns (session_id, id)')
+    columns = [row[1] for row in conn.execute('PRAGMA table_info(sessions)')]
+    if 'folded_through' not in columns:
+        # Id of the last turn folded into the summary, for compare-and-set compaction
+        conn.execute('ALTER TABLE sessions ADD COLUMN folded_through INTEGER DEFAULT 0')
+    return conn
+
+
+def append_turn(session_id: str, role: str, content: str, path: str = config.MEMORY_DB_PATH):
+    """Store one turn ("user" or "assistant") for a session."""
+    conn = _connect(path)
+    conn.execute('INSERT OR IGNORE INTO sessions (session_id) VALUES (?)', (session_id,))
+    conn.execute(
+        'INSERT INTO turns (session_id, role, content, tokens) VALUES (?, ?, ?, ?)',
+        (session_id, role, content, count_tokens(content))
+    )
+    conn.execute('UPDATE sessions SET updated_at = CURRENT_TIMESTAMP WHERE session_id = ?', (session_id,))
+    conn.commit()
+    conn.close()
+
+
+def get_session(session_id: str, path: str = config.MEMORY_DB_PATH) -> Dict[str, Any]:
+    """Rolling summary and the turns not yet folded into it, oldest first."""
+    conn = _connect(path)
+    row = conn.execute('SELECT summary FROM sessions WHERE session_id = ?', (session_id,)).fetchone()
+    turns = conn.execute(
+        'SELECT role, content FROM turns WHERE session_id = ? ORDER BY id', (session_id,)
+    ).fetchall()
+    conn.close()
+    return {
+        "summary": row[0] if row else "",
+        "turns": [(role, content) for role, content in turns],
+    }
+
+
+def clear_session(session_id: str, path: str = config.MEMORY_DB_PATH):
+    """Forget everything stored for a session."""
+    conn = _connect(path)
+    conn.execute('DELETE FROM turns WHERE session_id = ?', (session_id,))
+    conn.execute('DELETE FROM sessions WHERE session_id = ?', (session_id,))
+    conn.commit()
+    conn.close()
+
+
+def compact_session(session_id: str,
+                    summarize: Callable[[str, List[Turn]], str],
+                    path: str = config.MEMORY_DB_PATH) -> bool:
+    """Fold older turns into the rolling summary once the token budget is exceeded.
+
+    summarize(previous_summary, turns) returns the new summary text; it is
+    capped at MEMORY_SUMMARY_MAX_TOKENS. Returns True if turns were folded.
+    Concurrent compactions of a session never lose turns: within a process
+    only one runs at a time, and across processes the summary is only
+    written if no other compaction folded turns since it was read.
+    """
+    with _compacting_lock:
+        if session_id in _compacting:
+            # The running compaction folds these turns; the next turn re-checks the budget
+            return False
+        _compacting.add(session_id)
+    try:
+        return _compact_session(session_id, summarize, path)
+    finally:
+        with _compacting_lock:
+            _compacting.discard(session_id)
+
+
+def _compact_session(session_id: str, summarize: Callable[[str, List[Turn]], str], path: str) -> bool:
+    conn = _connect(path)
+    row = conn.execute(
+        'SELECT summary, folded_through FROM sessions WHERE session_id = ?', (session_id,)
+    ).fetchone()
+    rows = conn.execute(
+        'SELECT id, role, content, tokens FROM turns WHERE session_id = ? ORDER BY id', (session_id,)
+    ).fetchall()
+    conn.close()
+
+    if sum(r[3] for r in rows) <= config.MEMORY_TOKEN_BUDGET or len(rows) <= config.MEMORY_RECENT_TURNS:
+        return False
+
+    previous_summary, folded_through = (row[0], row[1] or 0) if row else ("", 0)
+    to_fold = rows[:len(rows) - config.MEMORY_RECENT_TURNS]
+    summary = summarize(previous_summary, [(r[1], r[2]) for r in to_fold])
+    summary = truncate_to_tokens(summary, config.MEMORY_SUMMARY_MAX_TOKENS)
+
+    # Summary update and deletion of the folded turns happen in one transaction,
+    # and only if the summary this one extends is still the current one
+    conn = _connect(path)
+    with conn:
+        conn.execute('INSERT OR IGNORE INTO sessions (session_id) VALUES (?)', (session_id,))
+        updated = conn.execute(
+            '''UPDATE sessions SET summary = ?, folded_through = ?, updated_at = CURRENT_TIMESTAMP
+               WHERE session_id = ? AND COALESCE(folded_through, 0) = ?''',
+            (summary, to_fold[-1][0], session_id, folded_through)
+        ).rowcount
+        if updated:
+            conn.execute(
+                'DELETE FROM turns WHERE session_id = ? AND id <= ?', (session_id, to_fold[-1][0])
+            )
+    conn.close()
+    return bool(updated)
+
+
+def format_context(session: Dict[str, Any], max_turn_tokens: Optional[int] = None) -> str:
+    """Render the bounded summary and recent turns for use in a prompt."""
+    max_turn_tokens = max_turn_tokens or config.MEMORY_TURN_MAX_TOKENS
+    parts = []
+    if session["summary"]:
+        parts.append(f"Summary of earlier conversation: {session['summary']}")
+    for role, content in session["turns"]:
+        speaker = "User" if role == "user" else "Assistant"
+        parts.append(f"{speaker}: {truncate_to_tokens(content, max_turn_tokens)}")
+    return "\n".join(parts)
@@ -0,0 +1,227 @@
+"""
+Normalized jurisdiction / topic / document-type metadata and search routing.
+
+Ingestion tags every chunk with a jurisdiction, a topic and a document type,
+derived from keyword rules over the file name and text, and optionally
+overridden per file in DATA_DIR/metadata.json:
+
+    {"Aragalaya.pdf": {"jurisdiction": "Sri Lanka", "doc_type": "report"}}
+
+Retrieval uses the same vocabulary to push metadata filters down to Chroma
+and, when PARTITION_COLLECTIONS_BY is set, to pick which per-partition
+collections to search.
+"""
+
+import json
+import os
+import re
+from functools import lru_cache
+from typing import Any, Dict, List, Optional
+
+import civic_rag.config as config
+
+UNKNOWN = "unknown"
+GENERAL_TOPIC = "general"
+# langchain_chroma's default collection, used when collections are not partitioned
+DEFAULT_COLLECTION = "langchain"
+
+JURISDICTION_ALIASES = {
+    "nepal": ["nepal", "nepali", "nepalese", "kathmandu", "pokhara", "lalitpur"],
+    "sri_lanka": ["sri lanka", "sri-lanka", "srilanka", "sri lankan", "lankan", "colombo", "aragalaya"],
+    "bangladesh": ["bangladesh", "bangladeshi", "dhaka"],
+    "india": ["india", "indian", "delhi"],
+}
+
+TOPIC_KEYWORDS = {
+    "economic": ["economic", "economy", "gdp", "business", "inflation", "debt", "financial", "wage",
+                 "employment", "tourism", "price", "fuel", "imf"],
+    "political": ["political", "government", "parliament", "party", "parties", "election", "president",
+                  "prime minister", "cabinet", "opposition", "policy"],
+    "legal": ["law", "legal", "act", "court", "constitution", "constitutional", "rights", "arrest",
+              "ordinance", "human rights", "ohchr", "commission"],
+    "social": ["social", "community", "cultural", "religious", "media", "public opinion", "youth",
+               "student", "citizens", "space"],
+    "safety": ["safety", "violence", "police", "security", "curfew", "unrest", "injured", "killed",
+               "force", "emergency"],
+    "environment": ["conservation", "environment", "forest", "wildlife", "biodiversity"],
+}
+
+DOC_TYPE_KEYWORDS = {
+    "legislation": ["act", "ordinance", "constitution", "bill", "regulation"],
+    "report": ["report", "analysis", "summary", "preliminary", "executive", "findings"],
+    "guideline": ["guideline", "guidelines", "guide", "handbook", "manual"],
+    "academic": ["journal", "chapter", "struggle", "isbn", "university", "abstract"],
+    "news": ["news", "press release", "reported on"],
+}
+
+# Aspect of a RAG query -> topics it should be routed to
+ASPECT_TOPICS = {
+    "economic": ["economic"],
+    "political": ["political", "legal"],
+    "social": ["social", "safety"],
+    "safety": ["safety", "social"],
+    "legal": ["legal", "political"],
+}
+
+PARTITION_KEYS = ("jurisdiction", "topic", "doc_type")
+
+
+def _slug(value: str) -> str:
+    return re.sub(r"[^a-z0-9]+", "_", value.strip().lower()).strip("_")
+
+
+def _keyword_scores(text: str, vocabulary: Dict[str, List[str]]) -> Dict[str, int]:
+    text = f" {text.lower()} "
+    scores = {}
+    for label, keywords in vocabulary.items():
+        score = sum(len(re.findall(rf"\b{re.escape(keyword)}\b", text)) for keyword in keywords)
+        if score:
+            scores[label] = score
+    return scores
+
+
+def _best(scores: Dict[str, int], default: str) -> str:
+    return max(scores, key=scores.get) if scores else default
+
+
+def normalize_jurisdiction(value: Optional[str]) -> str:
+    """Map a free-form country/place name onto the jurisdiction vocabulary."""
+    if not value:
+        return UNKNOWN
+    slug = _slug(value)
+    for jurisdiction, aliases in JURISDICTION_ALIASES.items():
+        if slug == jurisdiction or slug in (_slug(alias) for alias in aliases):
+            return jurisdiction
+    return slug or UNKNOWN
+
+
+def normalize_topic(value: Optional[str]) -> str:
+    if not value:
+        return GENERAL_TOPIC
+    slug = _slug(value)
+    if slug in TOPIC_KEYWORDS:
+        return slug
+    return _best(_keyword_scores(value, TOPIC_KEYWORDS), slug or GENERAL_TOPIC)
+
+
+def normalize_doc_type(value: Optional[str]) -> str:
+    if not value:
+        return UNKNOWN
+    slug = _slug(value)
+    if slug in DOC_TYPE_KEYWORDS:
+        return slug
+    return _best(_keyword_scores(value, DOC_TYPE_KEYWORDS), slug or UNKNOWN)
+
+
+def detect_jurisdictions(text: str) -> List[str]:
+    """Jurisdictions named in a piece of text, most mentioned first."""
+    scores = _keyword_scores(text, JURISDICTION_ALIASES)
+    return sorted(scores, key=scores.get, reverse=True)
+
+
+def classify_topic(text: str, default: str = GENERAL_TOPIC) -> str:
+    return _best(_keyword_scores(text, TOPIC_KEYWORDS), default)
+
+
+@lru_cache(maxsize=8)
+def _load_overrides(path: str, mtime: float) -> Dict[str, Dict[str, str]]:
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def get_metadata_overrides(filename: str, directory: str = config.DATA_DIR) -> Dict[str, str]:
+    """Per-file metadata from DATA_DIR/metadata.json, if present."""
+    path = os.path.join(directory, config.PARTITION_METADATA_FILE)
+    if not os.path.exists(path):
+        return {}
+    try:
+        return _load_overrides(path, os.path.getmtime(path)).get(filename, {})
+    except (OSError, json.JSONDecodeError) as e:
+        print(f"⚠️ Could not read {path}: {e}")
+        return {}
+
+
+def classify_document(filename: str, text: str, overrides: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+    """Document-level jurisdiction, topic and doc_type for a source file."""
+    overrides = overrides or {}
+    # The file name is a strong signal, so it counts several times
+    sample = f"{filename} {filename} {filename} {text}"
+    jurisdictions = detect_jurisdictions(sample)
+    return {
+        "jurisdiction": normalize_jurisdiction(overrides.get("jurisdiction")) if overrides.get("jurisdiction")
+        else (jurisdictions[0] if jurisdictions else UNKNOWN),
+        "topic": normalize_topic(overrides.get("topic")) if overrides.get("topic")
+        else classify_topic(sample),
+        "doc_type": normalize_doc_type(overrides.get("doc_type")) if overrides.get("doc_type")
+        else _best(_keyword_scores(sample, DOC_TYPE_KEYWORDS), UNKNOWN),
+    }
+
+
+def attach_partition_metadata(docs: List[Any], filename: str, directory: str = config.DATA_DIR):
+    """Tag chunks of one file with normalized partition metadata.
+
+    Jurisdiction and doc_type are per document; topic is per chunk, falling
+    back to the document topic when a chunk has no topical keywords. A topic
+    set in metadata.json applies to every chunk.
+    """
+    if not docs:
+        return
+    overrides = get_metadata_overrides(filename, directory)
+    sample = " ".join(doc.page_content for doc in docs[:20])[:20000]
+    document = classify_document(filename, sample, overrides)
+    for doc in docs:
+        doc.metadata["jurisdiction"] = document["jurisdiction"]
+        doc.metadata["doc_type"] = document["doc_type"]
+        if overrides.get("topic"):
+            doc.metadata["topic"] = document["topic"]
+        else:
+            doc.metadata["topic"] = classify_topic(doc.page_content, document["topic"])
+
+
+def collection_for(metadata: Dict[str, Any]) -> str:
+    """Chroma collection a chunk belongs in."""
+    key = config.PARTITION_COLLECTIONS_BY
+    if not key:
+        return DEFAULT_COLLECTION
+    return f"partition_{key}_{_slug(str(metadata.get(key) or UNKNOWN))}"
+
+
+def aspect_query(question: str, aspect: Optional[str] = None) -> str:
+    """The RAG query for one aspect of a question: the aspect's prefix terms plus the question."""
+    prefix = config.RAG_ASPECT_QUERY_PREFIXES.get(aspect or "")
+    return f"{prefix} {question}" if prefix else question
+
+
+def route_query(query: str, aspect: Optional[str] = None) -> Dict[str, Any]:
+    """Metadata filter and partition values for a RAG query."""
+    conditions = []
+    topics = ASPECT_TOPICS.get(aspect or "", []) if config.RAG_ROUTE_BY_TOPIC else []
+    if topics:
+        # Chunks without a clear topic stay searchable from every aspect
+        conditions.append({"topic": {"$in": topics + [GENERAL_TOPIC]}})
+    jurisdictions = detect_jurisdictions(query) if config.RAG_ROUTE_BY_JURISDICTION else []
+    if jurisdictions:
+        conditions.append({"jurisdiction": {"$in": jurisdictions + [UNKNOWN]}})
+
+    where = None
+    if len(conditions) == 1:
+        where = conditions[0]
+    elif conditions:
+        where = {"$and": conditions}
+
+    partition_values = None
+    if config.PARTITION_COLLECTIONS_BY == "topic" and topics:
+        partition_values = topics + [GENERAL_TOPIC]
+    elif config.PARTITION_COLLECTIONS_BY == "jurisdiction" and jurisdictions:
+        partition_values = jurisdictions + [UNKNOWN]
+    return {"where": where, "partitions": partition_values}
+
+
+def classify_question(question: str) -> Dict[str, Optional[str]]:
+    """Country and topic of a user question, for the query log."""
+    jurisdictions = detect_jurisdictions(question)
+    topic = classify_topic(question, default="")
+    return {
+        "country": jurisdictions[0] if jurisdictions else None,
+        "topic": topic or None,
+    }
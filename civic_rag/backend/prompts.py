@@ -0,0 +1,346 @@
+"""
+Registry of the graph's prompt templates.
+
+Every node's template is compiled once, when the registry is first used,
+and versioned by a hash of its text. Rendering goes through the registry,
+which caps each node's inputs at PROMPT_INPUT_MAX_TOKENS and records the
+rendered prompt size per node. Over-long inputs are cut at a chunk boundary
+(a whole search result or paragraph), always the same way for the same
+input, so truncation never splits a source mid-sentence and never varies
+between runs. Prompt-size statistics are written to PROMPT_STATS_PATH.
+"""
+
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from collections import deque
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+
+from langchain.prompts import ChatPromptTemplate
+
+import civic_rag.config as config
+from civic_rag.backend.stats import percentile
+from civic_rag.backend.tokens import count_tokens, truncate_to_tokens
+
+# Node name -> template. Editing a template changes its version.
+PROMPT_TEMPLATES = {
+    "economic_analysis": """
+    You are an economic analyst specializing in protest impacts. Analyze the economic aspects based on:
+    
+    User Question: {question}
+    
+    Current Economic Data: {economic_web_data}
+    
+    Historical Economic Guidance: {economic_rag_data}
+    
+    Provide analysis covering:
+    1. Impact on businesses and commerce
+    2. Effects on employment and daily wages
+    3. Supply chain disruptions
+    4. Tourism and service sector impacts
+    5. Long-term economic consequences
+    
+    Be specific with numbers and percentages where available.
+    """,
+    "political_analysis": """
+    You are a political analyst specializing in Nepal's political landscape. Analyze based on:
+    
+    User Question: {question}
+    
+    Current Political Data: {political_web_data}
+    
+    Historical Political Context: {political_rag_data}
+    
+    Provide analysis covering:
+    1. Key political actors and their positions
+    2. Government response and policies
+    3. Opposition strategies
+    4. Constitutional and legal frameworks
+    5. Potential political outcomes
+    
+    Focus on factual analysis without bias.
+    """,
+    "social_analysis": """
+    You are a social analyst focusing on community impacts. Analyze based on:
+    
+    User Question: {question}
+    
+    Current Social Data: {social_web_data}
+    
+    Historical Social Context: {social_rag_data}
+    
+    Provide analysis covering:
+    1. Community sentiment and participation
+    2. Impact on different social groups
+    3. Cultural and religious considerations
+    4. Media coverage and public opinion
+    5. Social cohesion and divisions
+    
+    Be sensitive to cultural nuances.
+    """,
+    "combined_analysis": """
+    You are a team of economic, political and social analysts specializing in protests in Nepal.
+    Analyze the question from all three perspectives based on:
+    
+    User Question: {question}
+    
+    Current Economic Data: {economic_web_data}
+    Historical Economic Guidance: {economic_rag_data}
+    
+    Current Political Data: {political_web_data}
+    Historical Political Context: {political_rag_data}
+    
+    Current Social Data: {social_web_data}
+    Historical Social Context: {social_rag_data}
+    
+    Be specific with numbers where available, factual and unbiased on politics,
+    and sensitive to cultural nuances.
+    
+    {format_instructions}
+    """,
+    "safety_analysis": """
+    You are a safety and security expert. Based on all available data, provide safety analysis:
+    
+    Web Data: {web_results}
+    RAG Data: {rag_results}
+    
+    Focus on:
+    1. Current safety risks and hotspots
+    2. Recommended safety precautions
+    3. Emergency contacts and procedures
+    4. Safe routes and areas
+    5. Time-specific safety advice
+    
+    Prioritize citizen safety above all.
+    """,
+    "legal_analysis": """
+    You are a legal expert on Nepal's protest laws. Based on available data, provide legal guidance:
+    
+    Web Data: {web_results}
+    RAG Data: {rag_results}
+    
+    Cover:
+    1. Constitutional rights to protest
+    2. Legal limitations and restrictions
+    3. Arrest procedures and rights
+    4. Legal aid contacts
+    5. Documentation recommendations
+    
+    Cite specific laws where applicable.
+    """,
+    "final_synthesis": """
+    You are a senior protest guidance advisor. Synthesize all analyses into actionable guidance:
+    
+    Conversation So Far: {conversation_context}
+    
+    User Question: {question}
+    
+    Economic Analysis: {economic_analysis}
+    
+    Political Analysis: {political_analysis}
+    
+    Social Analysis: {social_analysis}
+    
+    Safety Analysis: {safety_analysis}
+    
+    Legal Analysis: {legal_analysis}
+    
+    Analyses marked "Not available" could not be completed in time; do not
+    guess at their content, answer from the others.
+    
+    Provide a comprehensive response that:
+    1. Directly addresses the user's question
+    2. Integrates insights from all analyses
+    3. Prioritizes safety and legal compliance
+    4. Offers practical, actionable advice
+    5. Includes relevant contacts and resources
+    
+    Structure your response with clear sections and bullet points for readability.
+    """,
+    "memory_summary": """
+    Update the running summary of a conversation between a user and a protest guidance assistant.
+    
+    Current Summary: {summary}
+    
+    New Turns:
+    {turns}
+    
+    Write a concise summary (at most 150 words) that keeps the topics, locations,
+    dates and concerns the user raised and the key advice given. Omit pleasantries.
+    """,
+}
+
+# Appended where sections were dropped, so the model knows the input is partial
+_OMITTED_NOTE = "[{count} more section(s) omitted to fit the prompt]"
+
+
+def _split_chunks(text: str) -> Tuple[List[str], bool]:
+    """Split text into whole search results (JSON list items) or paragraphs.
+
+    Returns the chunks and whether they are JSON items.
+    """
+    stripped = text.strip()
+    if stripped.startswith("["):
+        try:
+            items = json.loads(stripped)
+        except ValueError:
+            items = None
+        if isinstance(items, list) and items:
+            return [json.dumps(item, ensure_ascii=False) for item in items], True
+    return [chunk for chunk in re.split(r"\n\s*\n", text) if chunk.strip()], False
+
+
+def truncate_at_chunks(text: str, max_tokens: int) -> str:
+    """Keep the leading whole chunks of text that fit in max_tokens.
+
+    If not even the first chunk fits, it is cut at a token boundary instead.
+    """
+    if count_tokens(text) <= max_tokens:
+        return text
+    chunks, is_json = _split_chunks(text)
+    separator = ", " if is_json else "\n\n"
+    kept, used = [], 0
+    for chunk in chunks:
+        tokens = count_tokens(chunk) + (count_tokens(separator) if kept else 0)
+        if used + tokens > max_tokens:
+            break
+        kept.append(chunk)
+        used += tokens
+    note = _OMITTED_NOTE.format(count=len(chunks) - len(kept))
+    # Leave room for the note (and the brackets of a JSON list)
+    budget = max_tokens - count_tokens(note) - 2
+    while kept and used > budget:
+        used -= count_tokens(kept.pop()) + (count_tokens(separator) if kept else 0)
+        note = _OMITTED_NOTE.format(count=len(chunks) - len(kept))
+    if not kept:
+        return truncate_to_tokens(chunks[0] if chunks else text, max(budget, 0))
+    body = f"[{separator.join(kept)}]" if is_json else separator.join(kept)
+    return f"{body}\n{note}"
+
+
+class RenderedPrompt:
+    """Messages for one LLM call, with their size and the inputs that were cut."""
+
+    def __init__(self, messages: List[Any], prompt_tokens: int, truncated: Dict[str, int]):
+        self.messages = messages
+        self.prompt_tokens = prompt_tokens
+        # Input name -> tokens removed by its cap
+        self.truncated = truncated
+
+
+class _NodeStats:
+    def __init__(self):
+        self.renders = 0
+        self.truncated_renders = 0
+        self.tokens_removed = 0
+        self.truncations_by_input: Dict[str, int] = {}
+        self.prompt_tokens = deque(maxlen=1000)
+        self.max_prompt_tokens = 0
+
+
+class PromptRegistry:
+    """Compiled, versioned node prompts with input caps and size statistics."""
+
+    def __init__(self, templates: Dict[str, str] = PROMPT_TEMPLATES,
+                 input_caps: Dict[str, Dict[str, int]] = config.PROMPT_INPUT_MAX_TOKENS,
+                 stats_path: Optional[str] = config.PROMPT_STATS_PATH):
+        self.prompts: Dict[str, ChatPromptTemplate] = {}
+        self.versions: Dict[str, str] = {}
+        for name, template in templates.items():
+            self.prompts[name] = ChatPromptTemplate.from_template(template)
+            self.versions[name] = hashlib.sha1(template.encode('utf-8')).hexdigest()[:12]
+        for name, caps in input_caps.items():
+            if name not in self.prompts:
+                raise ValueError(f"PROMPT_INPUT_MAX_TOKENS names unknown prompt {name!r}")
+            unknown = set(caps) - set(self.prompts[name].input_variables)
+            if unknown:
+                raise ValueError(f"PROMPT_INPUT_MAX_TOKENS[{name!r}] names unknown inputs {sorted(unknown)}")
+        self.input_caps = input_caps
+        self.stats_path = stats_path
+        self._lock = threading.Lock()
+        self._stats: Dict[str, _NodeStats] = {name: _NodeStats() for name in self.prompts}
+        self._last_export = 0.0
+
+    def render(self, name: str, inputs: Dict[str, Any]) -> RenderedPrompt:
+        """Format a node's prompt with its inputs capped, and record its size."""
+        capped, truncated = dict(inputs), {}
+        for key, max_tokens in self.input_caps.get(name, {}).items():
+            value = capped.get(key)
+            if not isinstance(value, str):
+                continue
+            shortened = truncate_at_chunks(value, max_tokens)
+            if shortened != value:
+                capped[key] = shortened
+                truncated[key] = count_tokens(value) - count_tokens(shortened)
+        messages = self.prompts[name].format_messages(**capped)
+        prompt_tokens = sum(count_tokens(str(message.content)) for message in messages)
+        self._record(name, prompt_tokens, truncated)
+        return RenderedPrompt(messages, prompt_tokens, truncated)
+
+    def _record(self, name: str, prompt_tokens: int, truncated: Dict[str, int]):
+        with self._lock:
+            stats = self._stats[name]
+            stats.renders += 1
+            stats.prompt_tokens.append(prompt_tokens)
+            stats.max_prompt_tokens = max(stats.max_prompt_tokens, prompt_tokens)
+            if truncated:
+                stats.truncated_renders += 1
+                stats.tokens_removed += sum(truncated.values())
+                for key in truncated:
+                    stats.truncations_by_input[key] = stats.truncations_by_input.get(key, 0) + 1
+            export_due = (self.stats_path is not None
+                          and time.monotonic() - self._last_export >= config.PROMPT_STATS_EXPORT_INTERVAL_SECONDS)
+            if export_due:
+                self._last_export = time.monotonic()
+        if export_due:
+            try:
+                self.export_stats()
+            except OSError as e:
+                print(f"⚠️ Could not write prompt statistics: {e}")
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Per node: template version, renders, prompt token percentiles and truncations."""
+        with self._lock:
+            snapshot = {}
+            for name, stats in self._stats.items():
+                tokens = sorted(stats.prompt_tokens)
+                snapshot[name] = {
+                    "version": self.versions[name],
+                    "renders": stats.renders,
+                    "prompt_tokens_mean": sum(tokens) / len(tokens) if tokens else 0.0,
+                    "prompt_tokens_p50": percentile(tokens, 0.50),
+                    "prompt_tokens_p95": percentile(tokens, 0.95),
+                    "prompt_tokens_max": stats.max_prompt_tokens,
+                    "truncated_renders": stats.truncated_renders,
+                    "tokens_removed": stats.tokens_removed,
+                    "truncations_by_input": dict(stats.truncations_by_input),
+                    "input_caps": dict(self.input_caps.get(name, {})),
+                }
+            return snapshot
+
+    def export_stats(self, path: Optional[str] = None):
+        """Write the statistics as JSON, atomically."""
+        path = path or self.stats_path
+        payload = {"updated_at": time.strftime("%Y-%m-%dT%H:%M:%S"), "prompts": self.stats()}
+        # One temp file per writer: every Streamlit worker exports to the same path
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)),
+                                        prefix=f"{os.path.basename(path)}.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(payload, f, indent=2)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+
+@lru_cache(maxsize=1)
+def get_prompt_registry() -> PromptRegistry:
+    """The process-wide registry; templates are compiled on first use."""
+    return PromptRegistry()
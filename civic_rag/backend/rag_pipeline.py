@@ -4,32 +4,84 @@ from langchain_chroma import Chroma
 from langchain_huggingface import HuggingFaceEmbeddings
 from langchain.chains import RetrievalQA
 from langchain_groq import ChatGroq
-from langchain_core.messages import HumanMessage
+from langchain_core.messages import HumanMessage, AIMessage
 import civic_rag.config as config
 import os
+import threading
+import time
 from typing import List, Any
-from civic_rag.backend.chatmodels import get_agent
+from civic_rag.backend import memory
+from civic_rag.backend.chatmodels import get_agent, summarize_conversation
 from civic_rag.backend.utils import load_vector_store
 
 
-def answer_query(question: str) -> str:
-    """Answer a query using the LangGraph-based protest guidance system."""
+# Default for latency_budget: config.LATENCY_BUDGET_SECONDS (None means no budget)
+_DEFAULT = object()
+
+
+def _compact_session_memory(session_id: str):
+    try:
+        memory.compact_session(session_id, summarize_conversation)
+    except Exception as e:
+        print(f"⚠️ Could not compact memory for session {session_id}: {e}")
+
+
+def answer_query(question: str, analysis_mode: str = None, session_id: str = None,
+                 traffic_class: str = "interactive", latency_budget=_DEFAULT) -> str:
+    """Answer a query using the LangGraph-based protest guidance system.
+
+    analysis_mode selects "parallel" (one LLM call per aspect) or "combined"
+    (one structured call for all aspects); defaults to config.ANALYSIS_MODE.
+    With a session_id, the session's bounded memory (rolling summary plus
+    recent turns) is fed into the graph and the new turn is stored.
+    traffic_class ("interactive" or "batch") sets the scheduling priority of
+    the graph's LLM calls. latency_budget (seconds, default
+    config.LATENCY_BUDGET_SECONDS) bounds the whole graph run: parts that do
+    not finish in time are skipped and the answer says which. None or 0 runs
+    without a budget.
+    """
     agent = get_agent()
+    if latency_budget is _DEFAULT:
+        latency_budget = config.LATENCY_BUDGET_SECONDS
+    started = time.time()
+    
+    history = []
+    conversation_context = ""
+    if session_id:
+        session = memory.get_session(session_id)
+        conversation_context = memory.format_context(session)
+        history = [
+            HumanMessage(content=content) if role == "user" else AIMessage(content=content)
+            for role, content in session["turns"]
+        ]
     
     # Create initial state with the user's question
     initial_state = {
-        "messages": [HumanMessage(content=question)],
+        "messages": history + [HumanMessage(content=question)],
         "context": "",
         "web_results": "",
         "rag_results": "",
-        "final_answer": ""
+        "final_answer": "",
+        "analysis_mode": analysis_mode or config.ANALYSIS_MODE,
+        "conversation_context": conversation_context,
+        "traffic_class": traffic_class,
+        "latency_budget": latency_budget,
+        "deadline": started + latency_budget if latency_budget else None,
+        "skipped": []
     }
     
     # Run the graph
     result = agent.invoke(initial_state)
+    answer = result.get("final_answer", "I apologize, but I couldn't generate a response. Please try again.")
+    
+    if session_id:
+        memory.append_turn(session_id, "user", question)
+        memory.append_turn(session_id, "assistant", answer)
+        # Summarizing takes an LLM call; keep it off the response path
+        threading.Thread(target=_compact_session_memory, args=(session_id,), daemon=True).start()
     
     # Return the final answer from the state
-    return result.get("final_answer", "I apologize, but I couldn't generate a response. Please try again.")
+    return answer
     
     # Legacy QA chain approach (commented out, kept for reference)
     # qa_chain = get_qa_chain()
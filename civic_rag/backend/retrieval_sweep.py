@@ -0,0 +1,308 @@
+"""
+Offline sweep of retrieval parameters against a labelled question set.
+
+Each configuration is a chunk size, chunk overlap, k, retrieval mode and
+query style:
+
+- mode "parent" returns the parent sections of the matched chunks (what the
+  RAG nodes do), mode "child" returns the matched chunks themselves
+- query style "aspect" searches with the aspect's prefix terms and topic
+  routing, as the RAG nodes do; "plain" searches with the bare question
+
+One index per (chunk size, overlap) is built under SWEEP_WORK_DIR and reused
+by later runs while the corpus and embedding model are unchanged. For every
+configuration the sweep measures recall@k and MRR of the top-k chunks against
+the labelled sources, the recall of the context that fits the token budget,
+retrieval latency and the prompt tokens the context adds, then
+reports the Pareto frontier: configurations no other configuration beats on
+quality without costing more.
+
+Labelled questions are a JSON list (or JSONL) of objects:
+
+    {"question": "...", "relevant": ["Aragalaya.pdf", {"source": "Act.pdf", "page": 3}],
+     "aspect": "legal"}
+
+"relevant" names the source files (optionally a 0-based page) that should be
+retrieved. "aspect" is optional; without it, the "aspect" query style
+evaluates the question once for each aspect the RAG nodes search.
+"""
+
+import hashlib
+import itertools
+import json
+import os
+import shutil
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import civic_rag.config as config
+from civic_rag.backend.dedup import CHUNK_SOURCES_KEY
+from civic_rag.backend.partitions import aspect_query
+from civic_rag.backend.stats import percentile
+from civic_rag.backend.tokens import count_tokens
+
+INDEX_MARKER = 'sweep_index.json'
+# Aspects searched by the RAG nodes for every question
+GRAPH_ASPECTS = ["economic", "political", "social"]
+
+QUALITY_METRICS = ("recall_at_k", "mrr", "context_recall")
+COST_METRICS = ("latency_p95_ms", "prompt_tokens_mean")
+
+Relevant = Tuple[str, Optional[int]]
+
+
+def load_labelled_questions(path: str) -> List[Dict[str, Any]]:
+    """Read the labelled set, normalizing each relevant entry to (source_file, page or None)."""
+    with open(path, encoding='utf-8') as f:
+        text = f.read()
+    try:
+        entries = json.loads(text)
+    except json.JSONDecodeError:
+        entries = [json.loads(line) for line in text.splitlines() if line.strip()]
+    questions = []
+    for number, entry in enumerate(entries, 1):
+        if not entry.get("question") or not entry.get("relevant"):
+            raise ValueError(f"{path}: entry {number} needs a question and at least one relevant source")
+        relevant = []
+        for item in entry["relevant"]:
+            if isinstance(item, str):
+                relevant.append((item, None))
+            else:
+                relevant.append((item["source"], item.get("page")))
+        questions.append({"question": entry["question"], "aspect": entry.get("aspect"), "relevant": relevant})
+    return questions
+
+
+def _matches(doc: Any, relevant: Relevant) -> bool:
+    source, page = relevant
+    metadata = doc.metadata
+    # A chunk collapsed from near-duplicates counts for every file that contains it
+    copies = metadata.get(CHUNK_SOURCES_KEY) or [{
+        "source_file": metadata.get('source_file') or os.path.basename(str(metadata.get('source', ''))),
+        "page": metadata.get('page'),
+    }]
+    return any(copy["source_file"] == source and (page is None or copy["page"] == page) for copy in copies)
+
+
+def score_ranking(docs: List[Any], relevant: List[Relevant]) -> Dict[str, float]:
+    """Recall of the relevant sources among the ranked docs, and the reciprocal rank of the first hit."""
+    found = set()
+    reciprocal_rank = 0.0
+    for rank, doc in enumerate(docs, 1):
+        for index, item in enumerate(relevant):
+            if _matches(doc, item):
+                found.add(index)
+                if not reciprocal_rank:
+                    reciprocal_rank = 1.0 / rank
+    return {"recall": len(found) / len(relevant), "reciprocal_rank": reciprocal_rank}
+
+
+def load_corpus(directory: str = config.DATA_DIR) -> Tuple[Dict[str, List[Any]], str]:
+    """PDF pages by file name, parsed once for every configuration, and a corpus fingerprint."""
+    from langchain_community.document_loaders import PyPDFLoader
+    from civic_rag.backend.docstore import file_fingerprint
+
+    pages_by_file = {}
+    digest = hashlib.sha1()
+    for pdf_path in sorted(Path(directory).glob("*.pdf")):
+        try:
+            pages = PyPDFLoader(str(pdf_path)).load()
+        except Exception as e:
+            print(f"⚠️ Skipping {pdf_path.name}: {e}")
+            continue
+        if not pages:
+            continue
+        pages_by_file[pdf_path.name] = pages
+        digest.update(f"{pdf_path.name}:{file_fingerprint(str(pdf_path))[2]};".encode('utf-8'))
+    return pages_by_file, digest.hexdigest()
+
+
+def _index_settings(chunk_size: int, chunk_overlap: int, corpus: str,
+                    metadata_overrides: Dict[str, Dict[str, str]]) -> Dict[str, Any]:
+    """Everything that shapes a sweep index or how it is searched; a change means a rebuild."""
+    return {
+        "corpus": corpus,
+        "chunk_size": chunk_size,
+        "chunk_overlap": chunk_overlap,
+        "parent_chunk_size": config.PARENT_CHUNK_SIZE,
+        "parent_chunk_overlap": config.PARENT_CHUNK_OVERLAP,
+        "embedding_model": config.EMBEDDING_MODEL,
+        "dedup": config.DEDUP_ENABLED,
+        "partition_collections_by": config.PARTITION_COLLECTIONS_BY,
+        "route_by_topic": config.RAG_ROUTE_BY_TOPIC,
+        "route_by_jurisdiction": config.RAG_ROUTE_BY_JURISDICTION,
+        "metadata_overrides": metadata_overrides,
+    }
+
+
+def prepare_index(pages_by_file: Dict[str, List[Any]], corpus: str, chunk_size: int, chunk_overlap: int,
+                  data_dir: str = config.DATA_DIR, work_dir: str = config.SWEEP_WORK_DIR,
+                  rebuild: bool = False) -> Tuple[str, Dict[str, Any]]:
+    """Vector store for one chunking configuration, reused if an identical one was built before.
+
+    data_dir is where the PDFs came from; its metadata.json overrides are applied.
+    """
+    from civic_rag.backend.ingestion import split_into_parent_child
+    from civic_rag.backend.partitions import attach_partition_metadata, get_metadata_overrides
+    from civic_rag.backend.utils import build_vector_store
+
+    persist_directory = os.path.join(work_dir, f"chunk{chunk_size}_overlap{chunk_overlap}")
+    marker_path = os.path.join(persist_directory, INDEX_MARKER)
+    overrides = {name: get_metadata_overrides(name, data_dir) for name in sorted(pages_by_file)}
+    settings = _index_settings(chunk_size, chunk_overlap, corpus, overrides)
+    if not rebuild and os.path.exists(marker_path):
+        with open(marker_path, encoding='utf-8') as f:
+            marker = json.load(f)
+        if marker.get("settings") == settings:
+            return persist_directory, {**marker["index"], "reused": True}
+    shutil.rmtree(persist_directory, ignore_errors=True)
+
+    started = time.perf_counter()
+    docs = []
+    for name, pages in pages_by_file.items():
+        chunks = split_into_parent_child(pages, chunk_size, chunk_overlap)
+        attach_partition_metadata(chunks, name, data_dir)
+        for chunk in chunks:
+            chunk.metadata['source_file'] = name
+        docs.extend(chunks)
+    report = {}
+    build_vector_store(docs, persist_directory, report)
+    index = {
+        "chunks": len(docs),
+        "embedded_chunks": report.get("dedup", {}).get("kept", len(docs)),
+        "build_seconds": time.perf_counter() - started,
+    }
+    with open(marker_path, 'w', encoding='utf-8') as f:
+        json.dump({"settings": settings, "index": index}, f, indent=2)
+    return persist_directory, {**index, "reused": False}
+
+
+def build_queries(questions: List[Dict[str, Any]], query_style: str) -> List[Dict[str, Any]]:
+    """The searches to run for a query style, one per (question, aspect)."""
+    queries = []
+    for entry in questions:
+        if query_style == "plain":
+            queries.append({**entry, "query": entry["question"], "aspect": None})
+            continue
+        for aspect in ([entry["aspect"]] if entry["aspect"] else GRAPH_ASPECTS):
+            queries.append({**entry, "query": aspect_query(entry["question"], aspect), "aspect": aspect})
+    return queries
+
+
+def evaluate(queries: List[Dict[str, Any]], persist_directory: str, k: int, mode: str) -> Dict[str, float]:
+    """Mean recall@k and MRR, context recall, retrieval latency and context tokens over the queries.
+
+    recall@k and MRR score the raw top-k chunks; context recall scores only
+    the sections that fit in RAG_CONTEXT_MAX_TOKENS and so reach the prompt.
+    """
+    from civic_rag.backend.utils import search_vector_store, select_context_sections
+
+    recalls, reciprocal_ranks, context_recalls, latencies, prompt_tokens = [], [], [], [], []
+    for query in queries:
+        started = time.perf_counter()
+        docs = search_vector_store(query["query"], query["aspect"], k, persist_directory)
+        sections = select_context_sections(docs, persist_directory, expand_parents=(mode == "parent"))
+        latencies.append((time.perf_counter() - started) * 1000)
+        # select_context_sections has attached the sources of collapsed chunks to docs
+        scores = score_ranking(docs, query["relevant"])
+        recalls.append(scores["recall"])
+        reciprocal_ranks.append(scores["reciprocal_rank"])
+        context_recalls.append(score_ranking([doc for _, doc in sections], query["relevant"])["recall"])
+        prompt_tokens.append(count_tokens("\n\n".join(text for text, _ in sections)))
+    count = len(queries) or 1
+    return {
+        "queries": len(queries),
+        "recall_at_k": sum(recalls) / count,
+        "mrr": sum(reciprocal_ranks) / count,
+        "context_recall": sum(context_recalls) / count,
+        "latency_p50_ms": percentile(latencies, 0.50),
+        "latency_p95_ms": percentile(latencies, 0.95),
+        "prompt_tokens_mean": sum(prompt_tokens) / count,
+        "prompt_tokens_max": max(prompt_tokens, default=0),
+    }
+
+
+def _dominates(a: Dict[str, Any], b: Dict[str, Any]) -> bool:
+    no_worse = (all(a[m] >= b[m] for m in QUALITY_METRICS)
+                and all(a[m] <= b[m] for m in COST_METRICS))
+    better = (any(a[m] > b[m] for m in QUALITY_METRICS)
+              or any(a[m] < b[m] for m in COST_METRICS))
+    return no_worse and better
+
+
+def pareto_frontier(results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Results not dominated on (recall@k, MRR, context recall) vs (p95 latency, prompt tokens), best recall first."""
+    frontier = [r for r in results if not any(_dominates(other, r) for other in results if other is not r)]
+    return sorted(frontier, key=lambda r: (-r["recall_at_k"], -r["mrr"], r["prompt_tokens_mean"]))
+
+
+def _grid(chunk_sizes: Iterable[int], overlaps: Iterable[int]) -> List[Tuple[int, int]]:
+    grid = []
+    for chunk_size, overlap in itertools.product(chunk_sizes, overlaps):
+        if overlap >= chunk_size:
+            print(f"⚠️ Skipping chunk size {chunk_size} with overlap {overlap}: overlap must be smaller")
+            continue
+        grid.append((chunk_size, overlap))
+    return grid
+
+
+def _print_results(results: List[Dict[str, Any]]):
+    print(f"{'':2}{'chunk':>6}{'overlap':>8}{'k':>4}  {'mode':<7}{'query':<7}"
+          f"{'recall':>7}{'MRR':>7}{'ctx':>7}{'p95 ms':>8}{'tokens':>8}")
+    for r in sorted(results, key=lambda r: (-r["recall_at_k"], -r["mrr"], r["prompt_tokens_mean"])):
+        marker = "★" if r["pareto"] else ""
+        print(f"{marker:2}{r['chunk_size']:>6}{r['chunk_overlap']:>8}{r['k']:>4}  {r['mode']:<7}{r['query_style']:<7}"
+              f"{r['recall_at_k']:>7.3f}{r['mrr']:>7.3f}{r['context_recall']:>7.3f}"
+              f"{r['latency_p95_ms']:>8.1f}{r['prompt_tokens_mean']:>8.0f}")
+
+
+def run_sweep(questions: List[Dict[str, Any]],
+              chunk_sizes: Iterable[int] = config.SWEEP_CHUNK_SIZES,
+              chunk_overlaps: Iterable[int] = config.SWEEP_CHUNK_OVERLAPS,
+              k_values: Iterable[int] = config.SWEEP_K_VALUES,
+              modes: Iterable[str] = config.SWEEP_RETRIEVAL_MODES,
+              query_styles: Iterable[str] = config.SWEEP_QUERY_STYLES,
+              data_dir: str = config.DATA_DIR, work_dir: str = config.SWEEP_WORK_DIR,
+              rebuild: bool = False) -> Dict[str, Any]:
+    """Evaluate every configuration in the grid and mark the Pareto frontier."""
+    from civic_rag.backend.utils import get_embeddings
+
+    pages_by_file, corpus = load_corpus(data_dir)
+    if not pages_by_file:
+        raise ValueError(f"No readable PDFs in {data_dir}")
+    print(f"📂 {len(pages_by_file)} files, {len(questions)} labelled questions")
+    # Load the embedding model before anything is timed
+    get_embeddings().embed_query("warm-up")
+
+    queries_by_style = {style: build_queries(questions, style) for style in query_styles}
+    results, indexes = [], []
+    for chunk_size, overlap in _grid(chunk_sizes, chunk_overlaps):
+        persist_directory, index = prepare_index(pages_by_file, corpus, chunk_size, overlap,
+                                                 data_dir=data_dir, work_dir=work_dir, rebuild=rebuild)
+        action = "Reusing" if index["reused"] else f"Built in {index['build_seconds']:.1f}s:"
+        print(f"🔧 {action} index chunk {chunk_size} / overlap {overlap} ({index['embedded_chunks']} chunks embedded)")
+        indexes.append({"chunk_size": chunk_size, "chunk_overlap": overlap, **index})
+        for k, mode, query_style in itertools.product(k_values, modes, query_styles):
+            results.append({
+                "chunk_size": chunk_size,
+                "chunk_overlap": overlap,
+                "k": k,
+                "mode": mode,
+                "query_style": query_style,
+                **evaluate(queries_by_style[query_style], persist_directory, k, mode),
+            })
+
+    frontier = pareto_frontier(results)
+    for result in results:
+        result["pareto"] = any(result is point for point in frontier)
+    _print_results(results)
+    return {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "questions": len(questions),
+        "files": len(pages_by_file),
+        "context_max_tokens": config.RAG_CONTEXT_MAX_TOKENS,
+        "indexes": indexes,
+        "results": results,
+        "pareto_frontier": frontier,
+    }
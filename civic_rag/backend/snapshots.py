@@ -0,0 +1,208 @@
+"""
+Versioned vector store snapshots with atomic promotion and rollback.
+
+Each rebuild writes a complete Chroma store (plus its docstore) into its own
+directory under CHROMA_SNAPSHOTS_DIR. A small JSON state file records the
+active version, the retained history and which of those snapshots were loaded
+but never activated; it is replaced with os.replace, so
+readers always see either the old or the new version, never a partial one.
+The active directory is resolved on every load, so running processes pick up
+a promoted snapshot without restarting.
+"""
+
+import json
+import os
+import shutil
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: state updates are not serialized across processes
+    fcntl = None
+
+import civic_rag.config as config
+
+STATE_FILENAME = 'snapshots.json'
+
+
+def _state_path(root: str) -> str:
+    return os.path.join(root, STATE_FILENAME)
+
+
+def _read_state(root: str) -> Dict[str, Any]:
+    try:
+        with open(_state_path(root), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {"active": None, "history": [], "inactive": []}
+
+
+@contextmanager
+def _state_lock(root: str):
+    """Exclusive lock held around every read-modify-write of the state file.
+
+    A rebuild promoting while the daemon or an import registers a snapshot
+    would otherwise lose one of the two history updates.
+    """
+    os.makedirs(root, exist_ok=True)
+    with open(f"{_state_path(root)}.lock", 'a') as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _write_state(root: str, state: Dict[str, Any]):
+    """Atomically replace the state file."""
+    os.makedirs(root, exist_ok=True)
+    tmp_path = f"{_state_path(root)}.tmp-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(state, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, _state_path(root))
+
+
+def get_active_version(root: str = config.CHROMA_SNAPSHOTS_DIR) -> Optional[str]:
+    """Version name of the active snapshot, or None if none was promoted."""
+    version = _read_state(root).get("active")
+    if version and os.path.isdir(os.path.join(root, version)):
+        return version
+    return None
+
+
+def get_active_vector_store_dir(root: str = config.CHROMA_SNAPSHOTS_DIR) -> str:
+    """Directory of the vector store that should serve queries right now."""
+    version = get_active_version(root)
+    if version:
+        return os.path.join(root, version)
+    # No snapshot promoted yet: fall back to the legacy single directory
+    return config.CHROMA_DIR
+
+
+def list_snapshots(root: str = config.CHROMA_SNAPSHOTS_DIR) -> List[str]:
+    """Retained snapshot versions still on disk, oldest first."""
+    return [v for v in _read_state(root)["history"] if os.path.isdir(os.path.join(root, v))]
+
+
+def create_snapshot_dir(root: str = config.CHROMA_SNAPSHOTS_DIR) -> str:
+    """Create an empty directory for a new, not yet active, snapshot."""
+    version = f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}"
+    path = os.path.join(root, version)
+    os.makedirs(path)
+    return path
+
+
+def discard_snapshot(path: str):
+    """Remove a snapshot directory that will not be promoted."""
+    shutil.rmtree(path, ignore_errors=True)
+
+
+def validate_snapshot(path: str,
+                      min_chunks: int = config.REBUILD_MIN_CHUNKS,
+                      smoke_queries: Optional[List[str]] = None) -> List[str]:
+    """Check a snapshot before promotion; returns a list of problems (empty if valid)."""
+    from civic_rag.backend.utils import count_chunks, search_vector_store
+
+    if smoke_queries is None:
+        smoke_queries = config.REBUILD_SMOKE_QUERIES
+
+    problems = []
+    try:
+        count = sum(count_chunks(path).values())
+        if count < min_chunks:
+            problems.append(f"only {count} chunks (expected at least {min_chunks})")
+        for query in smoke_queries:
+            if not search_vector_store(query, k=1, persist_directory=path):
+                problems.append(f"smoke query returned nothing: {query!r}")
+    except Exception as e:
+        problems.append(f"could not open snapshot: {e}")
+    return problems
+
+
+def register_snapshot(path: str,
+                      root: str = config.CHROMA_SNAPSHOTS_DIR,
+                      keep: int = config.CHROMA_SNAPSHOTS_TO_KEEP) -> str:
+    """Retain a snapshot without activating it; returns its version.
+
+    It can later be activated with promote_snapshot or rollback_snapshot(version),
+    and counts towards `keep` like any promoted snapshot.
+    """
+    version = os.path.basename(os.path.normpath(path))
+    with _state_lock(root):
+        state = _read_state(root)
+        history = [v for v in state["history"] if v != version]
+        history.append(version)
+        inactive = [v for v in state.get("inactive", []) if v != version]
+        inactive.append(version)
+        _write_state(root, {"active": state.get("active"), "history": history, "inactive": inactive})
+        _prune(root, keep)
+    return version
+
+
+def promote_snapshot(path: str,
+                     root: str = config.CHROMA_SNAPSHOTS_DIR,
+                     keep: int = config.CHROMA_SNAPSHOTS_TO_KEEP) -> str:
+    """Make a snapshot active and prune old ones; returns its version."""
+    version = os.path.basename(os.path.normpath(path))
+    with _state_lock(root):
+        state = _read_state(root)
+        history = [v for v in state["history"] if v != version]
+        history.append(version)
+        inactive = [v for v in state.get("inactive", []) if v != version]
+        _write_state(root, {"active": version, "history": history, "inactive": inactive})
+        _prune(root, keep)
+    return version
+
+
+def rollback_snapshot(version: Optional[str] = None,
+                      root: str = config.CHROMA_SNAPSHOTS_DIR) -> Optional[str]:
+    """Re-activate a retained snapshot (by default the one before the active one).
+
+    The default skips snapshots that were loaded but never activated; pass
+    their version explicitly to activate one.
+    """
+    with _state_lock(root):
+        state = _read_state(root)
+        inactive = state.get("inactive", [])
+        available = list_snapshots(root)
+        if version is None:
+            active = state.get("active")
+            if active not in available:
+                return None
+            previous = [v for v in available[:available.index(active)] if v not in inactive]
+            if not previous:
+                return None
+            version = previous[-1]
+        elif version not in available:
+            return None
+        _write_state(root, {"active": version, "history": state["history"],
+                            "inactive": [v for v in inactive if v != version]})
+    return version
+
+
+def prune_snapshots(root: str = config.CHROMA_SNAPSHOTS_DIR,
+                    keep: int = config.CHROMA_SNAPSHOTS_TO_KEEP):
+    """Delete retained snapshots beyond the newest `keep`, never the active one."""
+    with _state_lock(root):
+        _prune(root, keep)
+
+
+def _prune(root: str, keep: int):
+    # Callers hold _state_lock
+    state = _read_state(root)
+    history = state["history"]
+    retained = history[-keep:] if keep > 0 else []
+    for version in history:
+        if version not in retained and version != state.get("active"):
+            shutil.rmtree(os.path.join(root, version), ignore_errors=True)
+    kept = [v for v in history if v in retained or v == state.get("active")]
+    if kept != history:
+        _write_state(root, {"active": state.get("active"), "history": kept,
+                            "inactive": [v for v in state.get("inactive", []) if v in kept]})
@@ -0,0 +1,201 @@
+"""
+Local stand-ins for the chat-completion (Groq/OpenAI) and Brave web search APIs.
+
+Used by the load-testing harness so that concurrency can be ramped without
+spending provider quota. Each server speaks just enough of the real wire
+format for ChatGroq and BraveSearch, and can inject latency, errors and
+rate limits (HTTP 429 with Retry-After) so the scheduler, latency budgets and
+error handling are exercised the way production traffic would.
+"""
+
+import json
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional
+from urllib.parse import parse_qs, urlparse
+
+from civic_rag.backend.llm_scheduler import TokenBucket
+from civic_rag.backend.tokens import count_tokens
+
+
+class FaultProfile:
+    """Latency, error and rate-limit injection for a stand-in server."""
+
+    def __init__(self, latency_seconds: float = 0.0, jitter_seconds: float = 0.0,
+                 error_rate: float = 0.0, requests_per_minute: Optional[float] = None):
+        self.latency_seconds = latency_seconds
+        self.jitter_seconds = jitter_seconds
+        self.error_rate = error_rate
+        self.requests_per_minute = requests_per_minute
+        self._bucket = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self._lock = threading.Lock()
+
+    def retry_after(self) -> Optional[float]:
+        """Seconds the caller must wait if the request is over the rate limit, else None."""
+        if self._bucket is None:
+            return None
+        with self._lock:
+            now = time.monotonic()
+            wait = self._bucket.time_until(1, now)
+            if wait > 0:
+                return wait
+            self._bucket.consume(1, now)
+            return None
+
+    def delay(self):
+        if self.latency_seconds or self.jitter_seconds:
+            time.sleep(max(0.0, self.latency_seconds + random.uniform(-self.jitter_seconds, self.jitter_seconds)))
+
+    def should_fail(self) -> bool:
+        return self.error_rate > 0 and random.random() < self.error_rate
+
+
+class _StandInServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, handler, faults: FaultProfile):
+        super().__init__(address, handler)
+        self.faults = faults
+        self.stats_lock = threading.Lock()
+        self.stats = {"requests": 0, "ok": 0, "rate_limited": 0, "errors": 0}
+
+    def count(self, name: str):
+        with self.stats_lock:
+            self.stats[name] += 1
+
+
+class _StandInHandler(BaseHTTPRequestHandler):
+    server: _StandInServer
+
+    def log_message(self, format, *args):
+        # One line per request would drown the harness output
+        pass
+
+    def _send_json(self, status: int, body: Dict[str, Any], headers: Optional[Dict[str, str]] = None):
+        payload = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _apply_faults(self) -> bool:
+        """Sends an injected 429 or 500 and returns False, or returns True to proceed."""
+        self.server.count("requests")
+        faults = self.server.faults
+        retry_after = faults.retry_after()
+        if retry_after is not None:
+            self.server.count("rate_limited")
+            self._send_json(429, {"error": {"message": "Rate limit reached (stand-in)", "type": "rate_limit_exceeded"}},
+                            {"Retry-After": f"{retry_after:.2f}"})
+            return False
+        faults.delay()
+        if faults.should_fail():
+            self.server.count("errors")
+            self._send_json(500, {"error": {"message": "Injected failure (stand-in)", "type": "server_error"}})
+            return False
+        return True
+
+
+def _completion_text(prompt: str) -> str:
+    # The combined analysis asks for JSON matching AspectAnalyses
+    if '"economic_analysis"' in prompt and '"social_analysis"' in prompt:
+        return json.dumps({
+            "economic_analysis": "Stand-in economic analysis.",
+            "political_analysis": "Stand-in political analysis.",
+            "social_analysis": "Stand-in social analysis.",
+        })
+    return "Stand-in response. " * 40
+
+
+class _ChatCompletionHandler(_StandInHandler):
+    """POST .../chat/completions in the OpenAI format (as used by Groq)."""
+
+    def do_POST(self):
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": f"unknown path {self.path}"}})
+            return
+        length = int(self.headers.get("Content-Length") or 0)
+        request = json.loads(self.rfile.read(length) or b"{}")
+        if not self._apply_faults():
+            return
+        prompt = "\n".join(str(message.get("content", "")) for message in request.get("messages", []))
+        text = _completion_text(prompt)
+        prompt_tokens, completion_tokens = count_tokens(prompt), count_tokens(text)
+        self.server.count("ok")
+        self._send_json(200, {
+            "id": f"chatcmpl-{uuid.uuid4().hex}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model", "stand-in"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": text},
+                "finish_reason": "stop",
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        })
+
+
+class _WebSearchHandler(_StandInHandler):
+    """GET ?q=... in the Brave web search format."""
+
+    def do_GET(self):
+        if not self._apply_faults():
+            return
+        query = parse_qs(urlparse(self.path).query).get("q", [""])[0]
+        self.server.count("ok")
+        self._send_json(200, {"web": {"results": [
+            {
+                "title": f"Stand-in result {i + 1}",
+                "url": f"https://example.org/result/{i + 1}",
+                "description": f"Stand-in search result {i + 1} for {query}.",
+                "extra_snippets": [],
+            }
+            for i in range(5)
+        ]}})
+
+
+class StandInService:
+    """One stand-in HTTP server running on a background thread."""
+
+    def __init__(self, handler, faults: Optional[FaultProfile] = None, host: str = "127.0.0.1", port: int = 0):
+        self._server = _StandInServer((host, port), handler, faults or FaultProfile())
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "StandInService":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def stats(self) -> Dict[str, int]:
+        with self._server.stats_lock:
+            return dict(self._server.stats)
+
+
+def start_chat_completion_server(faults: Optional[FaultProfile] = None, port: int = 0) -> StandInService:
+    """Stand-in for the Groq API; its url is a drop-in for config.GROQ_API_BASE."""
+    return StandInService(_ChatCompletionHandler, faults, port=port).start()
+
+
+def start_web_search_server(faults: Optional[FaultProfile] = None, port: int = 0) -> StandInService:
+    """Stand-in for Brave web search; its url is a drop-in for config.BRAVE_SEARCH_URL."""
+    return StandInService(_WebSearchHandler, faults, port=port).start()
@@ -0,0 +1,16 @@
+"""
+Summary statistics shared by the metrics snapshots and reports.
+"""
+
+import math
+from typing import Iterable
+
+
+def percentile(values: Iterable[float], p: float) -> float:
+    """Nearest-rank percentile (p in [0, 1]) of values, or 0.0 if there are none."""
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    # Rounding keeps float error (0.7 * 10 = 7.000000000000001) from moving up a rank
+    rank = math.ceil(round(p * len(ordered), 9))
+    return ordered[min(len(ordered), max(rank, 1)) - 1]
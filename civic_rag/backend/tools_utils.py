@@ -4,17 +4,24 @@ Tool utilities for RAG search and web search functionality.
 
 from langchain_core.tools import tool
 from langchain_community.tools import BraveSearch
-from .utils import load_vector_store
+from langchain_community.utilities.brave_search import BraveSearchWrapper
+import civic_rag.config as config
+from .utils import search_vector_store, expand_to_parent_sections
+from .snapshots import get_active_vector_store_dir
 
 
 @tool 
-def rag_search(query: str) -> str:
-    """Searches the RAG vector store for relevant information about protest guidance."""
+def rag_search(query: str, aspect: str = "") -> str:
+    """Searches the RAG vector store for relevant information about protest guidance.
+    
+    aspect (economic, political, social, safety, legal) routes the search to
+    the matching topic partitions.
+    """
     try:
-        vectordb = load_vector_store()
-        retriever = vectordb.as_retriever(search_kwargs={"k": 5})
-        docs = retriever.invoke(query)
-        return "\n".join([doc.page_content for doc in docs])
+        # Resolve once so chunks and parents come from the same snapshot
+        persist_directory = get_active_vector_store_dir()
+        docs = search_vector_store(query, aspect or None, config.RAG_CHILD_K, persist_directory)
+        return expand_to_parent_sections(docs, persist_directory)
     except Exception as e:
         return f"RAG search failed: {e}"
 
@@ -22,8 +29,13 @@ def rag_search(query: str) -> str:
 @tool
 def web_search(query: str) -> str:
     """Searches the web for up-to-date information about Nepal protests using BraveSearch."""
+    if not config.BRAVE_SEARCH_API_KEY:
+        return "Web search not configured: set BRAVE_SEARCH_API_KEY to enable it."
     try:
-        searcher = BraveSearch.from_api_key(api_key='BSAZanmMIarkoXHk2K2C2ynx4YDs0UW')
+        searcher = BraveSearch(search_wrapper=BraveSearchWrapper(
+            api_key=config.BRAVE_SEARCH_API_KEY,
+            base_url=config.BRAVE_SEARCH_URL
+        ))
         results = searcher.run(query)
         if isinstance(results, list):
             return "\n".join(results[:5])
@@ -6,38 +6,190 @@ from langchain_chroma import Chroma
 from langchain_huggingface import HuggingFaceEmbeddings
 import civic_rag.config as config
 import os
-import shutil
-from typing import List, Any
+import time
+from functools import lru_cache
+from typing import Dict, Iterable, List, Any, Optional, Tuple
+from civic_rag.backend.docstore import (
+    PARENT_ID_KEY,
+    PARENT_CONTENT_KEY,
+    save_parents,
+    get_parents,
+    count_parents,
+    delete_parents_for_source,
+    file_fingerprint,
+    get_file_record,
+    save_file_record,
+    delete_file_record,
+    load_chunk_signatures,
+    save_chunk_signatures,
+    save_chunk_sources,
+    get_chunk_sources,
+    release_chunks_for_source,
+    release_chunks_for_sources,
+    count_chunk_sources,
+)
+from civic_rag.backend.dedup import CHUNK_ID_KEY, CHUNK_SOURCES_KEY, deduplicate_chunks
+from civic_rag.backend.tokens import count_tokens, truncate_to_tokens
+from civic_rag.backend.partitions import DEFAULT_COLLECTION, collection_for, route_query
+from civic_rag.backend.snapshots import (
+    get_active_vector_store_dir,
+    get_active_version,
+    create_snapshot_dir,
+    discard_snapshot,
+    validate_snapshot,
+    promote_snapshot,
+)
 
 
-def build_vector_store(docs: List[Any], persist_directory: str = config.CHROMA_DIR):
-    """Build and persist a vector store from documents."""
-    embeddings = HuggingFaceEmbeddings(model_name=config.EMBEDDING_MODEL)
-    vectordb = Chroma.from_documents(docs, embeddings, persist_directory=persist_directory)
+@lru_cache(maxsize=1)
+def get_embeddings():
+    """Shared embedding model, loaded once per process.
+
+    With EMBEDDING_SERVICE_URL set, a client for the shared embedding service
+    is returned instead and the model is not loaded in this process.
+    """
+    if config.EMBEDDING_SERVICE_URL:
+        from civic_rag.backend.embedding_service import RemoteEmbeddings
+        return RemoteEmbeddings(config.EMBEDDING_SERVICE_URL)
+    return HuggingFaceEmbeddings(model_name=config.EMBEDDING_MODEL)
+
+
+def _store_parent_sections(docs: List[Any], persist_directory: str):
+    """Move parent text out of chunk metadata and into the docstore."""
+    parents = {}
+    for doc in docs:
+        content = doc.metadata.pop(PARENT_CONTENT_KEY, None)
+        if content is not None and PARENT_ID_KEY in doc.metadata:
+            source = doc.metadata.get('source_file') or doc.metadata.get('source')
+            parents[doc.metadata[PARENT_ID_KEY]] = (content, source)
+    if parents:
+        save_parents(parents, persist_directory)
+
+
+def _record_source_files(docs: List[Any], persist_directory: str):
+    """Add manifest entries for the source files of freshly indexed chunks."""
+    chunk_counts = {}
+    paths = {}
+    for doc in docs:
+        source_file = doc.metadata.get('source_file')
+        if not source_file:
+            continue
+        chunk_counts[source_file] = chunk_counts.get(source_file, 0) + 1
+        source = doc.metadata.get('source', '')
+        paths[source_file] = source if os.path.isfile(source) else os.path.join(config.DATA_DIR, source_file)
+    for source_file, chunk_count in chunk_counts.items():
+        if os.path.isfile(paths[source_file]):
+            size, mtime, sha1 = file_fingerprint(paths[source_file])
+            save_file_record(source_file, size, mtime, sha1, chunk_count, persist_directory)
+
+
+def _deduplicate(docs: List[Any], persist_directory: str,
+                 exclude_sources: Iterable[str] = ()) -> Optional[Dict[str, Any]]:
+    """Near-duplicate detection against the batch and the chunks already indexed.
+
+    Chunks of exclude_sources (files being re-indexed) are not matched against.
+    """
+    if not config.DEDUP_ENABLED:
+        return None
+    return deduplicate_chunks(docs, load_chunk_signatures(persist_directory, exclude_sources))
+
+
+def _finish_deduplication(dedup: Optional[Dict[str, Any]], embedding_seconds: float,
+                          persist_directory: str, report: Optional[Dict[str, Any]]):
+    """Persist signatures and provenance once the kept chunks are embedded, and report the savings."""
+    if dedup is None:
+        return
+    save_chunk_signatures(dedup["signatures"], persist_directory)
+    save_chunk_sources(dedup["sources"], persist_directory)
+    stats = dict(dedup["report"])
+    stats["embedding_seconds"] = embedding_seconds
+    # Estimated from the measured per-chunk embedding cost of the kept chunks
+    stats["embedding_seconds_saved"] = embedding_seconds / stats["kept"] * stats["duplicates"] if stats["kept"] else 0.0
+    if stats["duplicates"]:
+        print(f"🧹 Collapsed {stats['duplicates']} near-duplicate chunks of {stats['chunks']} "
+              f"({stats['shrink_ratio']:.0%} smaller, ~{stats['embedding_seconds_saved']:.1f}s of embedding saved)")
+    if report is not None:
+        report["dedup"] = stats
+
+
+def _chunk_ids(docs: List[Any]) -> Optional[List[str]]:
+    ids = [doc.metadata.get(CHUNK_ID_KEY) for doc in docs]
+    return ids if all(ids) else None
+
+
+def _group_by_collection(docs: List[Any]) -> Dict[str, List[Any]]:
+    """Split chunks by target collection (a single one unless partitioned)."""
+    groups = {}
+    for doc in docs:
+        groups.setdefault(collection_for(doc.metadata), []).append(doc)
+    return groups
+
+
+def list_collections(persist_directory: Optional[str] = None) -> List[str]:
+    """Names of the Chroma collections in a vector store."""
+    persist_directory = persist_directory or get_active_vector_store_dir()
+    client = load_vector_store(persist_directory)._client
+    # chromadb < 0.6 returns Collection objects, newer versions return names
+    return [c if isinstance(c, str) else c.name for c in client.list_collections()]
+
+
+def build_vector_store(docs: List[Any], persist_directory: Optional[str] = None,
+                       report: Optional[Dict[str, Any]] = None):
+    """Build and persist a vector store from documents.
+
+    Near-duplicate chunks are collapsed before embedding; with a report dict,
+    the deduplication statistics are stored under report["dedup"].
+    """
+    persist_directory = persist_directory or get_active_vector_store_dir()
+    _store_parent_sections(docs, persist_directory)
+    _record_source_files(docs, persist_directory)
+    dedup = _deduplicate(docs, persist_directory)
+    embeddings = get_embeddings()
+    vectordb = None
+    started = time.perf_counter()
+    for collection_name, group in _group_by_collection(dedup["kept"] if dedup else docs).items():
+        vectordb = Chroma.from_documents(
+            group, embeddings, ids=_chunk_ids(group),
+            persist_directory=persist_directory, collection_name=collection_name
+        )
+    _finish_deduplication(dedup, time.perf_counter() - started, persist_directory, report)
     # Note: persist() is no longer needed in newer versions of Chroma
     # The vector store is automatically persisted to the directory
     print(f"✅ Vector store created with {len(docs)} documents")
     return vectordb
 
 
-def add_documents_to_vector_store(docs: List[Any], persist_directory: str = config.CHROMA_DIR):
-    """Add new documents to existing vector store."""
+def _add_documents(docs: List[Any], persist_directory: str, report: Optional[Dict[str, Any]] = None,
+                   exclude_sources: Iterable[str] = ()) -> Tuple[Any, Optional[Dict[str, Any]]]:
+    """Embed chunks into their partitions' collections; returns (vector store, dedup result)."""
+    _store_parent_sections(docs, persist_directory)
+    dedup = _deduplicate(docs, persist_directory, exclude_sources)
+
+    # Add new documents, each to its partition's collection
+    vectordb = None
+    started = time.perf_counter()
+    for collection_name, group in _group_by_collection(dedup["kept"] if dedup else docs).items():
+        vectordb = load_vector_store(persist_directory, collection_name)
+        vectordb.add_documents(group, ids=_chunk_ids(group))
+    _finish_deduplication(dedup, time.perf_counter() - started, persist_directory, report)
+    _record_source_files(docs, persist_directory)
+    # Note: persist() is no longer needed in newer versions of Chroma
+    return vectordb, dedup
+
+
+def add_documents_to_vector_store(docs: List[Any], persist_directory: Optional[str] = None,
+                                  report: Optional[Dict[str, Any]] = None):
+    """Add new documents to existing vector store, skipping near-duplicates of indexed chunks."""
+    persist_directory = persist_directory or get_active_vector_store_dir()
     try:
-        # Load existing vector store
-        embeddings = HuggingFaceEmbeddings(model_name=config.EMBEDDING_MODEL)
-        vectordb = Chroma(persist_directory=persist_directory, embedding_function=embeddings)
-        
-        # Add new documents
-        vectordb.add_documents(docs)
-        # Note: persist() is no longer needed in newer versions of Chroma
-        
+        vectordb, _ = _add_documents(docs, persist_directory, report)
         print(f"✅ Added {len(docs)} documents to vector store")
         return vectordb
     except Exception as e:
         print(f"❌ Error adding documents: {e}")
         # If vector store doesn't exist, create a new one
         print("🔄 Creating new vector store...")
-        return build_vector_store(docs, persist_directory)
+        return build_vector_store(docs, persist_directory, report)
 
 
 def update_vector_store_from_directory(directory: str = config.DATA_DIR):
@@ -56,49 +208,315 @@ def update_vector_store_from_directory(directory: str = config.DATA_DIR):
         return None
 
 
+def remove_source_from_vector_store(source_file: str, persist_directory: Optional[str] = None):
+    """Delete all chunks, parent sections and the manifest entry of a source file.
+
+    Chunks that other files contain too (collapsed near-duplicates) are not
+    deleted: they are handed over to one of those files, keeping their embedding.
+    """
+    persist_directory = persist_directory or get_active_vector_store_dir()
+    handovers = release_chunks_for_source(source_file, persist_directory)
+    for collection_name in list_collections(persist_directory):
+        collection = load_vector_store(persist_directory, collection_name)._collection
+        if handovers:
+            present = collection.get(ids=list(handovers), include=[])["ids"]
+            if present:
+                collection.update(ids=present, metadatas=[handovers[chunk_id] for chunk_id in present])
+        collection.delete(where={"source_file": source_file})
+    delete_parents_for_source(source_file, persist_directory)
+    delete_file_record(source_file, persist_directory)
+
+
+def _source_chunk_ids(source_files: List[str], persist_directory: str) -> Dict[str, List[str]]:
+    """Ids of the embedded chunks of some source files, per collection."""
+    ids = {}
+    for collection_name in list_collections(persist_directory):
+        collection = load_vector_store(persist_directory, collection_name)._collection
+        ids[collection_name] = collection.get(where={"source_file": {"$in": source_files}}, include=[])["ids"]
+    return ids
+
+
+def replace_documents_in_vector_store(docs: List[Any], persist_directory: Optional[str] = None,
+                                      report: Optional[Dict[str, Any]] = None):
+    """Index new versions of source files, then drop what only their old versions had.
+
+    The new chunks are added before anything is removed, so queries keep
+    finding the files while they are re-indexed, and a failed add raises with
+    the old versions still in place. Unchanged chunks keep their ids and are
+    overwritten in place.
+    """
+    persist_directory = persist_directory or get_active_vector_store_dir()
+    source_files = sorted({doc.metadata['source_file'] for doc in docs})
+    # Also covers chunks indexed before the manifest existed
+    old_ids = _source_chunk_ids(source_files, persist_directory)
+    _, dedup = _add_documents(docs, persist_directory, report, exclude_sources=source_files)
+
+    kept_ids = {}
+    for collection_name, group in _group_by_collection(dedup["kept"] if dedup else []).items():
+        kept_ids[collection_name] = {doc.metadata[CHUNK_ID_KEY] for doc in group}
+    handovers = release_chunks_for_sources(source_files, persist_directory, keep=dedup["sources"] if dedup else [])
+    for collection_name, ids in old_ids.items():
+        stale = [chunk_id for chunk_id in ids if chunk_id not in kept_ids.get(collection_name, ())]
+        collection = load_vector_store(persist_directory, collection_name)._collection
+        handed_over = [chunk_id for chunk_id in stale if chunk_id in handovers]
+        if handed_over:
+            collection.update(ids=handed_over, metadatas=[handovers[chunk_id] for chunk_id in handed_over])
+        deleted = [chunk_id for chunk_id in stale if chunk_id not in handovers]
+        if deleted:
+            collection.delete(ids=deleted)
+    for source_file in source_files:
+        delete_parents_for_source(source_file, persist_directory, keep=[
+            doc.metadata[PARENT_ID_KEY] for doc in docs
+            if doc.metadata['source_file'] == source_file and PARENT_ID_KEY in doc.metadata
+        ])
+    print(f"✅ Re-indexed {len(source_files)} files ({len(docs)} documents)")
+
+
+def index_pdf_file(pdf_path: str, persist_directory: Optional[str] = None,
+                   force: bool = False) -> Optional[int]:
+    """Incrementally (re)index a single PDF.
+
+    The new version is added before the old one is removed (see
+    replace_documents_in_vector_store). Returns the number of chunks written,
+    or None if the indexed copy is already up to date. Raises if the file
+    cannot be ingested.
+    """
+    from civic_rag.backend.ingestion import load_and_split_pdf
+
+    persist_directory = persist_directory or get_active_vector_store_dir()
+    source_file = os.path.basename(pdf_path)
+    size, mtime, sha1 = file_fingerprint(pdf_path)
+    record = get_file_record(source_file, persist_directory)
+    if record and record['sha1'] == sha1 and not force:
+        return None
+
+    docs = load_and_split_pdf(pdf_path)
+    replace_documents_in_vector_store(docs, persist_directory)
+    save_file_record(source_file, size, mtime, sha1, len(docs), persist_directory)
+    return len(docs)
+
+
+def rebuild_vector_store_snapshot(docs: List[Any], report: Optional[Dict[str, Any]] = None):
+    """Build a new snapshot from documents, validate it and make it active.
+
+    The live vector store keeps serving queries during the build and is left
+    untouched if the build or validation fails.
+    """
+    snapshot_dir = create_snapshot_dir()
+    try:
+        build_vector_store(docs, snapshot_dir, report)
+        problems = validate_snapshot(snapshot_dir)
+    except Exception as e:
+        problems = [str(e)]
+
+    if problems:
+        print("❌ New snapshot failed validation, live vector store unchanged:")
+        for problem in problems:
+            print(f"   - {problem}")
+        discard_snapshot(snapshot_dir)
+        return None
+
+    version = promote_snapshot(snapshot_dir)
+    print(f"🔀 Promoted vector store snapshot: {version}")
+    return load_vector_store(snapshot_dir)
+
+
 def clear_and_rebuild_vector_store(directory: str = config.DATA_DIR):
-    """Clear existing vector store and rebuild from scratch."""
+    """Rebuild the vector store from scratch into a new snapshot."""
     from civic_rag.backend.ingestion import ingest_all_pdfs_in_directory
     
-    # Remove existing vector store
-    if os.path.exists(config.CHROMA_DIR):
-        shutil.rmtree(config.CHROMA_DIR)
-        print("🗑️ Cleared existing vector store")
-    
-    # Rebuild from directory
     print(f"🔄 Rebuilding vector store from: {directory}")
     docs = ingest_all_pdfs_in_directory(directory)
     
     if docs:
-        vectordb = build_vector_store(docs)
-        print(f"✅ Rebuilt vector store with {len(docs)} document chunks")
+        vectordb = rebuild_vector_store_snapshot(docs)
+        if vectordb:
+            print(f"✅ Rebuilt vector store with {len(docs)} document chunks")
         return vectordb
     else:
         print("⚠️ No PDFs found to rebuild vector store")
         return None
 
 
-def load_vector_store(persist_directory: str = config.CHROMA_DIR):
-    """Load an existing vector store."""
-    embeddings = HuggingFaceEmbeddings(model_name=config.EMBEDDING_MODEL)
-    vectordb = Chroma(persist_directory=persist_directory, embedding_function=embeddings)
+def load_vector_store(persist_directory: Optional[str] = None, collection_name: str = DEFAULT_COLLECTION):
+    """Load an existing vector store (the active snapshot by default)."""
+    persist_directory = persist_directory or get_active_vector_store_dir()
+    embeddings = get_embeddings()
+    vectordb = Chroma(
+        persist_directory=persist_directory,
+        embedding_function=embeddings,
+        collection_name=collection_name
+    )
     return vectordb
 
 
+def count_chunks(persist_directory: Optional[str] = None) -> Dict[str, int]:
+    """Chunk count per collection."""
+    persist_directory = persist_directory or get_active_vector_store_dir()
+    return {
+        name: load_vector_store(persist_directory, name)._collection.count()
+        for name in list_collections(persist_directory)
+    }
+
+
+def search_vector_store(query: str, aspect: Optional[str] = None, k: int = config.RAG_CHILD_K,
+                        persist_directory: Optional[str] = None) -> List[Any]:
+    """Similarity search routed by partition metadata.
+
+    The aspect (economic, political, ...) and any jurisdiction named in the
+    query become a metadata filter pushed down to Chroma, and select the
+    partition collections to search when collections are partitioned. If the
+    filtered search finds fewer than k chunks, the rest is filled from an
+    unfiltered search so sparse partitions never starve a query.
+    """
+    persist_directory = persist_directory or get_active_vector_store_dir()
+    route = route_query(query, aspect)
+    collections = list_collections(persist_directory) or [DEFAULT_COLLECTION]
+    routed = collections
+    if route["partitions"]:
+        wanted = {collection_for({config.PARTITION_COLLECTIONS_BY: value}) for value in route["partitions"]}
+        routed = [name for name in collections if name in wanted] or collections
+
+    # Embed once, however many collections are searched
+    query_embedding = get_embeddings().embed_query(query)
+
+    def _search(names: List[str], where: Optional[Dict[str, Any]]) -> List[Tuple[Any, float]]:
+        scored = []
+        for name in names:
+            vectordb = load_vector_store(persist_directory, name)
+            scored.extend(vectordb.similarity_search_by_vector_with_relevance_scores(
+                query_embedding, k=k, filter=where
+            ))
+        # Lower distance is better
+        return sorted(scored, key=lambda pair: pair[1])[:k]
+
+    results = _search(routed, route["where"])
+    if len(results) < k and (route["where"] or routed != collections):
+        seen = {doc.page_content for doc, _ in results}
+        for doc, score in _search(collections, None):
+            if len(results) >= k:
+                break
+            if doc.page_content not in seen:
+                seen.add(doc.page_content)
+                results.append((doc, score))
+    return [doc for doc, _ in results]
+
+
+def attach_chunk_sources(docs: List[Any], persist_directory: Optional[str] = None):
+    """Tag retrieved chunks that stand for collapsed near-duplicates with all their sources.
+
+    Sets CHUNK_SOURCES_KEY to [{"source_file", "page"}, ...] on chunks recorded
+    with more than one source, so answers can cite every file containing the text.
+    """
+    persist_directory = persist_directory or get_active_vector_store_dir()
+    sources = get_chunk_sources(
+        [doc.metadata[CHUNK_ID_KEY] for doc in docs if doc.metadata.get(CHUNK_ID_KEY)],
+        persist_directory
+    )
+    for doc in docs:
+        copies = []
+        for metadata in sources.get(doc.metadata.get(CHUNK_ID_KEY), []):
+            copy = {"source_file": metadata.get('source_file'), "page": metadata.get('page')}
+            if copy not in copies:
+                copies.append(copy)
+        if len(copies) > 1:
+            doc.metadata[CHUNK_SOURCES_KEY] = copies
+
+
+def _format_sources(doc: Any) -> str:
+    """Citation line for a section whose text several source files contain."""
+    copies = doc.metadata.get(CHUNK_SOURCES_KEY)
+    if not copies:
+        return ""
+    cited = [copy["source_file"] if copy["page"] is None else f"{copy['source_file']} (page {copy['page']})"
+             for copy in copies]
+    return f"\n[Sources: {'; '.join(cited)}]"
+
+
+def select_context_sections(docs: List[Any], persist_directory: Optional[str] = None,
+                            max_tokens: int = config.RAG_CONTEXT_MAX_TOKENS,
+                            expand_parents: bool = True) -> List[Tuple[str, Any]]:
+    """The (text, first matching chunk) sections that make up a RAG context.
+
+    With expand_parents, matched child chunks are replaced by their parent
+    sections; parents shared by several children are used once, in rank
+    order. Chunks indexed without a parent are used as-is. Sections are kept
+    as long as they fit in max_tokens. Chunks standing for collapsed
+    near-duplicates carry all their sources (see attach_chunk_sources).
+    """
+    persist_directory = persist_directory or get_active_vector_store_dir()
+    attach_chunk_sources(docs, persist_directory)
+    parents = {}
+    if expand_parents:
+        parents = get_parents(
+            [doc.metadata[PARENT_ID_KEY] for doc in docs if doc.metadata.get(PARENT_ID_KEY)],
+            persist_directory
+        )
+    sections = []
+    seen = set()
+    used_tokens = 0
+    for doc in docs:
+        parent_id = doc.metadata.get(PARENT_ID_KEY)
+        text = parents.get(parent_id) if parent_id else None
+        key = parent_id if text is not None else doc.page_content
+        if text is None:
+            text = doc.page_content
+        if key in seen:
+            continue
+        seen.add(key)
+
+        tokens = count_tokens(text)
+        if used_tokens + tokens > max_tokens:
+            if not sections:
+                sections.append((truncate_to_tokens(text, max_tokens), doc))
+                used_tokens = max_tokens
+            continue
+        sections.append((text, doc))
+        used_tokens += tokens
+    return sections
+
+
+def expand_to_parent_sections(docs: List[Any], persist_directory: Optional[str] = None,
+                              max_tokens: int = config.RAG_CONTEXT_MAX_TOKENS) -> str:
+    """Replace matched child chunks with their parent sections, within max_tokens.
+
+    Sections whose text several source files contain end with a [Sources: ...] line.
+    """
+    return "\n\n".join(text + _format_sources(doc)
+                       for text, doc in select_context_sections(docs, persist_directory, max_tokens))
+
+
 def get_vector_store_info():
     """Get information about the current vector store."""
     try:
-        vectordb = load_vector_store()
-        collection = vectordb._collection
-        count = collection.count()
+        location = get_active_vector_store_dir()
+        version = get_active_version()
+        collection_counts = count_chunks(location)
+        count = sum(collection_counts.values())
+        parent_count = count_parents(location)
+        chunk_copies = count_chunk_sources(location)
         
         print("📊 Vector Store Information")
         print("=" * 30)
-        print(f"📍 Location: {config.CHROMA_DIR}")
+        print(f"📍 Location: {location}")
+        print(f"🏷️ Snapshot: {version or 'none (legacy directory)'}")
         print(f"📄 Total documents: {count}")
+        if len(collection_counts) > 1:
+            for name, collection_count in sorted(collection_counts.items()):
+                print(f"   - {name}: {collection_count}")
+        print(f"🧩 Parent sections: {parent_count}")
+        if chunk_copies > count:
+            print(f"🧹 Near-duplicate copies collapsed: {chunk_copies - count}")
         print(f"🔍 Embedding model: {config.EMBEDDING_MODEL}")
         
-        return {"count": count, "location": config.CHROMA_DIR}
+        return {
+            "count": count,
+            "parent_count": parent_count,
+            "duplicates_collapsed": max(chunk_copies - count, 0),
+            "collections": collection_counts,
+            "location": location,
+            "snapshot": version,
+        }
     except Exception as e:
         print(f"❌ Error accessing vector store: {e}")
         return None
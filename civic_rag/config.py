@@ -8,13 +8,207 @@ load_dotenv(os.path.join(BASE_DIR, '.env'))
 # API Keys
 GROQ_API_KEY = os.getenv('GROQ_API_KEY')
 HUGGINGFACEHUB_API_TOKEN = os.getenv('HUGGINGFACEHUB_API_TOKEN')
+BRAVE_SEARCH_API_KEY = os.getenv('BRAVE_SEARCH_API_KEY')
+
+# Service endpoints. None/defaults use the real providers; the load-testing
+# harness (load_test.py) points them at local stand-in servers.
+GROQ_API_BASE = os.getenv('GROQ_API_BASE')
+BRAVE_SEARCH_URL = os.getenv('BRAVE_SEARCH_URL', 'https://api.search.brave.com/res/v1/web/search')
 
 # RAG/Embedding Config
 CHUNK_SIZE = 500
 CHUNK_OVERLAP = 50
 EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
 
+# Shared embedding service (embedding_service.py). When EMBEDDING_SERVICE_URL
+# is set (http://127.0.0.1:8765 or unix:///path/to/socket), get_embeddings()
+# calls the service instead of loading the model in every process. The service
+# waits up to EMBEDDING_BATCH_WINDOW_MS for concurrent requests to batch.
+EMBEDDING_SERVICE_URL = os.getenv('EMBEDDING_SERVICE_URL')
+EMBEDDING_SERVICE_DEFAULT_URL = 'http://127.0.0.1:8765'
+EMBEDDING_BATCH_WINDOW_MS = 10
+EMBEDDING_MAX_BATCH_SIZE = 64
+EMBEDDING_SERVICE_TIMEOUT_SECONDS = 60.0
+EMBEDDING_CLIENT_MAX_TEXTS_PER_REQUEST = 256
+
+# Parent-child retrieval: CHUNK_SIZE child chunks are embedded and matched,
+# the parent sections they were cut from are returned as context
+PARENT_CHUNK_SIZE = 1200
+PARENT_CHUNK_OVERLAP = 0
+RAG_CHILD_K = 10
+RAG_CONTEXT_MAX_TOKENS = 800
+
+# Near-duplicate chunk detection between splitting and embedding: MinHash
+# over word shingles with LSH banding. Chunks whose estimated Jaccard
+# similarity to an earlier chunk reaches DEDUP_THRESHOLD are not embedded; the
+# earlier (canonical) chunk records them as additional sources.
+DEDUP_ENABLED = True
+DEDUP_THRESHOLD = 0.85
+DEDUP_SHINGLE_SIZE = 5
+DEDUP_NUM_PERM = 128
+DEDUP_LSH_BANDS = 16
+
+# Partition metadata (jurisdiction, topic, doc_type) and filtered search.
+# Per-file overrides go in DATA_DIR/PARTITION_METADATA_FILE. Set
+# PARTITION_COLLECTIONS_BY to "jurisdiction", "topic" or "doc_type" to store
+# each partition in its own Chroma collection (takes effect on rebuild).
+PARTITION_METADATA_FILE = 'metadata.json'
+PARTITION_COLLECTIONS_BY = None
+RAG_ROUTE_BY_TOPIC = True
+# Off by default: the corpus is largely comparative (protests elsewhere in
+# South Asia used as guidance for Nepal), so filtering on the country named
+# in a question would discard most of it
+RAG_ROUTE_BY_JURISDICTION = False
+
+# Terms the RAG search nodes put in front of the question for each aspect
+RAG_ASPECT_QUERY_PREFIXES = {
+    "economic": "economic impact business disruption financial",
+    "political": "political parties government policy legal rights",
+    "social": "social safety community cultural impact",
+}
+
+# LLM used by the analysis nodes
+LLM_MODEL = 'meta-llama/llama-4-maverick-17b-128e-instruct'
+LLM_TEMPERATURE = 0.7
+
+# LLM response cache. Policies: "deterministic" caches only temperature-0
+# calls, "always" caches every call (replays, benchmarks), "never" disables it.
+# LLM_CACHE_NODE_POLICIES overrides the policy per node, e.g.
+# {"final_synthesis": "never"}.
+# With the defaults (every node at LLM_TEMPERATURE = 0.7, policy
+# "deterministic") nothing is cached: set LLM_TEMPERATURE to 0, or choose
+# "always" globally or per node, to turn the cache on.
+LLM_CACHE_POLICY = os.getenv('LLM_CACHE_POLICY', 'deterministic')
+LLM_CACHE_NODE_POLICIES = {}
+LLM_CACHE_MAX_ENTRIES = 5000
+LLM_CACHE_TTL_SECONDS = 7 * 24 * 3600
+
+# Shared scheduler for outbound LLM calls. The limits apply to the whole
+# process and should match the provider account's requests/tokens per minute.
+# Lower priority numbers are admitted first; interactive traffic always goes
+# ahead of batch traffic, then nodes are ordered by LLM_NODE_PRIORITIES.
+LLM_REQUESTS_PER_MINUTE = int(os.getenv('LLM_REQUESTS_PER_MINUTE', '30'))
+LLM_TOKENS_PER_MINUTE = int(os.getenv('LLM_TOKENS_PER_MINUTE', '15000'))
+# Output allowance added to the prompt's token count when reserving capacity
+LLM_EXPECTED_OUTPUT_TOKENS = 800
+LLM_MAX_RETRIES = 4
+LLM_RETRY_BASE_SECONDS = 1.0
+LLM_RETRY_MAX_SECONDS = 30.0
+LLM_TRAFFIC_PRIORITIES = {"interactive": 0, "batch": 1}
+LLM_NODE_PRIORITIES = {
+    "final_synthesis": 0,
+    "safety_analysis": 1,
+    "legal_analysis": 1,
+    "combined_analysis": 2,
+    "economic_analysis": 2,
+    "political_analysis": 2,
+    "social_analysis": 2,
+    "memory_summary": 3,
+}
+
+# Prompt input caps in tokens, per node and input (inputs not listed are not
+# capped). Longer inputs are cut after the last whole search result or
+# paragraph that fits. Web and RAG data of each aspect are capped at
+# PROMPT_MERGED_ASPECT_MAX_TOKENS before being merged for safety/legal.
+PROMPT_INPUT_MAX_TOKENS = {
+    "economic_analysis": {"economic_web_data": 1000, "economic_rag_data": 1000},
+    "political_analysis": {"political_web_data": 1000, "political_rag_data": 1000},
+    "social_analysis": {"social_web_data": 1000, "social_rag_data": 1000},
+    "combined_analysis": {
+        "economic_web_data": 600, "economic_rag_data": 600,
+        "political_web_data": 600, "political_rag_data": 600,
+        "social_web_data": 600, "social_rag_data": 600,
+    },
+    "safety_analysis": {"web_results": 2000, "rag_results": 2000},
+    "legal_analysis": {"web_results": 2000, "rag_results": 2000},
+    "final_synthesis": {
+        "conversation_context": 600,
+        "economic_analysis": 700, "political_analysis": 700, "social_analysis": 700,
+        "safety_analysis": 700, "legal_analysis": 700,
+    },
+    "memory_summary": {"summary": 400, "turns": 2000},
+}
+PROMPT_MERGED_ASPECT_MAX_TOKENS = 600
+PROMPT_STATS_EXPORT_INTERVAL_SECONDS = 30.0
+
+# Analysis mode: "parallel" runs one LLM call per aspect (economic, political,
+# social); "combined" asks for all three in one structured call and falls back
+# to the per-aspect calls if the response cannot be parsed
+ANALYSIS_MODE = "parallel"
+
+# End-to-end latency budget of answer_query in seconds (None disables it).
+# Each stage of the graph may run until its share of the budget is used up;
+# time a stage does not use carries over to the later ones. Nodes that overrun
+# are abandoned and final_synthesis answers from whatever completed.
+LATENCY_BUDGET_SECONDS = 30.0
+LATENCY_BUDGET_SHARES = {
+    "search": 0.2,
+    "analysis": 0.3,
+    "safety_analysis": 0.1,
+    "legal_analysis": 0.1,
+    "final_synthesis": 0.3,
+}
+# With less time left than this, final_synthesis skips the LLM and assembles
+# the completed analyses directly
+LATENCY_FINAL_SYNTHESIS_MIN_SECONDS = 2.0
+# Worker threads shared by all deadline-bounded node and LLM calls. Calls that
+# overrun keep a worker until they return, so leave headroom over the peak
+# number of concurrent graph runs times their nodes.
+LATENCY_BUDGET_MAX_WORKERS = 64
+
 # Data/Vector Store Paths
 DATA_DIR = os.path.join(BASE_DIR, 'data')
 CHROMA_DIR = os.path.join(BASE_DIR, 'chroma_db')
 DB_PATH = os.path.join(BASE_DIR, 'queries.db')
+LLM_CACHE_PATH = os.path.join(BASE_DIR, 'llm_cache.db')
+PROMPT_STATS_PATH = os.path.join(BASE_DIR, 'prompt_stats.json')
+MEMORY_DB_PATH = os.path.join(BASE_DIR, 'memory.db')
+
+# Conversation memory: once a session's stored turns exceed the token budget,
+# all but the most recent turns are folded into a rolling summary
+MEMORY_TOKEN_BUDGET = 2000
+MEMORY_RECENT_TURNS = 4
+MEMORY_TURN_MAX_TOKENS = 300
+MEMORY_SUMMARY_MAX_TOKENS = 300
+
+# Versioned vector store snapshots. Rebuilds are written to a new snapshot,
+# validated, then made active by atomically rewriting the state file.
+# CHROMA_DIR is only used when no snapshot has been promoted yet.
+CHROMA_SNAPSHOTS_DIR = os.path.join(BASE_DIR, 'chroma_snapshots')
+CHROMA_SNAPSHOTS_TO_KEEP = 3
+REBUILD_MIN_CHUNKS = 1
+REBUILD_SMOKE_QUERIES = [
+    "right to peaceful protest",
+    "government response to protests",
+]
+
+# Background ingestion daemon (ingest_daemon.py)
+QUARANTINE_DIR = os.path.join(DATA_DIR, 'quarantine')
+INGEST_DEBOUNCE_SECONDS = 2.0
+INGEST_POLL_INTERVAL_SECONDS = 5.0
+INGEST_QUEUE_SIZE = 100
+INGEST_WORKERS = 1
+INGEST_MAX_RETRIES = 3
+INGEST_RETRY_BACKOFF_SECONDS = 2.0
+INGEST_METRICS_PATH = os.path.join(BASE_DIR, 'ingest_metrics.json')
+INGEST_METRICS_INTERVAL_SECONDS = 10.0
+
+# Load-testing harness (load_test.py): questions each simulated user picks
+# from, weighted, unless a question mix file is given
+LOADTEST_QUESTION_MIX = {
+    "Is it safe to travel to Kathmandu during the protests?": 3,
+    "How are the protests affecting small businesses and daily wage workers?": 2,
+    "What are my legal rights if I join a peaceful protest?": 2,
+    "How has the government responded to the protests so far?": 1,
+}
+LOADTEST_REPORT_PATH = os.path.join(BASE_DIR, 'loadtest_report.json')
+
+# Retrieval parameter sweep (retrieval_sweep.py): default grid, and where the
+# per-configuration indexes are kept for reuse between runs
+SWEEP_CHUNK_SIZES = [300, 500, 800]
+SWEEP_CHUNK_OVERLAPS = [0, 50, 100]
+SWEEP_K_VALUES = [3, 5, 10]
+SWEEP_RETRIEVAL_MODES = ["parent", "child"]
+SWEEP_QUERY_STYLES = ["aspect", "plain"]
+SWEEP_WORK_DIR = os.path.join(BASE_DIR, 'sweep_indexes')
+SWEEP_REPORT_PATH = os.path.join(BASE_DIR, 'sweep_report.json')
@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+"""
+Shared embedding service.
+Loads the embedding model once and serves it to every app worker and script
+that runs with EMBEDDING_SERVICE_URL pointing at it, micro-batching
+concurrent requests.
+"""
+
+import argparse
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the embedding model to other processes.")
+    parser.add_argument("--url", help="http://host:port or unix:///path/to/socket "
+                                      "(defaults to EMBEDDING_SERVICE_URL, then config.EMBEDDING_SERVICE_DEFAULT_URL)")
+    args = parser.parse_args()
+
+    import civic_rag.config as config
+    from civic_rag.backend.embedding_service import create_server
+
+    url = args.url or config.EMBEDDING_SERVICE_URL or config.EMBEDDING_SERVICE_DEFAULT_URL
+    print("🧬 Civic RAG Embedding Service")
+    print("=" * 40)
+    print(f"Loading {config.EMBEDDING_MODEL}...")
+    server = create_server(url)
+    print(f"✅ Serving {server.dimension}-dimensional embeddings at {url}")
+    print(f"   Point workers at it with EMBEDDING_SERVICE_URL={url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print(f"\n📊 {server.batcher.metrics()}")
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+#!/usr/bin/env python3
+"""
+Background ingestion service.
+Watches the data directory and indexes new or changed PDFs into the active
+vector store within seconds of them landing. Corrupt files are moved to the
+quarantine folder after repeated failures.
+"""
+
+import argparse
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Watch the data directory and index PDFs incrementally.")
+    parser.add_argument("--directory", help="Directory to watch (defaults to config.DATA_DIR)")
+    parser.add_argument("--poll", action="store_true", help="Use the polling watcher even if watchdog is installed")
+    parser.add_argument("--once", action="store_true", help="Index pending changes once and exit")
+    args = parser.parse_args()
+
+    import civic_rag.config as config
+    from civic_rag.backend.ingest_daemon import IngestionDaemon
+
+    daemon = IngestionDaemon(args.directory or config.DATA_DIR, force_polling=args.poll)
+    print("🛰️ Civic RAG Ingestion Daemon")
+    print("=" * 40)
+    if args.once:
+        daemon.start()
+        daemon.wait_until_idle()
+        daemon.stop()
+        print(f"📊 {daemon.get_metrics()}")
+    else:
+        daemon.run_forever()
+
+
+if __name__ == "__main__":
+    main()
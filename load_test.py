@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Load test: ramps concurrent simulated users through answer_query.
+The LLM and web search APIs are replaced by local stand-in servers with
+configurable latency, errors and rate limits, so capacity can be measured
+without spending provider quota. This is a capacity measurement tool, not a
+test suite.
+
+The scheduler's own limits come from LLM_REQUESTS_PER_MINUTE and
+LLM_TOKENS_PER_MINUTE; set them in the environment to the limits being sized.
+"""
+
+import argparse
+import json
+import threading
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ramp concurrent users through answer_query against stand-in services.")
+    parser.add_argument("--users", default="1,2,4,8", help="Comma-separated concurrency steps (default: 1,2,4,8)")
+    parser.add_argument("--step-seconds", type=float, default=30.0, help="Duration of each concurrency step")
+    parser.add_argument("--think-time", type=float, default=1.0, help="Mean seconds a user waits between questions")
+    parser.add_argument("--questions", help="JSON file with a list of questions or {question: weight}")
+    parser.add_argument("--traffic-class", choices=["interactive", "batch"], default="interactive")
+    parser.add_argument("--analysis-mode", choices=["parallel", "combined"], help="Defaults to config.ANALYSIS_MODE")
+    parser.add_argument("--latency-budget", type=float, help="Seconds per request, 0 for none (default: config.LATENCY_BUDGET_SECONDS)")
+    parser.add_argument("--slo-p95", type=float, help="p95 latency a step must stay under (default: the latency budget)")
+    parser.add_argument("--max-error-rate", type=float, default=0.01, help="Error rate a step must stay under")
+    parser.add_argument("--stop-on-breach", action="store_true", help="Stop ramping at the first step outside the SLO")
+    parser.add_argument("--llm-latency", type=float, default=1.0, help="Stand-in LLM response time in seconds")
+    parser.add_argument("--llm-jitter", type=float, default=0.5, help="Uniform +/- jitter on the LLM response time")
+    parser.add_argument("--llm-error-rate", type=float, default=0.0, help="Fraction of LLM calls answered with HTTP 500")
+    parser.add_argument("--llm-rpm", type=float, help="Stand-in LLM rate limit; calls over it get HTTP 429")
+    parser.add_argument("--search-latency", type=float, default=0.3, help="Stand-in web search response time in seconds")
+    parser.add_argument("--search-error-rate", type=float, default=0.0, help="Fraction of searches answered with HTTP 500")
+    parser.add_argument("--search-rpm", type=float, help="Stand-in web search rate limit")
+    parser.add_argument("--real-services", action="store_true", help="Use the configured LLM and search endpoints instead of stand-ins")
+    parser.add_argument("--serve", action="store_true", help="Only run the stand-in servers (to point a running app.py at them)")
+    parser.add_argument("--verbose", action="store_true", help="Show the pipeline's own output")
+    parser.add_argument("--report", help="Write the JSON report here (default: config.LOADTEST_REPORT_PATH)")
+    args = parser.parse_args()
+
+    import civic_rag.config as config
+    from civic_rag.backend.loadtest import load_question_mix, run_load_test, start_stand_ins
+    from civic_rag.backend.stand_in_services import FaultProfile
+
+    llm_faults = FaultProfile(args.llm_latency, args.llm_jitter, args.llm_error_rate, args.llm_rpm)
+    search_faults = FaultProfile(args.search_latency, 0.0, args.search_error_rate, args.search_rpm)
+
+    print("📈 Civic RAG Load Test")
+    print("=" * 40)
+    if args.serve:
+        services = start_stand_ins(llm_faults, search_faults)
+        print("Stand-in services running; start the app with:")
+        print(f"   GROQ_API_BASE={services['llm'].url} GROQ_API_KEY=stand-in "
+              f"BRAVE_SEARCH_API_KEY=stand-in BRAVE_SEARCH_URL={services['web_search'].url}/res/v1/web/search streamlit run app.py")
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            for service in services.values():
+                service.stop()
+        return
+
+    steps = [int(users) for users in args.users.split(",") if users.strip()]
+    budget = {} if args.latency_budget is None else {"latency_budget": args.latency_budget or None}
+    report = run_load_test(
+        steps,
+        step_seconds=args.step_seconds,
+        think_time_seconds=args.think_time,
+        question_mix=load_question_mix(args.questions),
+        traffic_class=args.traffic_class,
+        analysis_mode=args.analysis_mode,
+        **budget,
+        slo_p95_seconds=args.slo_p95,
+        max_error_rate=args.max_error_rate,
+        stop_on_breach=args.stop_on_breach,
+        use_stand_ins=not args.real_services,
+        llm_faults=llm_faults,
+        search_faults=search_faults,
+        quiet=not args.verbose,
+    )
+    print(f"\n🏁 Highest concurrency within SLO: {report['max_concurrency_within_slo']} users")
+    report_path = args.report or config.LOADTEST_REPORT_PATH
+    with open(report_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"📝 Report written to {report_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,8 +3,6 @@
 Quick fix: Rebuild vector store excluding problematic files
 """
 
-import os
-import shutil
 from pathlib import Path
 
 def quick_rebuild():
@@ -13,14 +11,9 @@ def quick_rebuild():
     
     try:
         import civic_rag.config as config
-        from civic_rag.backend.utils import build_vector_store
+        from civic_rag.backend.utils import rebuild_vector_store_snapshot
         from civic_rag.backend.ingestion import ingest_pdf
         
-        # Remove existing vector store
-        if os.path.exists(config.CHROMA_DIR):
-            shutil.rmtree(config.CHROMA_DIR)
-            print("🗑️ Cleared existing vector store")
-        
         # Get all PDFs and process them individually
         pdf_files = list(Path(config.DATA_DIR).glob("*.pdf"))
         print(f"📂 Found {len(pdf_files)} PDF files")
@@ -51,7 +44,11 @@ def quick_rebuild():
         
         if all_docs:
             print(f"\n🔄 Building vector store with {len(all_docs)} chunks from {len(successful_files)} files...")
-            vectordb = build_vector_store(all_docs)
+            # Built as a new snapshot; the live store keeps serving until it is promoted
+            vectordb = rebuild_vector_store_snapshot(all_docs)
+            if not vectordb:
+                print("❌ Rebuild failed, previous vector store is still active")
+                return
             
             print(f"\n✅ Success! Vector store rebuilt with:")
             for filename in successful_files:
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Retrieval parameter sweep.
+Evaluates a grid of chunk size, overlap, k, retrieval mode and query style
+against a labelled question set, measuring recall@k, MRR, retrieval latency
+and prompt tokens, and reports the Pareto frontier.
+"""
+
+import argparse
+import json
+
+
+def _ints(value: str):
+    return [int(v) for v in value.split(",") if v.strip()]
+
+
+def _names(value: str):
+    return [v.strip() for v in value.split(",") if v.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sweep retrieval parameters against labelled questions.")
+    parser.add_argument("questions", help="JSON/JSONL file of {question, relevant, aspect?} entries")
+    parser.add_argument("--chunk-sizes", type=_ints, help="Comma-separated child chunk sizes (default: config.SWEEP_CHUNK_SIZES)")
+    parser.add_argument("--overlaps", type=_ints, help="Comma-separated chunk overlaps (default: config.SWEEP_CHUNK_OVERLAPS)")
+    parser.add_argument("--k", type=_ints, help="Comma-separated k values (default: config.SWEEP_K_VALUES)")
+    parser.add_argument("--modes", type=_names, help="parent and/or child (default: config.SWEEP_RETRIEVAL_MODES)")
+    parser.add_argument("--query-styles", type=_names, help="aspect and/or plain (default: config.SWEEP_QUERY_STYLES)")
+    parser.add_argument("--data-dir", help="PDF directory (defaults to config.DATA_DIR)")
+    parser.add_argument("--work-dir", help="Where sweep indexes are kept (defaults to config.SWEEP_WORK_DIR)")
+    parser.add_argument("--rebuild", action="store_true", help="Rebuild indexes even if a matching one exists")
+    parser.add_argument("--report", help="Write the JSON report here (default: config.SWEEP_REPORT_PATH)")
+    args = parser.parse_args()
+
+    import civic_rag.config as config
+    from civic_rag.backend.retrieval_sweep import load_labelled_questions, run_sweep
+
+    print("🧪 Civic RAG Retrieval Sweep")
+    print("=" * 40)
+    report = run_sweep(
+        load_labelled_questions(args.questions),
+        chunk_sizes=args.chunk_sizes or config.SWEEP_CHUNK_SIZES,
+        chunk_overlaps=args.overlaps or config.SWEEP_CHUNK_OVERLAPS,
+        k_values=args.k or config.SWEEP_K_VALUES,
+        modes=args.modes or config.SWEEP_RETRIEVAL_MODES,
+        query_styles=args.query_styles or config.SWEEP_QUERY_STYLES,
+        data_dir=args.data_dir or config.DATA_DIR,
+        work_dir=args.work_dir or config.SWEEP_WORK_DIR,
+        rebuild=args.rebuild,
+    )
+    report_path = args.report or config.SWEEP_REPORT_PATH
+    with open(report_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\n★ = Pareto frontier ({len(report['pareto_frontier'])} of {len(report['results'])} configurations)")
+    print(f"📝 Report written to {report_path}")
+
+
+if __name__ == "__main__":
+    main()
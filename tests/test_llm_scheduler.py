@@ -0,0 +1,210 @@
+"""
+LLMScheduler.submit against the local chat-completion stand-in.
+
+The stand-in answers calls over its rate limit with HTTP 429 and a
+Retry-After header, as Groq does, and the calls go through the same groq
+client (with its own retries disabled) that ChatGroq uses.
+"""
+
+import threading
+import time
+import types
+
+import groq
+import pytest
+
+from civic_rag.backend import llm_scheduler
+from civic_rag.backend.llm_scheduler import LLMScheduler, priority_for
+from civic_rag.backend.stand_in_services import FaultProfile, start_chat_completion_server
+
+
+def _drain(faults: FaultProfile):
+    """Use up the stand-in's rate limit, so its next request gets a 429."""
+    while faults.retry_after() is None:
+        pass
+
+
+def _drain_scheduler(scheduler: LLMScheduler):
+    scheduler.requests.consume(scheduler.requests.capacity, time.monotonic())
+
+
+@pytest.fixture
+def stand_in():
+    """Starts a chat-completion stand-in with the given fault profile; returns (service, client)."""
+    services = []
+
+    def start(faults: FaultProfile):
+        service = start_chat_completion_server(faults)
+        services.append(service)
+        client = groq.Groq(api_key="stand-in", base_url=service.url, max_retries=0)
+        return service, client
+
+    yield start
+    for service in services:
+        service.stop()
+
+
+def _chat(client: groq.Groq):
+    return lambda: client.chat.completions.create(
+        model="stand-in", messages=[{"role": "user", "content": "What are my rights at a protest?"}]
+    )
+
+
+@pytest.fixture
+def recorded_sleeps(monkeypatch):
+    """Backoff delays the scheduler asked for, without actually sleeping."""
+    delays = []
+    monkeypatch.setattr(llm_scheduler, "time", types.SimpleNamespace(
+        monotonic=time.monotonic, time=time.time, sleep=delays.append
+    ))
+    return delays
+
+
+def test_retry_after_is_honoured(stand_in):
+    faults = FaultProfile(requests_per_minute=120)
+    service, client = stand_in(faults)
+    _drain(faults)
+    # Backoff alone would retry almost immediately; Retry-After (0.5s here) must win
+    scheduler = LLMScheduler(requests_per_minute=1000, tokens_per_minute=100000, max_retries=3,
+                             retry_base_seconds=0.001, retry_max_seconds=0.002)
+
+    started = time.monotonic()
+    response = scheduler.submit(_chat(client))
+    elapsed = time.monotonic() - started
+
+    assert response.choices[0].message.content
+    assert elapsed >= 0.45
+    assert service.stats()["rate_limited"] == 1
+    metrics = scheduler.metrics()
+    assert metrics["rate_limited"] == 1
+    assert metrics["retries"] == 1
+    assert metrics["completed"] == 1
+
+
+def test_backoff_is_jittered_and_bounded(stand_in, recorded_sleeps, monkeypatch):
+    faults = FaultProfile(requests_per_minute=1)
+    service, client = stand_in(faults)
+    _drain(faults)
+    # Ignore Retry-After (a minute here) to observe the backoff itself
+    monkeypatch.setattr(llm_scheduler, "_retry_after_seconds", lambda error: None)
+    scheduler = LLMScheduler(requests_per_minute=1000, tokens_per_minute=100000, max_retries=5,
+                             retry_base_seconds=1.0, retry_max_seconds=4.0)
+
+    with pytest.raises(groq.RateLimitError):
+        scheduler.submit(_chat(client))
+
+    assert service.stats()["rate_limited"] == 6
+    nominal = [1.0, 2.0, 4.0, 4.0, 4.0]
+    assert len(recorded_sleeps) == len(nominal)
+    for delay, backoff in zip(recorded_sleeps, nominal):
+        assert 0.5 * backoff <= delay <= 1.5 * backoff
+    assert len({delay / backoff for delay, backoff in zip(recorded_sleeps, nominal)}) > 1
+    metrics = scheduler.metrics()
+    assert metrics["retries"] == 5
+    assert metrics["failed"] == 1
+
+
+def test_backoff_waits_at_least_retry_after(stand_in, recorded_sleeps):
+    faults = FaultProfile(requests_per_minute=1)
+    _, client = stand_in(faults)
+    _drain(faults)
+    scheduler = LLMScheduler(requests_per_minute=1000, tokens_per_minute=100000, max_retries=2,
+                             retry_base_seconds=0.01, retry_max_seconds=0.02)
+
+    with pytest.raises(groq.RateLimitError):
+        scheduler.submit(_chat(client))
+
+    assert len(recorded_sleeps) == 2
+    assert all(delay > 50 for delay in recorded_sleeps)
+
+
+def test_server_errors_are_retried_with_backoff(stand_in, recorded_sleeps):
+    service, client = stand_in(FaultProfile(error_rate=1.0))
+    scheduler = LLMScheduler(requests_per_minute=1000, tokens_per_minute=100000, max_retries=2,
+                             retry_base_seconds=1.0, retry_max_seconds=4.0)
+
+    with pytest.raises(groq.InternalServerError):
+        scheduler.submit(_chat(client))
+
+    assert service.stats()["errors"] == 3
+    assert len(recorded_sleeps) == 2
+    assert scheduler.metrics()["transient_errors"] == 3
+
+
+def test_request_rate_admission_stays_under_server_limit(stand_in):
+    faults = FaultProfile(requests_per_minute=120)
+    service, client = stand_in(faults)
+    # Server first, so its bucket refills no later than the scheduler's
+    _drain(faults)
+    scheduler = LLMScheduler(requests_per_minute=120, tokens_per_minute=100000, max_retries=0)
+    _drain_scheduler(scheduler)
+
+    started = time.monotonic()
+    for _ in range(3):
+        scheduler.submit(_chat(client))
+    elapsed = time.monotonic() - started
+
+    # One request every 0.5s, and none of them rejected
+    assert elapsed >= 1.4
+    assert service.stats()["rate_limited"] == 0
+    assert service.stats()["ok"] == 3
+
+
+def test_token_rate_admission(stand_in):
+    _, client = stand_in(FaultProfile())
+    scheduler = LLMScheduler(requests_per_minute=1000, tokens_per_minute=12000, max_retries=0)
+
+    started = time.monotonic()
+    scheduler.submit(_chat(client), estimated_tokens=12000)
+    first = time.monotonic() - started
+    scheduler.submit(_chat(client), estimated_tokens=100)
+    second = time.monotonic() - started - first
+
+    # The bucket refills 200 tokens per second
+    assert first < 0.4
+    assert second >= 0.45
+
+
+def test_deadline_expires_while_waiting_for_capacity(stand_in):
+    _, client = stand_in(FaultProfile())
+    scheduler = LLMScheduler(requests_per_minute=60, tokens_per_minute=100000, max_retries=0)
+    _drain_scheduler(scheduler)
+
+    with pytest.raises(TimeoutError):
+        scheduler.submit(_chat(client), deadline=time.time() + 0.2)
+    assert scheduler.metrics()["deadline_expired"] == 1
+    assert scheduler.metrics()["queue_depth"] == 0
+
+
+def test_interactive_calls_are_admitted_before_batch(stand_in):
+    _, client = stand_in(FaultProfile())
+    scheduler = LLMScheduler(requests_per_minute=120, tokens_per_minute=100000, max_retries=0)
+    _drain_scheduler(scheduler)
+    order = []
+
+    def submit(label: str, traffic_class: str, node: str):
+        chat = _chat(client)
+
+        def call():
+            order.append(label)
+            return chat()
+        scheduler.submit(call, priority=priority_for(node, traffic_class))
+
+    def wait_for_queue(depth: int):
+        for _ in range(100):
+            if scheduler.metrics()["queue_depth"] == depth:
+                return
+            time.sleep(0.01)
+        raise AssertionError(f"queue never reached depth {depth}")
+
+    # Batch work queues first, yet the interactive call is admitted ahead of it
+    threads = [threading.Thread(target=submit, args=("batch", "batch", "final_synthesis"))]
+    threads[0].start()
+    wait_for_queue(1)
+    threads.append(threading.Thread(target=submit, args=("interactive", "interactive", "economic_analysis")))
+    threads[1].start()
+    wait_for_queue(2)
+    for thread in threads:
+        thread.join(timeout=10)
+
+    assert order == ["interactive", "batch"]
@@ -0,0 +1,24 @@
+"""
+Nearest-rank percentiles behind every p50/p95 in the metrics and reports.
+"""
+
+from civic_rag.backend.stats import percentile
+
+
+def test_nearest_rank():
+    values = list(range(1, 21))
+    assert percentile(values, 0.95) == 19
+    assert percentile(values, 0.50) == 10
+    assert percentile(values, 1.0) == 20
+    assert percentile(values, 0.0) == 1
+
+
+def test_small_samples():
+    assert percentile([3.0, 1.0], 0.50) == 1.0
+    assert percentile([3.0, 1.0], 0.95) == 3.0
+    assert percentile([7.0], 0.95) == 7.0
+    assert percentile(range(1, 11), 0.7) == 7
+
+
+def test_empty():
+    assert percentile([], 0.95) == 0.0
@@ -2,6 +2,10 @@
 """
 Vector Store Management Utility
 Use this script to update your vector database when you add new data.
+
+Run without arguments for the interactive menu, or with a command
+(validate, update, rebuild, info, stats, rollback) for unattended use:
+    python update_vector_store.py update --json --report update.json
 """
 
 import sys
@@ -26,7 +30,7 @@ def check_pdf_files(directory):
             # Check if file is empty
             if pdf_file.stat().st_size == 0:
                 print(f"⚠️ Empty file: {pdf_file.name}")
-                problematic_files.append(pdf_file)
+                problematic_files.append((pdf_file, "empty file"))
                 continue
             
             # Try to open with pypdf to check for corruption
@@ -34,30 +38,28 @@ def check_pdf_files(directory):
                 pdf_reader = pypdf.PdfReader(f)
                 if len(pdf_reader.pages) == 0:
                     print(f"⚠️ No pages found: {pdf_file.name}")
-                    problematic_files.append(pdf_file)
+                    problematic_files.append((pdf_file, "no pages found"))
                 else:
                     print(f"✅ Valid PDF: {pdf_file.name} ({len(pdf_reader.pages)} pages)")
                     
         except Exception as e:
             print(f"❌ Corrupted file: {pdf_file.name} - {e}")
-            problematic_files.append(pdf_file)
+            problematic_files.append((pdf_file, f"corrupted: {e}"))
     
     if problematic_files:
         print(f"\n⚠️ Found {len(problematic_files)} problematic files:")
-        for file in problematic_files:
-            print(f"   - {file.name}")
+        for file, reason in problematic_files:
+            print(f"   - {file.name} ({reason})")
         
-        choice = input("\nDo you want to move problematic files to a backup folder? (y/N): ").strip().lower()
+        choice = input("\nDo you want to move problematic files to the quarantine folder? (y/N): ").strip().lower()
         if choice == 'y':
-            backup_dir = Path(directory) / "problematic_files"
-            backup_dir.mkdir(exist_ok=True)
+            from civic_rag.backend.ingestion import quarantine_file
             
-            for file in problematic_files:
-                backup_path = backup_dir / file.name
-                file.rename(backup_path)
-                print(f"📁 Moved {file.name} to problematic_files/")
+            for file, reason in problematic_files:
+                quarantine_file(str(file), reason)
+                print(f"📁 Moved {file.name} to quarantine/")
             
-            print("✅ Problematic files moved to backup folder")
+            print("✅ Problematic files moved to quarantine folder")
     
     return len(problematic_files)
 
@@ -72,11 +74,17 @@ def main():
             add_documents_to_vector_store,
             get_vector_store_info
         )
+        from civic_rag.backend.snapshots import (
+            get_active_vector_store_dir,
+            get_active_version,
+            list_snapshots,
+            rollback_snapshot
+        )
         from civic_rag.backend.ingestion import ingest_pdf
         import civic_rag.config as config
         
         print("📍 Data Directory:", config.DATA_DIR)
-        print("📍 Vector Store Directory:", config.CHROMA_DIR)
+        print("📍 Vector Store Directory:", get_active_vector_store_dir())
         print()
         
         # Check if data directory exists
@@ -106,8 +114,9 @@ def main():
             print(f"📄 Remaining valid PDF files: {len(pdf_files)}")
             
         # Check if vector store exists
-        vector_store_exists = os.path.exists(config.CHROMA_DIR)
+        vector_store_exists = os.path.exists(get_active_vector_store_dir())
         print(f"🗄️ Vector store exists: {'Yes' if vector_store_exists else 'No'}")
+        print(f"🏷️ Active snapshot: {get_active_version() or 'none'} ({len(list_snapshots())} retained)")
         print()
         
         # Ask user what to do
@@ -115,9 +124,10 @@ def main():
         print("1. Add new documents to existing vector store")
         print("2. Clear and rebuild vector store from scratch")
         print("3. Update with all PDFs (recommended for new data)")
-        print("4. Exit")
+        print("4. Roll back to the previous snapshot")
+        print("5. Exit")
         
-        choice = input("\nEnter your choice (1-4): ").strip()
+        choice = input("\nEnter your choice (1-5): ").strip()
         
         if choice == "1":
             print("\n🔄 Adding new documents to existing vector store...")
@@ -126,7 +136,7 @@ def main():
                 print("✅ Vector store updated successfully!")
             
         elif choice == "2":
-            confirm = input("⚠️ This will delete all existing data. Continue? (y/N): ").strip().lower()
+            confirm = input("⚠️ This will replace the active index with a fresh snapshot. Continue? (y/N): ").strip().lower()
             if confirm == 'y':
                 print("\n🔄 Clearing and rebuilding vector store...")
                 vectordb = clear_and_rebuild_vector_store()
@@ -142,6 +152,13 @@ def main():
                 print("✅ Vector store updated successfully!")
                 
         elif choice == "4":
+            version = rollback_snapshot()
+            if version:
+                print(f"✅ Rolled back to snapshot {version}")
+            else:
+                print("⚠️ No earlier snapshot to roll back to")
+            
+        elif choice == "5":
             print("👋 Goodbye!")
             
         else:
@@ -156,4 +173,7 @@ def main():
         traceback.print_exc()
 
 if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        from civic_rag.backend.index_cli import main as cli_main
+        sys.exit(cli_main(sys.argv[1:]))
     main()